@@ -1,17 +1,644 @@
+import contextlib
+import importlib.util
+import io
 import pandas as pd
 import datetime
+import functools
 import logging
+import multiprocessing
+import numbers
 import re
 import os
+import tempfile
+import threading
+import time
+import warnings
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 logger = logging.getLogger(__name__)
 
+
+# ---------- SHEET SIGNATURES ----------
+CASH_OPERATIONS_COLUMNS = ["ID", "Type", "Time", "Comment", "Symbol", "Amount"]
+OPEN_POSITIONS_COLUMNS = ["Position", "Symbol", "Type", "Volume", "Open time", "Open price", "Market price", "Purchase value", "SL", "TP", "Margin", "Commission", "Swap", "Rollover", "Gross P/L", "Comment"]
+CLOSED_POSITIONS_COLUMNS = ["Position", "Symbol", "Type", "Volume", "Open time", "Open price", "Close time", "Close price", "Open origin", "Close origin", "Purchase value", "Sale value", "SL", "TP", "Margin", "Commission", "Swap", "Rollover", "Gross P/L", "Comment"]
+
+# Columns of the exported CSV.
+EXPORT_COLUMNS = ["Ticker Symbol", "Type", "Shares", "Date", "Value", "Securities Account", "Note"]
+
+# XTB operation type -> Portfolio Performance type, shared by every sheet.
+OPERATION_TYPES = {
+    "deposit": "Deposit",
+    "Stock purchase": "Buy",
+    "close trade": "close trade",
+    "Stock sale": "Sell",
+    "DIVIDENT": "Dividend",
+    "withdrawal": "Withdrawal",
+    "Withholding Tax": "Taxes",
+    "Free-funds Interest": "Interest",
+    "Free-funds Interest Tax": "Taxes",
+    "transfer": "transfer",
+    # "transfer": "Transfer (Inbound)",
+    # "transfer": "Transfer (Outbound)"
+}
+
+SHEET_SIGNATURES = {
+    "closed": CLOSED_POSITIONS_COLUMNS,
+    "open": OPEN_POSITIONS_COLUMNS,
+    "cash": CASH_OPERATIONS_COLUMNS,
+}
+
+# Sheet names used by XTB exports; only a tie-breaker, the columns decide.
+SHEET_NAME_HINTS = {
+    "closed": "CLOSED POSITION",
+    "open": "OPEN POSITION",
+    "cash": "CASH OPERATION",
+}
+
+# Sheet order of the exports we have seen so far, used when discovery fails.
+DEFAULT_SHEET_LAYOUT = {"closed": 0, "open": 1, "cash": 3}
+
+# ---------- READER ENGINES ----------
+# Engines that can read sheets, fastest first. "calamine" is the Rust-backed
+# python-calamine package (pandas >= 2.2); "openpyxl" is the pure Python fallback.
+READER_ENGINES = ("calamine", "openpyxl")
+
+
+def available_engines() -> list:
+    engines = []
+    if importlib.util.find_spec("python_calamine") is not None and _pandas_version() >= (2, 2):
+        engines.append("calamine")
+    engines.append("openpyxl")
+    return engines
+
+
+def default_engine() -> str:
+    return available_engines()[0]
+
+
+def resolve_engine(engine: str = None) -> str:
+    """Map None/"auto" to the fastest available engine and check explicit choices."""
+    if engine in (None, "", "auto"):
+        return default_engine()
+
+    if engine not in READER_ENGINES:
+        raise ValueError(f"Unknown reader engine '{engine}'. Choose from: {', '.join(READER_ENGINES)}.")
+
+    if engine not in available_engines():
+        logger.warning(f"Reader engine '{engine}' is not available, using '{default_engine()}'.")
+        return default_engine()
+
+    return engine
+
+
+def _pandas_version() -> tuple:
+    return tuple(int(p) for p in re.findall(r"\d+", pd.__version__)[:2])
+
+
+def load_sheets(xlsx_path: str, sheets: list, engine: str = None) -> dict:
+    """Read whole sheets (by index or name) in one pass over the workbook."""
+    return pd.read_excel(
+        _rewind(xlsx_path),
+        sheet_name=list(sheets),
+        header=None,
+        engine=resolve_engine(engine)
+    )
+
+
+# ---------- NORMALISATION BACKENDS ----------
+# "pandas" runs the CashOperationXLSXReader methods; "polars" runs the same steps
+# as multi-threaded column expressions (polars_backend.py) with identical output.
+BACKENDS = ("pandas", "polars")
+
+
+def available_backends() -> list:
+    backends = ["pandas"]
+    if importlib.util.find_spec("polars") is not None:
+        backends.append("polars")
+    return backends
+
+
+def resolve_backend(backend: str = None) -> str:
+    """None means pandas, "auto" the fastest available backend; explicit choices are checked."""
+    if backend in (None, ""):
+        return "pandas"
+
+    if backend == "auto":
+        return available_backends()[-1]
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose from: {', '.join(BACKENDS)}.")
+
+    if backend not in available_backends():
+        logger.warning(f"Backend '{backend}' is not available, using 'pandas'.")
+        return "pandas"
+
+    return backend
+
+
+# ---------- MEMORY BUDGET ----------
+# A full conversion holds the whole sheet as object columns, the parsed table and
+# the normalisation copies at once. Reports estimated above the budget are read
+# row by row instead (see stream_sheet) and normalised CHUNK_ROWS at a time.
+MEMORY_BUDGET_MB = 1024     # default budget, XTB_MEMORY_BUDGET_MB overrides it
+BYTES_PER_CELL = 400        # peak bytes per sheet cell of a full in-memory conversion
+XLSX_EXPANSION = 60         # peak bytes per compressed byte, when sheets carry no dimensions
+CHUNK_ROWS = 10000
+
+FULL_MODE = "full"
+LOW_MEMORY_MODE = "low-memory"
+
+
+def memory_budget_mb(budget: float = None) -> float:
+    if budget is None:
+        budget = os.environ.get("XTB_MEMORY_BUDGET_MB", MEMORY_BUDGET_MB)
+    return float(budget)
+
+
+def estimate_report_memory(xlsx_path) -> dict:
+    """
+    Estimate the peak memory of converting a report fully in memory, before loading it.
+    Uses the <dimension> of each worksheet (read from the first bytes of the sheet XML)
+    and falls back to the file size for sheets without one.
+    """
+    source = _rewind(xlsx_path)
+    if hasattr(source, "seek"):
+        file_bytes = source.seek(0, os.SEEK_END)
+        source.seek(0)
+    else:
+        file_bytes = os.path.getsize(source)
+
+    cells = 0
+    sized = True
+    with zipfile.ZipFile(source) as archive:
+        for name in archive.namelist():
+            if not (name.startswith("xl/worksheets/") and name.endswith(".xml")):
+                continue
+            with archive.open(name) as sheet:
+                match = _DIMENSION.search(sheet.read(4096))
+            if match is None:
+                sized = False
+                continue
+            first, last = match.group(1, 2) if match.group(2) else (match.group(1), match.group(1))
+            (first_col, first_row), (last_col, last_row) = _cell_position(first), _cell_position(last)
+            cells += (last_row - first_row + 1) * (last_col - first_col + 1)
+    _rewind(xlsx_path)
+
+    if sized:
+        return {"file_bytes": file_bytes, "cells": cells, "bytes": cells * BYTES_PER_CELL, "basis": "sheet dimensions"}
+    return {"file_bytes": file_bytes, "cells": None, "bytes": file_bytes * XLSX_EXPANSION, "basis": "file size"}
+
+
+_DIMENSION = re.compile(rb'<(?:\w+:)?dimension ref="([A-Z]+\d+)(?::([A-Z]+\d+))?"')
+
+
+def _cell_position(ref: bytes) -> tuple:
+    letters, digits = re.match(rb"([A-Z]+)(\d+)", ref).groups()
+    column = 0
+    for letter in letters:
+        column = column * 26 + letter - ord("A") + 1
+    return column, int(digits)
+
+
+def choose_processing_mode(xlsx_path, budget_mb: float = None) -> str:
+    """FULL_MODE, or LOW_MEMORY_MODE when the report is estimated above the memory budget."""
+    budget = memory_budget_mb(budget_mb)
+    name = os.path.basename(xlsx_path) if isinstance(xlsx_path, (str, os.PathLike)) else "upload"
+
+    try:
+        estimate = estimate_report_memory(xlsx_path)
+    except Exception as e:
+        logger.warning(f"{name}: could not estimate memory use ({e}), using {FULL_MODE} mode.")
+        return FULL_MODE
+
+    needed = estimate["bytes"] / 1024 / 1024
+    if needed > budget:
+        logger.info(f"{name}: {LOW_MEMORY_MODE} mode, estimated {needed:.0f} MB "
+                    f"from {estimate['basis']} exceeds the {budget:.0f} MB budget.")
+        return LOW_MEMORY_MODE
+
+    logger.info(f"{name}: {FULL_MODE} mode, estimated {needed:.0f} MB from {estimate['basis']} "
+                f"within the {budget:.0f} MB budget.")
+    return FULL_MODE
+
+
+# ---------- DATE RANGE ----------
+# Raw time columns a row of each sheet is dated by. A closed position becomes a buy
+# at its open time and a sell at its close time, so it is kept if either is in range.
+SHEET_DATE_COLUMNS = {
+    "cash": ["Time"],
+    "open": ["Open time"],
+    "closed": ["Open time", "Close time"],
+}
+
+
+def date_bounds(date_from=None, date_to=None) -> tuple:
+    """(first included, first excluded) Timestamp of an inclusive range of days; None for open ends."""
+    start = pd.Timestamp(date_from).normalize() if date_from else None
+    end = pd.Timestamp(date_to).normalize() + pd.Timedelta(days=1) if date_to else None
+    if start is not None and end is not None and start >= end:
+        raise ValueError(f"Empty date range: {date_from} - {date_to}.")
+    return start, end
+
+
+def in_date_range(times: pd.Series, bounds: tuple) -> pd.Series:
+    """Mask of the times within bounds (see date_bounds); unparseable times are out."""
+    start, end = bounds
+    times = pd.to_datetime(times, errors="coerce")
+    mask = times.notna()
+    if start is not None:
+        mask &= times >= start
+    if end is not None:
+        mask &= times < end
+    return mask
+
+
+def filter_by_date(table: pd.DataFrame, kind: str, bounds: tuple) -> pd.DataFrame:
+    """Raw table rows of a sheet kind dated within bounds, index kept."""
+    if table is None or bounds == (None, None):
+        return table
+    mask = pd.Series(False, index=table.index)
+    for column in SHEET_DATE_COLUMNS[kind]:
+        if column in table.columns:
+            mask |= in_date_range(table[column], bounds)
+    return table[mask]
+
+
+# ---------- ROW VALIDATION ----------
+# Cells that would make a whole export fail: a time that is not a date, a number
+# that is not a number, a trade comment without its "@ price". Rows holding one are
+# quarantined (set aside with the reason) and the rest of the sheet converts.
+SHEET_NUMBER_COLUMNS = {
+    "cash": ["Amount"],
+    "open": ["Volume", "Open price"],
+    "closed": ["Volume", "Open price", "Close price", "Gross P/L"],
+}
+TRADE_COMMENT = re.compile(r"(?:OPEN|CLOSE) BUY")
+
+QUARANTINE_COLUMNS = ["Sheet", "Row", "Reason"]
+
+
+def validate_rows(table: pd.DataFrame, kind: str) -> tuple:
+    """
+    (good rows, quarantined rows) of a raw sheet table. Quarantined rows keep their
+    cells and get "Sheet" (kind), "Row" (table index) and "Reason" columns.
+    """
+    if table is None or table.empty:
+        return table, _empty_quarantine()
+
+    problems = []
+    for column in SHEET_DATE_COLUMNS[kind]:
+        if column in table.columns and not pd.api.types.is_datetime64_any_dtype(table[column]):
+            cells = table[column]
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)  # Format inference falling back to dateutil.
+                bad = cells.notna() & pd.to_datetime(cells, errors="coerce").isna()
+            problems.append((bad, f"{column} is not a date"))
+
+    for column in SHEET_NUMBER_COLUMNS[kind]:
+        if column in table.columns and not pd.api.types.is_numeric_dtype(table[column]):
+            cells = table[column]
+            bad = ~cells.map(_number_or_missing).astype(bool)
+            problems.append((bad, f"{column} is not a number"))
+
+    if kind == "cash" and "Comment" in table.columns:
+        comments = table["Comment"].astype(str)
+        bad = comments.str.contains(TRADE_COMMENT) & ~comments.str.contains("@", regex=False)
+        problems.append((bad, "Comment has no '@ price'"))
+
+    problems = [(bad, reason) for bad, reason in problems if bad.any()]
+    if not problems:
+        return table, _empty_quarantine()
+
+    reasons = pd.concat([pd.Series(reason, index=bad.index[bad]) for bad, reason in problems])
+    reasons = reasons.groupby(level=0).agg("; ".join)
+    rejected = table.index.isin(reasons.index)
+
+    quarantined = table[rejected].copy()
+    quarantined.insert(0, "Row", quarantined.index)
+    quarantined.insert(0, "Sheet", kind)
+    quarantined["Reason"] = reasons
+
+    # The columns that held bad cells are object columns; give the good rows their usual types back.
+    return table[~rejected].infer_objects(), quarantined
+
+
+def _number_or_missing(value) -> bool:
+    return pd.isna(value) or (isinstance(value, numbers.Number) and not isinstance(value, bool))
+
+
+def _empty_quarantine() -> pd.DataFrame:
+    return pd.DataFrame(columns=QUARANTINE_COLUMNS)
+
+
+def quarantine_frame(frames: list) -> pd.DataFrame:
+    """Quarantined rows of a report's sheets in one frame, "Reason" last."""
+    frame = pd.concat(frames, ignore_index=True)
+    return frame[[column for column in frame.columns if column != "Reason"] + ["Reason"]]
+
+
+def quarantine_file_name(xlsx_path, currency) -> str:
+    return f"{os.path.splitext(export_file_name(xlsx_path, currency))[0]}_quarantine.csv"
+
+
+DISCOVERY_ROWS = 40  # The table header sits below the account block, well within this.
+
+_layout_cache = {}
+
+
+def match_header(row: list, columns: list) -> list:
+    """Return the signature columns found in a row, or [] if it is not a header row."""
+    matches = [c for c in columns if c in row]
+    if len(matches) >= max(3, len(columns) // 2):
+        return matches
+    return []
+
+
+def discover_sheet_layout(xlsx_path: str) -> dict:
+    """
+    Find which sheet holds each export kind ("closed", "open", "cash").
+    Only the sheet names and the first DISCOVERY_ROWS rows of each sheet are read.
+    The result is cached per file and refreshed when the file changes.
+    """
+    return dict(_discover(xlsx_path)[0])
+
+
+def _discover(xlsx_path: str) -> tuple:
+    """(layout, {sheet index: first DISCOVERY_ROWS rows}), cached per file."""
+    stamp = file_stamp(xlsx_path)
+    key = os.path.abspath(xlsx_path) if stamp is not None else None
+
+    cached = _layout_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1], cached[2]
+
+    try:
+        sheets = _read_sheet_heads(xlsx_path, DISCOVERY_ROWS)
+    except Exception as e:
+        logger.exception(e)
+        return dict(DEFAULT_SHEET_LAYOUT), {}
+
+    # Score every (kind, sheet) pair by the share of signature columns in its best header row.
+    candidates = []
+    for index, (name, rows) in enumerate(sheets):
+        for kind, columns in SHEET_SIGNATURES.items():
+            best = 0
+            for row in rows:
+                row = [str(v).strip() for v in row if v is not None]
+                best = max(best, len(match_header(row, columns)))
+            if best:
+                hinted = SHEET_NAME_HINTS[kind] in str(name).upper()
+                candidates.append((best / len(columns), hinted, kind, index, name))
+
+    layout = {}
+    taken = set()
+    for score, hinted, kind, index, name in sorted(candidates, reverse=True):
+        if kind in layout or index in taken:
+            continue
+        layout[kind] = index
+        taken.add(index)
+        logger.debug(f"Sheet '{name}' ({index}) matched as '{kind}' ({score:.0%}).")
+
+    for kind, index in DEFAULT_SHEET_LAYOUT.items():
+        if kind not in layout:
+            logger.warning(f"No sheet matched '{kind}' in {xlsx_path}, falling back to sheet {index}.")
+            layout[kind] = index
+
+    heads = {index: rows for index, (name, rows) in enumerate(sheets)}
+    if key is not None:
+        _layout_cache[key] = (stamp, layout, heads)
+    return layout, heads
+
+
+# ---------- HEADER-ONLY READ ----------
+def read_report_header(xlsx_path: str) -> dict:
+    """
+    Name, account, currency and balance block of a report, read from the first
+    DISCOVERY_ROWS rows of the cash sheet (the rows sheet discovery reads anyway).
+    No sheet is loaded in full, so the GUI file list can show account and
+    currency before the background parse finishes.
+    """
+    xlsx_path = open_report(xlsx_path)
+    layout, heads = _discover(xlsx_path)
+    head = _head_frame(heads.get(layout["cash"], []))
+    return CashOperationXLSXReader(xlsx_path, layout["cash"], df=head).read_header()
+
+
+def file_stamp(path: str) -> tuple:
+    """
+    (mtime, size) of a file, used to tell whether cached results are still valid. None for in-memory files.
+    Reports inside an archive carry the stamp of the archive.
+    """
+    if not isinstance(path, (str, os.PathLike)):
+        return None
+    stat = os.stat(split_archive_path(path)[0])
+    return stat.st_mtime_ns, stat.st_size
+
+
+# ---------- ZIP ARCHIVES ----------
+# A report inside a zip archive is addressed as "<archive>::<member>" wherever a
+# report path is accepted. Members are read into memory one at a time when they
+# are converted; nothing is extracted to disk.
+ARCHIVE_SEPARATOR = "::"
+
+
+def is_archive(path) -> bool:
+    return isinstance(path, (str, os.PathLike)) and str(path).lower().endswith(".zip")
+
+
+def split_archive_path(path) -> tuple:
+    """(archive, member) of a report inside an archive, (path, None) otherwise."""
+    path = os.fspath(path)
+    if ARCHIVE_SEPARATOR in path:
+        archive, member = path.split(ARCHIVE_SEPARATOR, 1)
+        return archive, member
+    return path, None
+
+
+def archive_reports(zip_path: str) -> list:
+    """Paths of the .xlsx reports inside an archive, in name order."""
+    with zipfile.ZipFile(zip_path) as archive:
+        members = sorted(
+            info.filename for info in archive.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith(".xlsx")
+            and not info.filename.startswith("__MACOSX/")
+            and not os.path.basename(info.filename).startswith(("~$", "."))
+        )
+    return [f"{zip_path}{ARCHIVE_SEPARATOR}{member}" for member in members]
+
+
+def expand_archives(paths: list) -> list:
+    """paths with every zip archive replaced by the reports inside it."""
+    expanded = []
+    for path in paths:
+        expanded.extend(archive_reports(path) if is_archive(path) else [path])
+    return expanded
+
+
+def open_report(path):
+    """What the readers get: the path itself, or the bytes of a report inside an archive."""
+    if not isinstance(path, (str, os.PathLike)):
+        return path
+    archive, member = split_archive_path(path)
+    if member is None:
+        return path
+    with zipfile.ZipFile(archive) as bundle:
+        return io.BytesIO(bundle.read(member))
+
+
+def report_name(path) -> str:
+    """File name of a report, also for reports inside an archive."""
+    if not isinstance(path, (str, os.PathLike)):
+        return "upload"
+    archive, member = split_archive_path(path)
+    return os.path.basename(member if member is not None else archive)
+
+
+def _rewind(source):
+    """Reports may also be file-like objects (uploads); every reader starts at the beginning."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+def _read_sheet_heads(xlsx_path: str, rows: int) -> list:
+    """
+    Return [(sheet name, first rows)] without loading whole sheets.
+    openpyxl's read-only mode streams the sheet XML and stops after `rows`;
+    calamine always decodes the whole sheet, so it is not used here.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(_rewind(xlsx_path), read_only=True, data_only=True)
+    try:
+        return [
+            (name, list(wb[name].iter_rows(max_row=rows, values_only=True)))
+            for name in wb.sheetnames
+        ]
+    finally:
+        wb.close()
+
+
+def _cell_value(value):
+    """Cell values as pandas' openpyxl reader returns them: whole floats become ints, blanks NaN."""
+    if value is None or value == "":
+        return float("nan")
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _head_frame(rows: list) -> pd.DataFrame:
+    """First rows of a sheet as the frame load_sheet() would start with."""
+    rows = [[_cell_value(v) for v in row] for row in rows]
+    width = max((len(r) for r in rows), default=0)
+    return pd.DataFrame([r + [float("nan")] * (width - len(r)) for r in rows])
+
+
+def stream_sheet(xlsx_path, sheets: dict, head_rows: int = DISCOVERY_ROWS, bounds: tuple = (None, None)) -> dict:
+    """
+    Low-memory counterpart of load_sheets() + read_table(): read sheets row by row
+    and keep only the first head_rows rows and the table's signature columns.
+    With bounds (see date_bounds), rows dated outside them are dropped as they are read.
+
+    sheets maps kind -> sheet index. Returns kind -> {"head", "table", "total"},
+    "table" being None when no header row matching the kind's columns is found.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(_rewind(xlsx_path), read_only=True, data_only=True)
+    try:
+        result = {}
+        for kind, index in sheets.items():
+            columns = SHEET_SIGNATURES[kind]
+            head, records, total = [], [], None
+            col_index = None
+
+            for number, row in enumerate(wb.worksheets[index].iter_rows(values_only=True)):
+                if number < head_rows:
+                    head.append(row)
+                row = [_cell_value(v) for v in row]
+
+                if col_index is None:
+                    labels = [str(v).strip() for v in row]
+                    if match_header(labels, columns):
+                        col_index = {c: labels.index(c) for c in columns if c in labels}
+                    continue
+
+                if any("total" in str(v).lower() for v in row):
+                    if len(row) > 1 and str(row[1]).strip() == "Total":
+                        total = {
+                            "Total": CashOperationXLSXReader._num(row[6] if len(row) > 6 else None),
+                            "Currency": row[7] if len(row) > 7 else None,
+                        }
+                    break
+
+                record = {c: row[i] if i < len(row) else float("nan") for c, i in col_index.items()}
+                if all(pd.isna(v) for v in record.values()):
+                    continue
+                if bounds != (None, None) and not _record_in_range(record, SHEET_DATE_COLUMNS[kind], bounds):
+                    continue
+                records.append(record)
+
+            result[kind] = {
+                "head": _head_frame(head),
+                "table": None if col_index is None else _records_frame(records, col_index, bounds),
+                "total": total or {"Total": None, "Currency": None},
+            }
+        return result
+    finally:
+        wb.close()
+
+
+def _records_frame(records: list, col_index: dict, bounds: tuple) -> pd.DataFrame:
+    """Table rows as read_table() returns them; a date range that matched nothing still keeps the columns."""
+    if not records and bounds != (None, None):
+        return pd.DataFrame(columns=list(col_index))
+    return pd.DataFrame(records)
+
+
+def _record_in_range(record: dict, columns: list, bounds: tuple) -> bool:
+    start, end = bounds
+    for column in columns:
+        try:
+            time = pd.Timestamp(record.get(column))
+        except (TypeError, ValueError):
+            continue
+        if pd.isna(time):
+            continue
+        if (start is None or time >= start) and (end is None or time < end):
+            return True
+    return False
+
+
+def timed_stage(method):
+    """Add the run time of a reader method to reader.timings, under the method's name."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._stage(method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class CashOperationXLSXReader:
-    def __init__(self, xlsx_path: str, sheet_index: int = 3):
+    def __init__(self, xlsx_path: str, sheet_index: int = 3, df: pd.DataFrame = None, table: pd.DataFrame = None,
+                 engine: str = None, backend: str = None, date_bounds: tuple = None):
         self.xlsx_path = xlsx_path
         self.sheet_index = sheet_index
+        self.engine = engine  # Reader engine, None picks the fastest available (see READER_ENGINES).
+        self.backend = resolve_backend(backend)  # Normalisation backend, see BACKENDS.
         self.account_currency = None
-        self.df = None
+        self.df = df
+        self.table = table  # Raw operations table parsed earlier (see parse_report), reused by read_table.
+        self.total = None   # Total row parsed earlier, reused by read_total.
+        self.date_bounds = date_bounds or (None, None)  # Rows outside are dropped by read_table, see date_bounds().
+        self.reconciliation = {}
+        self.quarantined = _empty_quarantine()  # Rows read_table set aside, see validate_rows().
+        self.error = None  # "Type: message" of the exception an export_* method caught, None when it succeeded.
+        self.timings = {}  # Stage -> seconds spent in it, see timed_stage (shadow runs report them).
 
         self.header = {}
 
@@ -21,12 +648,22 @@ class CashOperationXLSXReader:
         self.operations_on_account = pd.DataFrame()
         self.operations_on_stocks = pd.DataFrame()
 
+    @contextlib.contextmanager
+    def _stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - started
+
     # ---------- LOAD XLSX ----------
+    @timed_stage
     def load_sheet(self):
         self.df = pd.read_excel(
-            self.xlsx_path,
+            _rewind(self.xlsx_path),
             sheet_name=self.sheet_index,
-            header=None
+            header=None,
+            engine=resolve_engine(self.engine)
         )
 
     # ---------- READ HEADER ----------
@@ -88,22 +725,33 @@ class CashOperationXLSXReader:
 
     # ---------- READ TOTAL ----------
     def read_total(self) -> dict:
+        if self.total is not None:
+            return self.total
+
         if self.df is None:
             self.load_sheet()
 
-        for i in range(len(self.df)):
-            row = self.df.iloc[i]
-            if str(row[1]).strip() == "Total":
-                print(row)
-                return {
-                    "Total": self._num(row[6]),
-                    "Currency": row[7]
+        if 1 in self.df.columns:
+            labels = self.df[1].astype(str).str.strip()
+            rows = labels.index[labels == "Total"]
+
+            if len(rows):
+                row = self.df.loc[rows[0]]
+                self.total = {
+                    "Total": self._num(row.get(6)),
+                    "Currency": row.get(7)
                 }
+                return self.total
 
         return {"Total": None, "Currency": None}
 
     # ---------- READ TABLE OPERATIONS ----------
-    def read_table(self, columns: list) -> pd.DataFrame:
+    @timed_stage
+    def read_table(self, columns: list, validate: bool = True) -> pd.DataFrame:
+        if self.table is not None:
+            self.operations = self._checked(self.table, columns, validate).copy()
+            return self.operations
+
         if self.df is None:
             self.load_sheet()
 
@@ -113,9 +761,8 @@ class CashOperationXLSXReader:
         # Search for header row
         for i in range(len(self.df)):
             row = self.df.iloc[i].astype(str).str.strip().tolist()
-            matches = [c for c in columns if c in row]
 
-            if len(matches) >= max(3, len(columns) // 2):
+            if match_header(row, columns):
                 header_row = i
                 for c in columns:
                     if c in row:
@@ -145,29 +792,32 @@ class CashOperationXLSXReader:
             if not empty:
                 data.append(record)
 
-        self.operations = pd.DataFrame(data)
+        self.operations = self._checked(pd.DataFrame(data), columns, validate)
 
         return self.operations
 
+    def _checked(self, table: pd.DataFrame, columns: list, validate: bool = True) -> pd.DataFrame:
+        """Drop rows outside the date range and quarantine malformed ones before anything is normalised."""
+        kind = next(kind for kind, signature in SHEET_SIGNATURES.items() if signature == columns)
+        if self.date_bounds != (None, None):
+            table = filter_by_date(table, kind, self.date_bounds)
+        if not validate:
+            return table
+
+        table, self.quarantined = validate_rows(table, kind)
+        if not self.quarantined.empty:
+            reasons = self.quarantined["Reason"].value_counts()
+            logger.warning(f"{len(self.quarantined)} rows of the {kind} sheet of {self.xlsx_path} quarantined: "
+                           + ", ".join(f"{reason} ({count})" for reason, count in reasons.items()))
+        return table
+
     # ---------- OPERATIONS HISTORY NORMALIZATION ----------
+    @timed_stage
     def normalize_operations_history(self, amount=False, lang="EN"):
         """Rename columns and map operation types."""
 
         # --- TYPE MAP ---
-        type_map = {
-            "deposit": "Deposit",
-            "Stock purchase": "Buy",
-            "close trade": "close trade",
-            "Stock sale": "Sell",
-            "DIVIDENT": "Dividend",
-            "withdrawal": "Withdrawal",
-            "Withholding Tax": "Taxes",
-            "Free-funds Interest": "Interest",
-            "Free-funds Interest Tax": "Taxes",
-            "transfer": "transfer",
-            # "transfer": "Transfer (Inbound)",
-            # "transfer": "Transfer (Outbound)"
-        }
+        type_map = OPERATION_TYPES
 
         # --- COLUMN MAP ---
         column_map = {
@@ -262,6 +912,7 @@ class CashOperationXLSXReader:
         return self.operations
 
     # ---------- ADD QUANTITY AND PRICE ----------
+    @timed_stage
     def add_quantity_and_price(self, df: pd.DataFrame) -> pd.DataFrame:
         df["Shares"] = ""
         df["Gross Amount"] = ""
@@ -297,24 +948,12 @@ class CashOperationXLSXReader:
         return self.operations
 
     # ---------- OPEN OPERATIONS NORMALIZATION ----------
+    @timed_stage
     def normalize_open_operations(self, amount=False, lang="EN"):
         """Rename columns and map operation types."""
 
         # --- TYPE MAP ---
-        type_map = {
-            "deposit": "Deposit",
-            "Stock purchase": "Buy",
-            "close trade": "close trade",
-            "Stock sale": "Sell",
-            "DIVIDENT": "Dividend",
-            "withdrawal": "Withdrawal",
-            "Withholding Tax": "Taxes",
-            "Free-funds Interest": "Interest",
-            "Free-funds Interest Tax": "Taxes",
-            "transfer": "transfer",
-            # "transfer": "Transfer (Inbound)",
-            # "transfer": "Transfer (Outbound)"
-        }
+        type_map = OPERATION_TYPES
 
         # --- COLUMN MAP ---
         column_map = {
@@ -369,24 +1008,12 @@ class CashOperationXLSXReader:
         return self.operations
 
     # ---------- CLOSED OPERATIONS NORMALIZATION ----------
+    @timed_stage
     def normalize_closed_operations(self, amount=False, lang="EN"):
         """Rename columns and map operation types."""
 
         # --- TYPE MAP ---
-        type_map = {
-            "deposit": "Deposit",
-            "Stock purchase": "Buy",
-            "close trade": "close trade",
-            "Stock sale": "Sell",
-            "DIVIDENT": "Dividend",
-            "withdrawal": "Withdrawal",
-            "Withholding Tax": "Taxes",
-            "Free-funds Interest": "Interest",
-            "Free-funds Interest Tax": "Taxes",
-            "transfer": "transfer",
-            # "transfer": "Transfer (Inbound)",
-            # "transfer": "Transfer (Outbound)"
-        }
+        type_map = OPERATION_TYPES
 
         # --- COLUMN MAP ---
         column_map = {
@@ -493,6 +1120,104 @@ class CashOperationXLSXReader:
 
         return self.operations
 
+    # ---------- BALANCE RECONCILIATION ----------
+    # Sign of the cash movement Portfolio Performance books for each type, applied to |Value|.
+    CASH_EFFECT_SIGN = {
+        "Deposit": 1,
+        "Sell": 1,
+        "Dividend": 1,
+        "Interest": 1,
+        "Withdrawal": -1,
+        "Buy": -1,
+        "Taxes": -1,
+    }
+
+    def reconcile_balance(self, raw_operations: pd.DataFrame, tolerance: float = 0.01, limit: int = 10) -> dict:
+        """
+        Compare the cash the converted operations move with the report.
+
+        raw_operations are the rows of read_table() before normalisation.
+        The report's own Amount column is summed against the Total row and
+        the header Balance, and the cash effect of each converted row
+        (type sign x Value, as Portfolio Performance books it) is run against
+        the raw amounts in time order. Rows where the two running balances
+        start to differ are listed in "diverging". "Balanced" needs the raw and
+        converted sums to agree, and the Total row (when present) to match the
+        report's amounts.
+
+        The header Balance is the account balance now, so it only has to match
+        when the report starts at account inception, taken to be when its first
+        operation is a deposit ("From Inception"). Otherwise "Balance Difference"
+        is informational. Quarantined cash rows count towards the Total and the
+        Balance with their amounts; when one of those is not a number, neither
+        can be checked and both differences are informational.
+        """
+        raw_amount = pd.to_numeric(raw_operations["Amount"], errors="coerce").fillna(0.0)
+
+        quarantined = self.quarantined[self.quarantined["Sheet"] == "cash"]
+        quarantined_cells = quarantined["Amount"] if "Amount" in quarantined.columns else pd.Series(dtype=object)
+        quarantined_amount = pd.to_numeric(quarantined_cells, errors="coerce")
+        unknown = int((quarantined_cells.notna() & quarantined_amount.isna()).sum())
+        quarantined_sum = float(quarantined_amount.sum())
+
+        # Converted rows keep the index of the raw row they came from; dropped rows move no cash.
+        value = pd.to_numeric(self.operations["Value"], errors="coerce").abs()
+        sign = self.operations["Type"].map(self.CASH_EFFECT_SIGN)
+        amount = pd.to_numeric(self.operations["Amount"], errors="coerce")
+        effect = (sign * value).fillna(amount).fillna(0.0)
+        converted = effect.groupby(level=0).sum().reindex(raw_operations.index, fill_value=0.0)
+
+        order = pd.to_datetime(raw_operations["Time"], errors="coerce").argsort(kind="stable")
+        delta = (raw_amount - converted).iloc[order]
+        running = delta.cumsum()
+        from_inception = bool(len(raw_operations)) and raw_operations["Type"].iloc[order].iloc[0] == "deposit"
+
+        raw_sum = float(raw_amount.sum())
+        converted_sum = float(converted.sum())
+        total = self.read_total().get("Total")
+        balance = self.header.get("Balance")
+
+        diverging_rows = delta.index[delta.abs() > tolerance][:limit]
+        diverging = raw_operations.loc[diverging_rows].assign(
+            **{
+                "Converted Amount": converted.loc[diverging_rows],
+                "Running Difference": running.loc[diverging_rows],
+            }
+        )
+
+        self.reconciliation = {
+            "Operations": len(raw_operations),
+            "Quarantined Operations": len(quarantined),
+            "From Inception": from_inception,
+            "Report Total": total,
+            "Header Balance": balance,
+            "Raw Sum": round(raw_sum, 4),
+            "Quarantined Sum": round(quarantined_sum, 4),
+            "Converted Sum": round(converted_sum, 4),
+            "Total Difference": None if total is None else round(raw_sum + quarantined_sum - total, 4),
+            "Converted Difference": round(raw_sum - converted_sum, 4),
+            "Balance Difference": None if balance is None else round(balance - converted_sum - quarantined_sum, 4),
+            "Diverging Operations": int((delta.abs() > tolerance).sum()),
+            "diverging": diverging,
+        }
+
+        check_total = total is not None and not unknown
+        check_balance = balance is not None and from_inception and not unknown
+        balanced = (
+            abs(raw_sum - converted_sum) <= tolerance
+            and (not check_total or abs(raw_sum + quarantined_sum - total) <= tolerance)
+            and (not check_balance or abs(balance - converted_sum - quarantined_sum) <= tolerance)
+        )
+        self.reconciliation["Balanced"] = balanced
+
+        summary = ", ".join(f"{k}: {v}" for k, v in self.reconciliation.items() if k != "diverging")
+        if balanced:
+            logger.info(f"Balance reconciled for {self.xlsx_path}: {summary}")
+        else:
+            logger.warning(f"Balance mismatch for {self.xlsx_path}: {summary}\nFirst diverging operations:\n{diverging.to_string()}")
+
+        return self.reconciliation
+
     # ---------- HELPERS ----------
     @staticmethod
     def _num(val):  # Convert a numeric string to float, handling comma as decimal separator.
@@ -563,43 +1288,102 @@ class CashOperationXLSXReader:
         self.operations = pd.concat([self.operations, pd.DataFrame([new_row])], ignore_index=True)
 
 
-    def export_default_cash_operations(self):
-        try:
-            self.read_header()
-            self.read_table(["ID", "Type", "Time", "Comment", "Symbol", "Amount"])
+    def _nothing_to_convert(self) -> bool:
+        """True (and an empty export) when a date range or the quarantine left no rows to normalise."""
+        if not self.operations.empty or (self.date_bounds == (None, None) and self.quarantined.empty):
+            return False
+        self.operations = pd.DataFrame(columns=EXPORT_COLUMNS)
+        return True
+
+    def _normalize_cash(self):
+        if self.backend == "polars":
+            import polars_backend
+            with self._stage("normalize_operations_history"):
+                self.operations = polars_backend.normalize_operations_history(self.operations, self.account_currency)
+        else:
             self.normalize_operations_history()
             self.strip_ticker_suffix()
-            self.operations = self.operations[["Ticker Symbol", "Type", "Shares", "Date", "Value", "Securities Account", "Note"]]
+
+    def export_default_cash_operations(self, reconcile: bool = True, chunk_rows: int = None):
+        """With chunk_rows, the table is normalised that many rows at a time (low-memory mode)."""
+        try:
+            self.read_header()
+            table = self.read_table(CASH_OPERATIONS_COLUMNS)
+            if self._nothing_to_convert():
+                return self.operations
+            raw_operations = table.reindex(columns=["ID", "Time", "Type", "Amount"])
+
+            if chunk_rows is None:
+                self._normalize_cash()
+            else:
+                self.table = None
+                chunks = []
+                # Rows keep their table index, so reconciliation lines them up as in one pass.
+                for start in range(0, max(len(table), 1), chunk_rows):
+                    self.operations = table.iloc[start:start + chunk_rows].copy()
+                    self._normalize_cash()
+                    chunks.append(self.operations[EXPORT_COLUMNS + ["Amount"]])
+                del table
+                self.operations = pd.concat(chunks)
+
+            if reconcile and self.date_bounds != (None, None):
+                logger.info(f"Balance of {self.xlsx_path} not reconciled: the export covers a date range only.")
+            elif reconcile:
+                try:
+                    self.reconcile_balance(raw_operations)
+                except Exception as e:
+                    logging.exception(e)  # The check must never stop the export.
+            self.operations = self.operations[EXPORT_COLUMNS]
             return self.operations
         except Exception as e:
             logging.exception(e)
             print(e)
+            self.error = f"{type(e).__name__}: {e}"
             return pd.DataFrame()
 
     def export_open_operations(self):
         try:
             self.read_header()
-            self.read_table(["Position", "Symbol", "Type", "Volume", "Open time", "Open price", "Market price", "Purchase value", "SL", "TP", "Margin", "Commission", "Swap", "Rollover", "Gross P/L", "Comment"])
-            self.normalize_open_operations()
-            self.strip_ticker_suffix()
-            self.operations = self.operations[["Ticker Symbol", "Type", "Shares", "Date", "Value", "Securities Account", "Note"]]
+            self.read_table(OPEN_POSITIONS_COLUMNS)
+            if self._nothing_to_convert():
+                return self.operations
+            if self.backend == "polars":
+                import polars_backend
+                with self._stage("normalize_open_operations"):
+                    self.operations = polars_backend.normalize_open_operations(self.operations, self.account_currency)
+            else:
+                self.normalize_open_operations()
+                self.strip_ticker_suffix()
+            self.operations = self.operations[EXPORT_COLUMNS]
             return self.operations
         except Exception as e:
             logging.exception(e)
             print(e)
+            self.error = f"{type(e).__name__}: {e}"
             return pd.DataFrame()
 
     def export_closed_operations(self):
         try:
             self.read_header()
-            self.read_table(["Position", "Symbol", "Type", "Volume", "Open time", "Open price", "Close time", "Close price", "Open origin", "Close origin", "Purchase value", "Sale value", "SL", "TP", "Margin", "Commission", "Swap", "Rollover", "Gross P/L", "Comment"])
-            self.normalize_closed_operations()
-            self.strip_ticker_suffix()
-            self.operations = self.operations[["Ticker Symbol", "Type", "Shares", "Date", "Value", "Securities Account", "Note"]]
+            self.read_table(CLOSED_POSITIONS_COLUMNS)
+            if self._nothing_to_convert():
+                return self.operations
+            if self.backend == "polars":
+                import polars_backend
+                with self._stage("normalize_closed_operations"):
+                    self.operations = polars_backend.normalize_closed_operations(self.operations, self.account_currency)
+            else:
+                self.normalize_closed_operations()
+                self.strip_ticker_suffix()
+            if self.date_bounds != (None, None):
+                # The position is in range; its buy or its sell may not be.
+                self.operations = self.operations[in_date_range(self.operations["Date"], self.date_bounds)]
+            self.operations = self.operations[EXPORT_COLUMNS]
             return self.operations
         except Exception as e:
             logging.exception(e)
             print(e)
+            self.error = f"{type(e).__name__}: {e}"
             return pd.DataFrame()
 
     def export_simplified_deposit_of_operation(self):
@@ -610,37 +1394,637 @@ class CashOperationXLSXReader:
         except Exception as e:
             logging.exception(e)
             print(e)
+            self.error = f"{type(e).__name__}: {e}"
             return pd.DataFrame()
 
 
+# ---------- PARSE REPORT AHEAD OF EXPORT ----------
+def parse_report(xlsx_path: str, engine: str = None, kinds: list = None, mode: str = None,
+                 memory_budget_mb: float = None, date_from=None, date_to=None, timings: list = None) -> dict:
+    """
+    Do all the workbook reading for a report up front: sheet layout, header
+    and the raw operation table of every sheet (or only those in kinds).
+    convert_report() given this result only has to normalise.
+
+    Only the head of each sheet is kept (enough for read_header), not the whole sheet.
+    mode is FULL_MODE or LOW_MEMORY_MODE; None picks it from the memory budget.
+    With date_from/date_to (inclusive days), only the table rows dated within them are kept.
+    The stage timings of each sheet reader (see timed_stage) are appended to timings, when given.
+    """
+    stamp = file_stamp(xlsx_path)
+    xlsx_path = open_report(xlsx_path)
+    bounds = date_bounds(date_from, date_to)
+    layout = discover_sheet_layout(xlsx_path)
+    kinds = [kind for kind in SHEET_SIGNATURES if kinds is None or kind in kinds or kind == "cash"]
+
+    if mode is None:
+        mode = choose_processing_mode(xlsx_path, memory_budget_mb)
+
+    parsed = {"stamp": stamp, "layout": layout, "mode": mode, "header": {}, "total": None,
+              "heads": {}, "tables": {}, "rows": {}}
+
+    if mode == LOW_MEMORY_MODE:
+        streamed = stream_sheet(xlsx_path, {kind: layout[kind] for kind in kinds}, bounds=bounds)
+        for kind in kinds:
+            sheet = streamed[kind]
+            if kind == "cash":
+                parsed["header"] = CashOperationXLSXReader(xlsx_path, layout[kind], df=sheet["head"]).read_header()
+                parsed["total"] = sheet["total"]
+            parsed["heads"][kind] = sheet["head"]
+            parsed["tables"][kind] = sheet["table"]
+            parsed["rows"][kind] = 0 if sheet["table"] is None else len(sheet["table"])
+        return parsed
+
+    sheets = load_sheets(xlsx_path, [layout[kind] for kind in kinds], engine)
+
+    for kind in kinds:
+        reader = CashOperationXLSXReader(xlsx_path, layout[kind], df=sheets[layout[kind]], date_bounds=bounds)
+
+        if kind == "cash":
+            parsed["header"] = reader.read_header()
+            parsed["total"] = reader.read_total()
+
+        try:
+            table = reader.read_table(SHEET_SIGNATURES[kind], validate=False)  # The export quarantines bad rows.
+        except ValueError:
+            table = None  # Let the export report the missing table as it does today.
+
+        parsed["heads"][kind] = reader.df.head(DISCOVERY_ROWS)
+        parsed["tables"][kind] = table
+        parsed["rows"][kind] = 0 if table is None else len(table)
+        if timings is not None:
+            timings.append(reader.timings)
+
+    return parsed
+
+
+def parsed_size(parsed: dict) -> int:
+    """Bytes the frames of a parse_report() result hold."""
+    frames = list(parsed["heads"].values()) + list(parsed["tables"].values())
+    return sum(int(frame.memory_usage(deep=True).sum()) for frame in frames if frame is not None)
+
+
+class ParsedReportCache:
+    """
+    parse_report() results by report path, least recently used first out once their
+    frames (see parsed_size) take more than budget_mb. Defaults to half the memory budget.
+    A report that does not fit is not kept; convert_report() then reads it again.
+    """
+
+    def __init__(self, budget_mb: float = None):
+        self.budget = (memory_budget_mb() / 2 if budget_mb is None else budget_mb) * 1024 ** 2
+        self.entries = OrderedDict()  # path -> (parsed, size)
+        self.size = 0
+
+    def __contains__(self, path) -> bool:
+        return path in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, path):
+        if path not in self.entries:
+            return None
+        self.entries.move_to_end(path)
+        return self.entries[path][0]
+
+    def put(self, path, parsed: dict) -> bool:
+        """Keep parsed, evicting the least recently used reports; False when it is larger than the budget."""
+        self.pop(path)
+        size = parsed_size(parsed)
+        if size > self.budget:
+            logger.info(f"Parsed {path} not cached: {size / 1024 ** 2:.0f} MB is over the {self.budget / 1024 ** 2:.0f} MB budget.")
+            return False
+
+        while self.entries and self.size + size > self.budget:
+            evicted, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+            logger.debug(f"Parsed {evicted} evicted from the cache.")
+        self.entries[path] = (parsed, size)
+        self.size += size
+        return True
+
+    def pop(self, path):
+        parsed, size = self.entries.pop(path, (None, 0))
+        self.size -= size
+        return parsed
+
+
+# ---------- CONVERT ONE REPORT ----------
+def convert_report(xlsx_path: str, default: bool = True, open_positions: bool = False,
+                   closed_positions: bool = False, simplified_deposit: bool = False, parsed: dict = None,
+                   engine: str = None, fx_rates=None, target_currency: str = None, memory_budget_mb: float = None,
+                   backend: str = None, sheet_workers: int = None, sheet_executor: str = None,
+                   existing_transactions=None, date_from=None, date_to=None, quarantine: list = None,
+                   failed: list = None, timings: list = None):
+    """
+    Run the exports selected in the GUI for one report.
+    Returns (header, data) where data is the frame written to the CSV.
+    Pass the result of parse_report() as parsed to skip reading the workbook again.
+    With fx_rates (fx_rates.FXRates) and target_currency, values are also converted to that currency.
+    Reports estimated above memory_budget_mb (see MEMORY_BUDGET_MB) run in low-memory mode.
+    backend picks the normalisation backend (see BACKENDS).
+    The sheet exports run concurrently, see convert_sheets() for sheet_workers and sheet_executor.
+    With existing_transactions (existing_portfolio.ExistingTransactions), operations already in
+    that Portfolio Performance file are left out.
+    date_from/date_to (inclusive days) limit the export to operations dated within them;
+    out-of-range rows are dropped before normalisation.
+    Malformed rows are left out too (see validate_rows); pass a list as quarantine to get them.
+    A failed export leaves its rows out of data; pass a list as failed to get (export, error message)
+    of each failed export. The stage timings of each export (see timed_stage) are appended to timings, when given.
+    """
+    if parsed is not None and parsed["stamp"] != file_stamp(xlsx_path):
+        parsed = None  # File changed since it was parsed.
+
+    if parsed is None:
+        xlsx_path = open_report(xlsx_path)
+
+    if parsed is None and choose_processing_mode(xlsx_path, memory_budget_mb) == LOW_MEMORY_MODE:
+        kinds = ["cash"] + (["open"] if open_positions and not default else []) + (["closed"] if closed_positions and not default else [])
+        parsed = parse_report(xlsx_path, kinds=kinds, mode=LOW_MEMORY_MODE, date_from=date_from, date_to=date_to)
+
+    layout = parsed["layout"] if parsed is not None else discover_sheet_layout(xlsx_path)
+    chunk_rows = CHUNK_ROWS if parsed is not None and parsed.get("mode") == LOW_MEMORY_MODE else None
+
+    if default:
+        exports = ["default"]
+    else:
+        selected = {"open": open_positions, "closed": closed_positions, "deposit": simplified_deposit}
+        exports = [export for export, checked in selected.items() if checked]
+
+    header, frames = convert_sheets(xlsx_path, exports, layout, parsed=parsed, engine=engine, backend=backend,
+                                    chunk_rows=chunk_rows, workers=sheet_workers, executor=sheet_executor,
+                                    bounds=date_bounds(date_from, date_to), quarantine=quarantine, failed=failed,
+                                    timings=timings)
+
+    if default:
+        data = frames[0]
+    else:
+        data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    if existing_transactions is not None:
+        data = existing_transactions.drop_existing(data, header.get("Currency"), header.get("Account"))
+    return header, _attach_fx(data, header, fx_rates, target_currency)
+
+
+# ---------- RESULT TRANSPORT ----------
+# Frames coming back from worker processes are pickled through the result pipe by
+# default: the worker serialises every string, the parent rebuilds every object.
+# With "arrow" the worker writes the frame as an Arrow IPC file into shared memory
+# (/dev/shm, or the temp directory where there is none) and only a SharedFrame
+# handle travels through the pipe. The parent memory-maps the file and builds the
+# frame on top of the mapped buffers: numeric columns without gaps and the
+# Arrow-backed string columns of pandas >= 3 are used in place, not copied.
+TRANSPORTS = ("pickle", "arrow")
+SHARED_MEMORY_DIR = "/dev/shm"
+
+
+def available_transports() -> list:
+    transports = ["pickle"]
+    if importlib.util.find_spec("pyarrow") is not None:
+        transports.append("arrow")
+    return transports
+
+
+def resolve_transport(transport: str = None) -> str:
+    """None and "auto" mean arrow when pyarrow is installed; explicit choices are checked."""
+    if transport in (None, "", "auto"):
+        return available_transports()[-1]
+
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unknown transport '{transport}'. Choose from: {', '.join(TRANSPORTS)}.")
+
+    if transport not in available_transports():
+        logger.warning(f"Transport '{transport}' is not available, using 'pickle'.")
+        return "pickle"
+
+    return transport
+
+
+class SharedFrame:
+    """Handle of a frame a worker process wrote to shared memory; see receive_frame()."""
+
+    def __init__(self, path: str, rows: int):
+        self.path = path
+        self.rows = rows
+
+    def __repr__(self):
+        return f"SharedFrame({self.path!r}, rows={self.rows})"
+
+
+def share_frame(data, transport: str = "arrow"):
+    """
+    Runs in a worker: data as a SharedFrame, or data itself when it goes through pickle.
+    Frames whose object columns hold anything but text keep using pickle: Arrow would
+    infer a type for them (1 and 2.5 become 1.0 and 2.5) and change the CSV.
+    """
+    if transport != "arrow" or not isinstance(data, pd.DataFrame) or not _arrow_safe(data):
+        return data
+
+    import pyarrow as pa
+
+    directory = SHARED_MEMORY_DIR if os.path.isdir(SHARED_MEMORY_DIR) else None
+    handle, path = tempfile.mkstemp(prefix="xtb-", suffix=".arrow", dir=directory)
+    os.close(handle)
+    try:
+        table = pa.Table.from_pandas(data, preserve_index=True)
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    except Exception as e:
+        logger.debug(f"Sending the frame through pickle, Arrow could not write it: {e}")
+        release_frame(SharedFrame(path, 0))
+        return data
+
+    return SharedFrame(path, len(data))
+
+
+def _arrow_safe(data: pd.DataFrame) -> bool:
+    return all(
+        pd.api.types.infer_dtype(column, skipna=True) in ("string", "empty")
+        for _, column in data.items() if column.dtype == object
+    )
+
+
+def receive_frame(value):
+    """
+    Runs in the parent: the frame behind a SharedFrame (anything else is returned as is).
+    The file is unlinked as soon as it is mapped; the memory is freed with the last
+    column that uses it.
+    """
+    if not isinstance(value, SharedFrame):
+        return value
+
+    import pyarrow as pa
+
+    try:
+        if value.path.startswith(SHARED_MEMORY_DIR + os.sep):
+            with pa.memory_map(value.path) as source:
+                table = pa.ipc.open_file(source).read_all()
+        else:
+            # Regular temp files cannot be unlinked while mapped everywhere; read them instead.
+            with pa.OSFile(value.path) as source:
+                table = pa.ipc.open_file(source).read_all()
+    finally:
+        release_frame(value)
+
+    return table.to_pandas(split_blocks=True)
+
+
+def release_frame(value):
+    """Remove the shared memory of a SharedFrame that will not be received."""
+    if isinstance(value, SharedFrame):
+        try:
+            os.remove(value.path)
+        except OSError:
+            pass
+
+
+# ---------- CONVERT SHEETS CONCURRENTLY ----------
+# Export -> sheet kind it reads. "header" only reads the account header of the cash sheet.
+SHEET_EXPORTS = {"default": "cash", "open": "open", "closed": "closed", "deposit": "cash", "header": "cash"}
+# Estimated peak memory above which sheet exports run in processes, about 4k cash operations.
+# Advanced exports (open, closed, deposit) of generated reports, on Linux (fork), thread vs process:
+#   200 ops 0.18 s vs 0.18 s, 3k ops 2.8 s vs 2.6 s, 10k ops 8.0 s vs 6.5 s, 50k ops 44 s vs 44 s.
+# That is on one CPU, where the sheets cannot overlap: the forked pool costs next to nothing, so with
+# more CPUs processes only gain. Spawned workers (Windows, macOS) import pandas first, hence the floor.
+SHEET_PROCESS_MIN_MB = 16
+
+
+def convert_sheet(xlsx_path, export: str, sheet_index: int, df: pd.DataFrame = None, table: pd.DataFrame = None,
+                  total: dict = None, engine: str = None, backend: str = None, chunk_rows: int = None,
+                  bounds: tuple = None, quarantine: list = None, failed: list = None, timings: list = None) -> tuple:
+    """
+    Run one export of one sheet and return (sheet header, data).
+
+    Every call works on its own CashOperationXLSXReader and only reads the
+    df/table it is given, so exports of the same report can run at the same time.
+    Rows set aside by validate_rows() are appended to quarantine, when given.
+    The export_* methods log their errors and return an empty frame; when the export
+    failed, (export, error message) is appended to failed, when given. The reader's stage
+    timings (see timed_stage) are appended to timings, when given.
+    """
+    reader = CashOperationXLSXReader(xlsx_path, sheet_index, df=df, table=table, engine=engine, backend=backend,
+                                     date_bounds=bounds)
+    reader.total = total
+    header = reader.read_header()
+
+    if export == "header":
+        return header, None
+    if export == "default":
+        data = reader.export_default_cash_operations(chunk_rows=chunk_rows)
+    elif export == "open":
+        data = reader.export_open_operations()
+    elif export == "closed":
+        data = reader.export_closed_operations()
+    elif export == "deposit":
+        data = reader.export_simplified_deposit_of_operation()
+    else:
+        raise ValueError(f"Unknown export '{export}'. Choose from: {', '.join(SHEET_EXPORTS)}.")
+
+    if quarantine is not None and not reader.quarantined.empty:
+        quarantine.append(reader.quarantined)
+    if failed is not None and reader.error is not None:
+        failed.append((export, reader.error))
+    if timings is not None:
+        timings.append(reader.timings)
+    return header, data
+
+
+def convert_sheets(xlsx_path, exports: list, layout: dict, parsed: dict = None, engine: str = None,
+                   backend: str = None, chunk_rows: int = None, workers: int = None, executor: str = None,
+                   bounds: tuple = None, transport: str = None, quarantine: list = None,
+                   failed: list = None, timings: list = None) -> tuple:
+    """
+    Run the exports of one report concurrently, one job per sheet export.
+    Returns (cash sheet header, [data of each export, in the order of exports]).
+
+    executor is "thread" or "process", None lets choose_sheet_executor() pick one;
+    workers=1 runs the exports one after another.
+    Each job reads its own sheet, so a report takes about as long as its slowest sheet.
+    bounds (see date_bounds) drop the rows outside a date range before normalisation.
+    transport (see TRANSPORTS) is how process workers send their frames back.
+    Quarantined rows (see validate_rows) are appended to quarantine, sheet by sheet in the order of exports.
+    Failed exports are appended to failed as (export, error message), see convert_sheet(). They come
+    back with the results, whichever thread or process ran them, and so do the stage timings
+    appended to timings.
+    """
+    jobs = list(exports)
+    if not any(SHEET_EXPORTS[export] == "cash" for export in jobs):
+        jobs.append("header")
+
+    arguments = []
+    for export in jobs:
+        kind = SHEET_EXPORTS[export]
+        kwargs = {"engine": engine, "backend": backend, "chunk_rows": chunk_rows, "bounds": bounds}
+        if parsed is not None:
+            kwargs.update(df=parsed["heads"][kind], table=parsed["tables"][kind],
+                          total=parsed["total"] if kind == "cash" else None)
+        arguments.append(((_own_source(xlsx_path, len(jobs)), export, layout[kind]), kwargs))
+
+    rejected = [[] for _ in jobs]  # Quarantined rows of each job.
+    errors = [[] for _ in jobs]    # Failure of each job.
+    stages = [[] for _ in jobs]    # Stage timings of each job.
+
+    if len(jobs) > 1 and workers != 1 and executor is None:
+        executor = choose_sheet_executor(xlsx_path, parsed)
+
+    if len(jobs) == 1 or workers == 1:
+        results = [convert_sheet(*args, **kwargs, quarantine=found, failed=error, timings=timed)
+                   for (args, kwargs), found, error, timed in zip(arguments, rejected, errors, stages)]
+    elif executor == "process":
+        transport = resolve_transport(transport)
+        with ProcessPoolExecutor(max_workers=workers or len(jobs)) as pool:
+            futures = [pool.submit(_convert_sheet_shared, transport, *args, **kwargs) for args, kwargs in arguments]
+            try:
+                results = []
+                for future, found, error, timed in zip(futures, rejected, errors, stages):
+                    header, data, quarantined, job_failed, job_timings = future.result()
+                    found.extend(quarantined)
+                    error.extend(job_failed)
+                    timed.extend(job_timings)
+                    results.append((header, receive_frame(data)))
+            finally:
+                for future in futures:
+                    if future.done() and not future.cancelled() and future.exception() is None:
+                        release_frame(future.result()[1])
+    else:
+        with ThreadPoolExecutor(max_workers=workers or len(jobs)) as pool:
+            futures = [pool.submit(convert_sheet, *args, **kwargs, quarantine=found, failed=error, timings=timed)
+                       for (args, kwargs), found, error, timed in zip(arguments, rejected, errors, stages)]
+            results = [future.result() for future in futures]
+
+    if quarantine is not None:
+        for found in rejected:
+            quarantine.extend(found)
+    if failed is not None:
+        for error in errors:
+            failed.extend(error)
+    if timings is not None:
+        for timed in stages:
+            timings.extend(timed)
+
+    header = next(result[0] for export, result in zip(jobs, results) if SHEET_EXPORTS[export] == "cash")
+    frames = [result[1] for export, result in zip(jobs, results) if export != "header"]
+    return header, frames
+
+
+def choose_sheet_executor(xlsx_path, parsed: dict = None) -> str:
+    """
+    "process" for reports estimated above SHEET_PROCESS_MIN_MB (see estimate_report_memory),
+    "thread" otherwise. Reading and normalising a sheet hold the GIL, so threads mostly take
+    turns; processes pay a pool start (re-importing pandas where workers are spawned) that only
+    larger reports earn back. Threads are kept for parsed reports, whose frames would have to be
+    pickled to the workers, on a single CPU, and inside worker processes (convert_reports, the
+    conversion server), which are parallel already.
+    """
+    if parsed is not None or (os.cpu_count() or 1) < 2 or multiprocessing.parent_process() is not None:
+        return "thread"
+    try:
+        estimate = estimate_report_memory(xlsx_path)
+    except (OSError, zipfile.BadZipFile):
+        return "thread"
+    return "process" if estimate["bytes"] >= SHEET_PROCESS_MIN_MB * 2 ** 20 else "thread"
+
+
+def _convert_sheet_shared(transport: str, *args, **kwargs) -> tuple:
+    """convert_sheet() in a worker process, handing the data back through share_frame(), the quarantine,
+    the failure and the stage timings."""
+    quarantined = []
+    failed = []
+    timings = []
+    header, data = convert_sheet(*args, **kwargs, quarantine=quarantined, failed=failed, timings=timings)
+    return header, share_frame(data, transport), quarantined, failed, timings
+
+
+def _own_source(source, jobs: int):
+    """Concurrent jobs must not share the read position of an uploaded file; give each its own buffer."""
+    if jobs > 1 and hasattr(source, "seek"):
+        _rewind(source)
+        return io.BytesIO(source.getvalue() if hasattr(source, "getvalue") else source.read())
+    return source
+
+
+# ---------- CONVERT MANY REPORTS ----------
+def convert_reports(paths: list, workers: int = None, executor: str = "process", transport: str = None,
+                    profile_dir: str = None, **options):
+    """
+    Convert many reports concurrently and yield one result per report as soon as it is done,
+    in completion order. options are the keyword arguments of convert_report().
+
+    Every result is a dict:
+        path, header, data   - as returned by convert_report() (header/data are None on failure)
+        timings              - wait_s (queued), parse_s, convert_s and total_s, in seconds
+        errors               - messages of errors raised or logged during the conversion;
+                               the export_* methods log theirs and return an empty frame
+        failed               - exports that failed ("default", "open", ...); their rows are missing from data
+        quarantine           - rows left out as malformed (see validate_rows), None when there are none
+        ok                   - True when nothing went wrong
+
+    executor is "process" or "thread". Closing the generator early cancels the reports not started yet.
+    Process workers send data back as set by transport (see TRANSPORTS, default: arrow when available).
+    With profile_dir every conversion is profiled (see profiling.py) and the result gets
+    "profile": (stats path, summary path) of the files saved there.
+    Zip archives in paths are converted report by report (see expand_archives), without extracting them.
+    """
+    paths = expand_archives(paths)
+    pool_class = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+    transport = "pickle" if executor == "thread" else resolve_transport(transport)
+    pool = pool_class(max_workers=workers)
+    futures = {}
+    try:
+        same_name = {}
+        for path in paths:
+            # Reports of the same name (e.g. from different archives) get numbered profiles.
+            number = same_name[report_name(path)] = same_name.get(report_name(path), 0) + 1
+            profile = (profile_dir, number) if profile_dir is not None else None
+            futures[pool.submit(_convert_one, path, options, time.time(), transport, profile)] = path
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+                result["data"] = receive_frame(result["data"])
+                yield result
+            except Exception as e:  # The worker itself died, e.g. a killed process.
+                logging.exception(e)
+                yield {"path": futures[future], "header": None, "data": None, "timings": {},
+                       "errors": [f"{type(e).__name__}: {e}"], "failed": [], "quarantine": None, "ok": False}
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        for future in futures:  # Finished after the generator was closed, never received.
+            if not future.cancelled() and future.exception() is None:
+                release_frame(future.result()["data"])
+
+
+def _convert_one(path, options: dict, submitted: float, transport: str = "pickle", profile: tuple = None) -> dict:
+    """
+    Runs in a worker: parse and convert one report, collecting the errors logged meanwhile.
+    profile is (directory, number) to profile the conversion, see profiling.profile_base_path().
+    """
+    started = time.time()
+    result = {"path": path, "header": None, "data": None, "errors": [], "failed": [], "quarantine": None}
+    timings = {"wait_s": started - submitted}
+    rejected = []
+    failed = []
+
+    capture = None
+    if profile is not None:
+        from profiling import ConversionProfile
+        capture = ConversionProfile()
+        options = {**options, "sheet_workers": 1}  # cProfile only sees this thread.
+
+    collector = _ErrorCollector()
+    logging.getLogger().addHandler(collector)
+    try:
+        with capture or contextlib.nullcontext():
+            default = options.get("default", True)
+            kinds = ["cash"] + [kind for kind, option in (("open", "open_positions"), ("closed", "closed_positions"))
+                                if not default and options.get(option)]
+            parsed = parse_report(path, options.get("engine"), kinds=kinds, memory_budget_mb=options.get("memory_budget_mb"),
+                                  date_from=options.get("date_from"), date_to=options.get("date_to"))
+            timings["parse_s"] = time.time() - started
+
+            result["header"], result["data"] = convert_report(path, parsed=parsed, quarantine=rejected, failed=failed,
+                                                              **options)
+            timings["convert_s"] = time.time() - started - timings["parse_s"]
+    except Exception as e:
+        logging.exception(e)
+        raised = f"{type(e).__name__}: {e}"
+        if raised not in collector.messages:
+            collector.messages.append(raised)  # Also when ERROR records are filtered out.
+    finally:
+        logging.getLogger().removeHandler(collector)
+
+    if capture is not None:
+        from profiling import profile_base_path
+        try:
+            currency = (result["header"] or {}).get("Currency", "")
+            result["profile"] = capture.save(profile_base_path(path, profile[0], currency, profile[1]), str(path))
+        except OSError as e:
+            logging.exception(e)
+
+    timings["total_s"] = time.time() - started
+    result["timings"] = {name: round(seconds, 4) for name, seconds in timings.items()}
+    # Exports run on other threads or processes than the collector's; their failures come back in failed.
+    result["errors"] = collector.messages + [message for _, message in failed if message not in collector.messages]
+    result["failed"] = [export for export, _ in failed]
+    if rejected:
+        result["quarantine"] = quarantine_frame(rejected)
+    result["ok"] = result["data"] is not None and not result["errors"]
+    result["data"] = share_frame(result["data"], transport)
+    return result
+
+
+class _ErrorCollector(logging.Handler):
+    """
+    Collects ERROR records of the thread that created it (one conversion per worker thread).
+    Sheet exports running on threads of their own report their failures through convert_report(failed=...).
+    """
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.thread = threading.get_ident()
+        self.messages = []
+
+    def emit(self, record):
+        if record.thread == self.thread:
+            message = record.getMessage()
+            if record.exc_info and record.exc_info[1] is not None:
+                message = f"{type(record.exc_info[1]).__name__}: {message}"
+            self.messages.append(message)
+
+
+def _attach_fx(data: pd.DataFrame, header: dict, fx_rates, target_currency: str) -> pd.DataFrame:
+    if fx_rates is None or not target_currency or not header.get("Currency"):
+        return data
+    return fx_rates.attach(data, header["Currency"], target_currency)
+
+
+def export_file_name(xlsx_path: str, currency) -> str:
+    return f"{os.path.splitext(report_name(xlsx_path))[0]}_XTB_{currency}.csv"
+
+
+def numbered_export_path(export_dir: str, xlsx_path, currency, taken) -> str:
+    """
+    export_file_name() in export_dir, numbered (_2, _3, ...) when taken already holds that path,
+    as for same-named reports from different folders or archives.
+    """
+    base, extension = os.path.splitext(export_file_name(xlsx_path, currency))
+    target = os.path.join(export_dir, base + extension)
+    number = 2
+    while target in taken:
+        target = os.path.join(export_dir, f"{base}_{number}{extension}")
+        number += 1
+    return target
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.NOTSET, filename="log.log", filemode="w", format="%(asctime)s - %(lineno)d - %(levelname)s - %(message)s")
 
     path = r""
+    layout = discover_sheet_layout(path)
 
     # ---------- CASH OPERATIONS HISTORY ----------
-    cash_operations_history = CashOperationXLSXReader(path, sheet_index=3)
+    cash_operations_history = CashOperationXLSXReader(path, sheet_index=layout["cash"])
     cash_operations_history.export_default_cash_operations()
     #print(cash_operations_history.operations.tail())
     #cash_operations_history.operations.to_excel("cash_operations.xlsx", index=False)
     #cash_operations_history.operations.to_csv("cash_operations.csv", index=False, sep=',')
 
     # ---------- OPEN OPERATIONS ----------
-    cash_open_operations = CashOperationXLSXReader(path, sheet_index=1)
+    cash_open_operations = CashOperationXLSXReader(path, sheet_index=layout["open"])
     cash_open_operations.export_open_operations()
     #print(cash_open_operations.operations.tail())
     #cash_open_operations.operations.to_excel("cash_open_operations.xlsx", index=False)
     #cash_open_operations.operations.to_csv("cash_open_operations.csv", index=False, sep=',')
 
     # ---------- CLOSED OPERATIONS ----------
-    cash_closed_operations = CashOperationXLSXReader(path, sheet_index=0)
+    cash_closed_operations = CashOperationXLSXReader(path, sheet_index=layout["closed"])
     cash_closed_operations.export_closed_operations()
     #print(cash_closed_operations.operations.tail())
     #cash_closed_operations.operations.to_excel("cash_operations.xlsx", index=False)
     #cash_closed_operations.operations.to_csv("cash_closed_operations.csv", index=False, sep=',')
 
     # ---------- DEPOSIT ----------
-    cash_deposit = CashOperationXLSXReader(path, sheet_index=3)
+    cash_deposit = CashOperationXLSXReader(path, sheet_index=layout["cash"])
     cash_deposit.export_simplified_deposit_of_operation()
     #print(cash_deposit.operations.tail())
     #cash_deposit.operations.to_excel("cash_deposit.xlsx", index=False)
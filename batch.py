@@ -0,0 +1,243 @@
+"""
+Resumable batch conversion of many reports into one export directory.
+
+    python batch.py reports/*.xlsx archive.zip out/ --workers 4
+    python batch.py reports/*.xlsx archive.zip out/          # after a crash: picks up where it stopped
+
+Progress is kept in a manifest (out/manifest.json by default) with the state of
+every report: pending, done (output file, its SHA-256 and row count) or failed
+(the error). The manifest is rewritten atomically after every report, so an
+interrupted run leaves a consistent file behind. A resumed run skips reports
+that are done, unchanged and whose CSV is still on disk with the same hash,
+and converts the pending and failed ones again. Changing the export options
+starts the batch over.
+
+Malformed rows do not fail a report: they go to <output>_quarantine.csv with
+the reason, and the manifest counts them. A failed export does: no CSV is
+written, so a resumed run tries the report again.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from XTB_converter import (
+    BACKENDS, READER_ENGINES, TRANSPORTS, convert_reports, expand_archives, file_stamp, numbered_export_path
+)
+from profiling import move_profile
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+# Options recorded in the manifest; a different value means the outputs are stale.
+RECORDED_OPTIONS = ("default", "open_positions", "closed_positions", "simplified_deposit", "date_from", "date_to")
+
+
+# ---------- MANIFEST ----------
+class BatchManifest:
+    def __init__(self, path: str, options: dict):
+        self.path = path
+        self.options = {key: options.get(key) for key in RECORDED_OPTIONS}
+        self.files = {}
+
+        state = self._read()
+        if state is not None and state.get("version") == MANIFEST_VERSION:
+            if state.get("options") == self.options:
+                self.files = state.get("files", {})
+            else:
+                logger.warning(f"Export options changed since {path} was written; converting every report again.")
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+            return None
+
+    def save(self):
+        """Write to a temporary file and rename it over the manifest, so it is never half-written."""
+        partial = self.path + ".part"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "options": self.options, "files": self.files}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial, self.path)
+
+    def is_done(self, path: str) -> bool:
+        """Done, made from the same input, and the output is still there unchanged."""
+        entry = self.files.get(path)
+        if entry is None or entry["state"] != DONE:
+            return False
+        if entry.get("stamp") != _stamp(path):
+            return False
+        output = entry.get("output")
+        return output is not None and os.path.exists(output) and file_sha256(output) == entry.get("sha256")
+
+    def mark(self, path: str, state: str, **details):
+        entry = self.files.setdefault(path, {"attempts": 0})
+        if state != PENDING:
+            entry["attempts"] = entry.get("attempts", 0) + 1
+        entry.update(state=state, stamp=_stamp(path),
+                     updated_at=datetime.datetime.now().isoformat(timespec="seconds"), **details)
+        for stale in {DONE: ("error",), FAILED: ("output", "sha256", "rows")}.get(state, ()):
+            entry.pop(stale, None)
+
+    def outputs(self, exclude: str = None) -> set:
+        return {entry["output"] for path, entry in self.files.items() if path != exclude and entry.get("output")}
+
+
+def _stamp(path: str):
+    try:
+        return list(file_stamp(path))
+    except OSError:
+        return None
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, content: bytes):
+    partial = path + ".part"
+    with open(partial, "wb") as f:
+        f.write(content)
+    os.replace(partial, path)
+
+
+# ---------- RUN ----------
+def run_batch(paths: list, export_dir: str, manifest_path: str = None, workers: int = None,
+              executor: str = "process", transport: str = None, profile: bool = False, **options) -> dict:
+    """
+    Convert paths (reports or zip archives) into export_dir, skipping reports the
+    manifest lists as done. options are convert_report() keyword arguments.
+    With profile, each conversion's profile (see profiling.py) is saved beside its CSV, named after it:
+    <output>.prof and <output>_profile.txt.
+    Malformed rows are left out and written to <output>_quarantine.csv with the reason.
+    A report with any selected export failed is marked failed, without writing a partial CSV.
+    Returns {"done", "skipped", "failed"} report counts and the "quarantined" rows of this run.
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    manifest = BatchManifest(manifest_path or os.path.join(export_dir, MANIFEST_NAME), options)
+
+    reports = expand_archives(paths)
+    todo = [path for path in reports if not manifest.is_done(path)]
+    for path in todo:
+        if manifest.files.get(path, {}).get("state") != FAILED:
+            manifest.mark(path, PENDING)
+    manifest.save()
+
+    summary = {"done": 0, "skipped": len(reports) - len(todo), "failed": 0, "quarantined": 0}
+    if summary["skipped"]:
+        logger.info(f"Skipping {summary['skipped']} reports already converted.")
+
+    # Workers save profiles here first; they are renamed after the CSV once its name is known.
+    staging = tempfile.mkdtemp(prefix=".profiles-", dir=export_dir) if profile else None
+    try:
+        for result in convert_reports(todo, workers=workers, executor=executor, transport=transport,
+                                      profile_dir=staging, **options):
+            _record(result, export_dir, manifest, summary)
+    finally:
+        if staging is not None:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    return summary
+
+
+def _record(result: dict, export_dir: str, manifest: BatchManifest, summary: dict):
+    """Write the outputs of one converted report and record it in the manifest and the summary."""
+    path = result["path"]
+    currency = (result["header"] or {}).get("Currency") or ""
+    target = manifest.files[path].get("output") or numbered_export_path(
+        export_dir, path, currency, manifest.outputs(exclude=path))
+
+    # A failed export would leave its rows out of the CSV: the report is retried instead of written partially.
+    if result["data"] is None or result["header"] is None or result["failed"]:
+        manifest.mark(path, FAILED, error="; ".join(result["errors"]) or "No output.")
+        summary["failed"] += 1
+        logger.error(f"{path}: {manifest.files[path]['error']}")
+    else:
+        content = result["data"].to_csv(index=False).encode("utf-8")
+
+        _write_atomic(target, content)
+
+        quarantine = result["quarantine"]
+        if quarantine is not None:
+            # Malformed rows: fix them in the report and rerun, the rest is converted already.
+            quarantine_path = target[:-len(".csv")] + "_quarantine.csv"
+            _write_atomic(quarantine_path, quarantine.to_csv(index=False).encode("utf-8"))
+            logger.warning(f"{path}: {len(quarantine)} rows quarantined to {quarantine_path}")
+
+        manifest.mark(path, DONE, output=target, sha256=hashlib.sha256(content).hexdigest(),
+                      rows=len(result["data"]), warnings=result["errors"],
+                      quarantined=0 if quarantine is None else len(quarantine),
+                      quarantine=None if quarantine is None else quarantine_path)
+        summary["done"] += 1
+        summary["quarantined"] += 0 if quarantine is None else len(quarantine)
+        logger.info(f"{path} -> {target} ({len(result['data'])} rows)")
+
+    if "profile" in result:
+        # Named like the CSV (or the CSV a failed report would get), so they pair up by name.
+        manifest.files[path]["profile"] = move_profile(result["profile"], target[:-len(".csv")])[1]
+
+    manifest.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable batch conversion of XTB reports.")
+    parser.add_argument("paths", nargs="+", help="XTB .xlsx reports or zip archives of them.")
+    parser.add_argument("export_dir")
+    parser.add_argument("--manifest", help=f"Progress manifest (default: <export dir>/{MANIFEST_NAME}).")
+    parser.add_argument("--open", action="store_true", help="Export open positions (advanced mode).")
+    parser.add_argument("--closed", action="store_true", help="Export closed positions (advanced mode).")
+    parser.add_argument("--deposit", action="store_true", help="Export simplified deposit (advanced mode).")
+    parser.add_argument("--engine", choices=("auto",) + READER_ENGINES, default="auto")
+    parser.add_argument("--backend", choices=BACKENDS, default="pandas", help="Normalisation backend.")
+    parser.add_argument("--from", dest="date_from", help="Only export operations from this day (YYYY-MM-DD).")
+    parser.add_argument("--to", dest="date_to", help="Only export operations up to this day (YYYY-MM-DD).")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--transport", choices=TRANSPORTS, default=None,
+                        help="How workers send results back (default: arrow shared memory when pyarrow is installed).")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile every conversion and save the stats and a hotspot summary beside its CSV.")
+    parser.add_argument("--memory-budget-mb", type=float, default=None,
+                        help="Reports estimated above this are converted in low-memory mode (default: XTB_MEMORY_BUDGET_MB or 1024).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    summary = run_batch(
+        args.paths, args.export_dir, args.manifest, workers=args.workers, transport=args.transport, profile=args.profile,
+        default=not (args.open or args.closed or args.deposit),
+        open_positions=args.open,
+        closed_positions=args.closed,
+        simplified_deposit=args.deposit,
+        engine=args.engine,
+        backend=args.backend,
+        date_from=args.date_from,
+        date_to=args.date_to,
+        memory_budget_mb=args.memory_budget_mb,
+    )
+    print(f"{summary['done']} converted, {summary['skipped']} already done, {summary['failed']} failed, "
+          f"{summary['quarantined']} rows quarantined")
+    raise SystemExit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Benchmarks of the conversion, on real reports or generated XTB-like ones.
+
+    python benchmark.py engines report1.xlsx report2.xlsx --repeat 3
+    python benchmark.py engines --rows 20000 --engines openpyxl calamine
+    python benchmark.py scaling --files 1 8 32 --rows 1000 20000 --cfd-share 0 0.3 --workers 1 4 --output scaling.json
+
+engines times the reading (load) and the whole conversion (convert) of each
+report with every reader engine, best of --repeat runs, with the speedup
+against --baseline. Without report paths it runs on a generated report of
+--rows cash operations.
+
+scaling converts generated report sets the way process_files does, over a grid
+of file count, rows per file, CFD share and worker count. Every configuration
+runs in a fresh process pool and records throughput (rows/s, files/s), per-file
+latency percentiles and peak RSS of the parent and the workers. Results are
+printed and, with --output, written as JSON.
+
+Generated reports are cached in --cache-dir and reused across runs.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from XTB_converter import (
+    BACKENDS, READER_ENGINES, available_engines, convert_report, discover_sheet_layout, load_sheets
+)
+
+STOCKS = ["AAPL.US", "MSFT.US", "CDR.PL", "PKN.PL", "VWCE.DE", "SXR8.DE"]
+CFDS = ["US500", "DE40", "EURUSD", "OIL", "GOLD"]
+GENERATOR_VERSION = 3  # Part of the cached report names; bump when generate_report changes its output.
+
+
+# ---------- REPORT GENERATOR ----------
+def _header_rows(currency, balance="0"):
+    return [
+        [],
+        [None, "Name and surname", None, "Account", "Currency"],
+        [None, "Benchmark", None, 10000000, currency],
+        [],
+        [None, "Balance", "Equity", "Margin", "Free margin", "Margin level"],
+        [None, balance, "0", 0, "0", None],
+        [],
+    ]
+
+
+def generate_report(path: str, rows: int, cfd_share: float, currency: str = "PLN", seed: int = 0):
+    """Write an XTB-like report with `rows` cash operations and a matching number of positions."""
+    from openpyxl import Workbook
+
+    rnd = random.Random(seed)
+    start = datetime.datetime(2020, 1, 2, 9, 0)
+
+    wb = Workbook(write_only=True)
+    closed = wb.create_sheet("CLOSED POSITION HISTORY")
+    opened = wb.create_sheet("OPEN POSITION")
+    wb.create_sheet("PENDING ORDERS HISTORY")
+    cash = wb.create_sheet("CASH OPERATION HISTORY")
+
+    for row in _header_rows(currency):
+        closed.append(row)
+    closed.append([None, "Position", "Symbol", "Type", "Volume", "Open time", "Open price", "Close time", "Close price",
+                   "Open origin", "Close origin", "Purchase value", "Sale value", "SL", "TP", "Margin", "Commission",
+                   "Swap", "Rollover", "Gross P/L", "Comment"])
+    for i in range(max(1, rows // 4)):
+        symbol = rnd.choice(CFDS) if rnd.random() < cfd_share else rnd.choice(STOCKS)
+        opened_at = start + datetime.timedelta(hours=7 * i)
+        volume, open_price = rnd.randint(1, 20), round(rnd.uniform(10, 500), 2)
+        close_price = round(open_price * rnd.uniform(0.8, 1.2), 2)
+        closed.append([None, 1000000 + i, symbol, "BUY", volume, opened_at, open_price,
+                       opened_at + datetime.timedelta(days=3), close_price, "WEB", "WEB",
+                       round(volume * open_price, 2), round(volume * close_price, 2), 0, 0, 0, 0, 0, 0,
+                       round(volume * (close_price - open_price), 2), ""])
+    closed.append([None, "Total"])
+
+    for row in _header_rows(currency):
+        opened.append(row)
+    opened.append([None, "Position", "Symbol", "Type", "Volume", "Open time", "Open price", "Market price",
+                   "Purchase value", "SL", "TP", "Margin", "Commission", "Swap", "Rollover", "Gross P/L", "Comment"])
+    for i in range(max(1, rows // 8)):
+        volume, open_price = rnd.randint(1, 20), round(rnd.uniform(10, 500), 2)
+        opened.append([None, 2000000 + i, rnd.choice(STOCKS), "BUY", volume, start + datetime.timedelta(hours=11 * i),
+                       open_price, open_price, round(volume * open_price, 2), 0, 0, 0, 0, 0, 0, 0, ""])
+    opened.append([None, "Total"])
+
+    operations = []
+    total = 0.0
+    for i in range(rows):
+        draw = rnd.random()
+        if i == 0:
+            draw = 1.0  # The account history starts with a deposit, as it does from inception.
+        symbol = rnd.choice(STOCKS)
+        volume, price = rnd.randint(1, 20), round(rnd.uniform(10, 500), 2)
+        if draw < cfd_share:
+            kind, symbol, amount, comment = "close trade", rnd.choice(CFDS), round(rnd.uniform(-100, 100), 2), f"CLOSE BUY 1 @ {price}"
+        elif draw < cfd_share + (1 - cfd_share) * 0.5:
+            kind, amount, comment = "Stock purchase", -round(volume * price, 2), f"OPEN BUY {volume} @ {price}"
+        elif draw < cfd_share + (1 - cfd_share) * 0.7:
+            kind, amount, comment = "Stock sale", round(volume * price, 2), f"CLOSE BUY {volume}/{volume + 1} @ {price}"
+        elif draw < cfd_share + (1 - cfd_share) * 0.85:
+            kind, amount, comment = "DIVIDENT", round(rnd.uniform(1, 50), 2), f"{symbol} USD 0.2400/ SHR"
+        else:
+            kind, symbol, amount, comment = "deposit", None, round(rnd.uniform(100, 5000), 2), "Deposit"
+        total += amount
+        operations.append([None, 5000000 + i, kind, start + datetime.timedelta(hours=3 * i), comment, symbol, amount])
+
+    # The cash sheet header carries the balance the operations add up to, as in a full-history export.
+    for row in _header_rows(currency, round(total, 2)):
+        cash.append(row)
+    cash.append([None, "ID", "Type", "Time", "Comment", "Symbol", "Amount"])
+    for row in operations:
+        cash.append(row)
+    cash.append([None, "Total", None, None, None, None, round(total, 2), currency])
+
+    wb.save(path)
+
+
+def report_set(cache_dir: str, files: int, rows: int, cfd_share: float) -> list:
+    """Paths of a generated report set, reused across runs."""
+    paths = []
+    for i in range(files):
+        path = os.path.join(cache_dir, f"report_v{GENERATOR_VERSION}_r{rows}_c{int(cfd_share * 100)}_{i}.xlsx")
+        if not os.path.exists(path):
+            generate_report(path, rows, cfd_share, seed=i)
+        paths.append(path)
+    return paths
+
+
+# ---------- MEASUREMENT ----------
+def timed(func) -> tuple:
+    """(func(), seconds it took)."""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def best_of(repeat: int, func) -> float:
+    """Fastest of `repeat` runs, in seconds."""
+    return min(timed(func)[1] for _ in range(repeat))
+
+
+def peak_rss_mb(children: bool = False):
+    """Peak resident set size of this process (or its finished children) in MB, None if unknown."""
+    try:
+        import resource
+    except ImportError:
+        if children:
+            return None
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+        except ImportError:
+            return None
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _convert(path: str, options: dict) -> dict:
+    """Runs in a worker: one process_files-equivalent conversion."""
+    logging.disable(logging.WARNING)
+
+    def convert():
+        header, data = convert_report(path, **options)
+        data.to_csv(os.devnull, index=False)
+        return len(data)
+
+    rows, seconds = timed(convert)
+    return {"rows": rows, "seconds": seconds, "peak_rss_mb": peak_rss_mb()}
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+# ---------- ENGINES ----------
+def bench_file(xlsx_path: str, engines: list, repeat: int) -> dict:
+    results = {}
+
+    layout = discover_sheet_layout(xlsx_path)
+
+    for engine in engines:
+        results[engine] = {
+            "load": best_of(repeat, lambda: load_sheets(xlsx_path, layout.values(), engine)),
+            "convert": best_of(repeat, lambda: convert_report(xlsx_path, engine=engine)),
+        }
+
+    return results
+
+
+def print_results(xlsx_path: str, results: dict, baseline: str):
+    size_mb = os.path.getsize(xlsx_path) / 1024 / 1024
+    print(f"\n{os.path.basename(xlsx_path)} ({size_mb:.1f} MB)")
+    print(f"{'engine':<10} {'stage':<10} {'time [s]':>10} {'speedup':>9}")
+
+    for engine, stages in results.items():
+        for stage, seconds in stages.items():
+            base = results.get(baseline, {}).get(stage)
+            speedup = f"{base / seconds:.2f}x" if base and seconds else "-"
+            print(f"{engine:<10} {stage:<10} {seconds:>10.3f} {speedup:>9}")
+
+
+def run_engines(args):
+    paths = args.paths or report_set(args.cache_dir, 1, args.rows, args.cfd_share)
+    for path in paths:
+        print_results(path, bench_file(path, args.engines, args.repeat), args.baseline)
+
+
+# ---------- SCALING ----------
+def run_config(paths: list, workers: int, options: dict) -> dict:
+    latencies, rows, worker_peaks, failures = [], 0, [], 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Start the workers before the clock: interpreter startup is not batch throughput.
+        list(pool.map(peak_rss_mb, [False] * workers))
+
+        started = time.perf_counter()
+        submitted = {}
+        for path in paths:
+            submitted[pool.submit(_convert, path, options)] = time.perf_counter()
+
+        for future in as_completed(submitted):
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.exception(e)
+                failures += 1
+                continue
+            latencies.append(time.perf_counter() - submitted[future])
+            rows += result["rows"]
+            if result["peak_rss_mb"] is not None:
+                worker_peaks.append(result["peak_rss_mb"])
+
+        wall = time.perf_counter() - started
+
+    return {
+        "wall_s": round(wall, 4),
+        "rows": rows,
+        "failures": failures,
+        "rows_per_s": round(rows / wall, 1) if wall else None,
+        "files_per_s": round(len(paths) / wall, 3) if wall else None,
+        "latency_p50_s": _round(percentile(latencies, 50)),
+        "latency_p90_s": _round(percentile(latencies, 90)),
+        "latency_p99_s": _round(percentile(latencies, 99)),
+        "latency_max_s": _round(max(latencies) if latencies else None),
+        "peak_rss_worker_mb": _round(max(worker_peaks) if worker_peaks else None),
+        "peak_rss_parent_mb": _round(peak_rss_mb()),
+    }
+
+
+def _round(value, digits=4):
+    return None if value is None else round(value, digits)
+
+
+def run_scaling(args):
+    advanced = args.mode == "advanced"
+    options = {
+        "default": not advanced,
+        "open_positions": advanced,
+        "closed_positions": advanced,
+        "simplified_deposit": advanced,
+        "engine": args.engine,
+        "backend": args.backend,
+    }
+
+    results = []
+    for rows in args.rows:
+        for cfd_share in args.cfd_share:
+            for files in args.files:
+                paths = report_set(args.cache_dir, files, rows, cfd_share)
+                for workers in args.workers:
+                    result = {"files": files, "rows_per_file": rows, "cfd_share": cfd_share, "workers": workers,
+                              **run_config(paths, workers, options)}
+                    results.append(result)
+                    print(json.dumps(result), flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+                "mode": args.mode,
+                "engine": args.engine,
+                "backend": args.backend,
+                "results": results,
+            }, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the conversion of XTB reports.")
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "xtb_bench_reports"),
+                        help="Where generated reports are kept.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    engines = commands.add_parser("engines", help="Time reading and converting reports with every reader engine.")
+    engines.add_argument("paths", nargs="*", help="XTB .xlsx reports (default: a generated one).")
+    engines.add_argument("--engines", nargs="+", choices=READER_ENGINES, default=available_engines())
+    engines.add_argument("--baseline", choices=READER_ENGINES, default="openpyxl",
+                         help="Engine the speedup is measured against.")
+    engines.add_argument("--repeat", type=int, default=3)
+    engines.add_argument("--rows", type=int, default=10000, help="Cash operations of the generated report.")
+    engines.add_argument("--cfd-share", type=float, default=0.3, help="CFD share of the generated report.")
+    engines.set_defaults(run=run_engines)
+
+    scaling = commands.add_parser("scaling", help="End-to-end batch conversion scaling harness.")
+    scaling.add_argument("--files", type=int, nargs="+", default=[1, 8])
+    scaling.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    scaling.add_argument("--cfd-share", type=float, nargs="+", default=[0.0, 0.3])
+    scaling.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    scaling.add_argument("--mode", choices=["default", "advanced"], default="default",
+                         help="default: cash operations export; advanced: open + closed positions + deposit.")
+    scaling.add_argument("--engine", choices=("auto",) + READER_ENGINES, default="auto")
+    scaling.add_argument("--backend", choices=BACKENDS, default="pandas")
+    scaling.add_argument("--output", help="Write the results as JSON to this file.")
+    scaling.set_defaults(run=run_scaling)
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    os.makedirs(args.cache_dir, exist_ok=True)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
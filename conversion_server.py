@@ -0,0 +1,395 @@
+"""
+Local HTTP service converting XTB reports to Portfolio Performance CSV.
+
+    python conversion_server.py --port 8765 --workers 4
+
+    curl --data-binary @report.xlsx "http://127.0.0.1:8765/convert?name=report.xlsx"
+    curl -F file=@report.xlsx -F closed=1 -F open=1 http://127.0.0.1:8765/convert
+
+POST /convert takes the report either as the raw request body or as the first
+file of a multipart/form-data upload. Export options come from the query string
+or form fields: open, closed, deposit (advanced mode, like the GUI checkboxes),
+engine, backend, from and to (YYYY-MM-DD, inclusive) and name (used for the
+suggested file name).
+
+The asyncio front end only parses HTTP; conversions run in a bounded pool of
+worker processes that are started and warmed up once, so requests don't pay
+interpreter and pandas import time. A worker hands the converted frame back
+(through shared memory, see XTB_converter.TRANSPORTS) and the server renders
+the CSV CSV_CHUNK_ROWS rows at a time while it streams it with chunked transfer
+encoding, so the first rows go out before the whole CSV exists. A conversion
+that times out gets 504 but keeps its worker slot until the worker is free
+again. When a worker process dies (killed, out of memory) the pool is replaced
+with a fresh one; the conversions it was running get 500. Per-request timings are returned in the Server-Timing header.
+Malformed rows are left out of the CSV; X-Quarantined-Rows says how many.
+A date range without operations gives a CSV with the header only; a report
+that does not convert (or any selected export that fails) gives 422.
+"""
+import argparse
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+
+from XTB_converter import (
+    convert_report, date_bounds, export_file_name, receive_frame, release_frame, resolve_transport, share_frame,
+    EXPORT_COLUMNS, READER_ENGINES, BACKENDS, TRANSPORTS
+)
+
+logger = logging.getLogger(__name__)
+
+CSV_CHUNK_ROWS = 5000  # Rows rendered and sent per chunk of the response.
+TRUE_VALUES = {"1", "true", "yes", "on"}
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+    422: "Unprocessable Entity", 503: "Service Unavailable", 504: "Gateway Timeout", 500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ---------- WORKER PROCESS ----------
+def _warm_up():
+    """Pool initializer: import the heavy modules once per worker process."""
+    import pandas  # noqa: F401
+    import openpyxl  # noqa: F401
+    for optional in ("python_calamine", "polars"):
+        try:
+            __import__(optional)
+        except ImportError:
+            pass
+
+
+def _ping():
+    return os.getpid()
+
+
+def convert_upload(data: bytes, options: dict, transport: str = "pickle") -> tuple:
+    """
+    Runs in a worker process. Returns (header, frame, row count, quarantined rows, convert seconds);
+    the frame is sent back as set by transport, see receive_frame().
+    """
+    start = time.perf_counter()
+    quarantine, failed = [], []
+    header, frame = convert_report(io.BytesIO(data), quarantine=quarantine, failed=failed, **options)
+    quarantined = sum(len(rows) for rows in quarantine)
+    if failed:
+        raise ValueError("; ".join(f"{export} export failed: {message}" for export, message in failed))
+    if frame.empty:
+        if (options.get("date_from") is None and options.get("date_to") is None) or quarantined:
+            raise ValueError(f"No operations could be converted from this report ({quarantined} malformed rows).")
+        if frame.columns.empty:
+            frame = pd.DataFrame(columns=EXPORT_COLUMNS)  # Nothing in the date range: the CSV header only.
+    return header, share_frame(frame, transport), len(frame), quarantined, time.perf_counter() - start
+
+
+def csv_chunks(frame: pd.DataFrame, rows: int = CSV_CHUNK_ROWS):
+    """The CSV of frame, `rows` rows at a time; the header comes with the first chunk."""
+    for start in range(0, max(len(frame), 1), rows):
+        yield frame.iloc[start:start + rows].to_csv(index=False, header=start == 0).encode("utf-8")
+
+
+def _discard_result(future):
+    """Done callback of a conversion nobody waits for any more (timed out): free its frame."""
+    if not future.cancelled() and future.exception() is None:
+        release_frame(future.result()[1])
+
+
+# ---------- SERVER ----------
+class ConversionServer:
+    def __init__(self, workers: int = None, max_pending: int = 32, max_upload_mb: float = 50, timeout: float = 120,
+                 memory_budget_mb: float = None, transport: str = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.max_upload = int(max_upload_mb * 1024 * 1024)
+        self.timeout = timeout
+        self.memory_budget_mb = memory_budget_mb  # per conversion, see XTB_converter.MEMORY_BUDGET_MB
+        self.transport = resolve_transport(transport)  # how workers send frames back, see XTB_converter.TRANSPORTS
+
+        self.pool = None
+        self.slots = None     # conversions running at once, one per worker process, held until the worker is done
+        self.pending = 0      # accepted requests, running or waiting for a slot
+
+    async def start(self, host: str, port: int):
+        self.pool = self._new_pool()
+        self.slots = asyncio.Semaphore(self.workers)
+
+        # Start every worker now instead of on the first requests.
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _ping) for _ in range(self.workers)))
+
+        server = await asyncio.start_server(self.handle, host, port)
+        logger.info(f"Listening on http://{host}:{port} with {self.workers} workers")
+        return server
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # A pool restarted mid-request must not fork the open client sockets into its workers:
+        # they would keep the connections open. forkserver starts workers from a clean process.
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_up, mp_context=context)
+
+    def restart_pool(self, broken: ProcessPoolExecutor):
+        """Replace a pool a worker died in; every conversion still in it has failed already."""
+        if self.pool is broken:  # Not replaced yet by another request that saw it break.
+            logger.error("A conversion worker died, starting a new worker pool.")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._new_pool()
+
+    def submit(self, data: bytes, options: dict) -> tuple:
+        """(pool, future) of a conversion, on a new pool when the current one is broken."""
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        try:
+            return pool, loop.run_in_executor(pool, convert_upload, data, options, self.transport)
+        except BrokenProcessPool:
+            self.restart_pool(pool)
+            return self.pool, loop.run_in_executor(self.pool, convert_upload, data, options, self.transport)
+
+    # ---------- HTTP ----------
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        received = time.perf_counter()
+        try:
+            method, target, headers = await self.read_head(reader)
+            url = urlsplit(target)
+
+            if url.path == "/health":
+                await self.send(writer, 200, b"ok\n", {"Content-Type": "text/plain"})
+            elif url.path != "/convert":
+                raise HTTPError(404, "Unknown path, use POST /convert.")
+            elif method != "POST":
+                raise HTTPError(405, "Use POST /convert.")
+            else:
+                await self.convert(reader, writer, url.query, headers, received)
+        except HTTPError as e:
+            await self.send(writer, e.status, f"{e}\n".encode("utf-8"), {"Content-Type": "text/plain"})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.exception(e)
+            await self.send(writer, 500, f"{e}\n".encode("utf-8"), {"Content-Type": "text/plain"})
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def read_head(reader: asyncio.StreamReader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(400, "Request head too large.")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line.")
+
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        return method.upper(), target, headers
+
+    async def read_body(self, reader, writer, headers) -> bytes:
+        try:
+            length = int(headers.get("content-length", ""))
+        except ValueError:
+            raise HTTPError(400, "Content-Length is required.")
+        if length > self.max_upload:
+            raise HTTPError(413, f"Upload larger than {self.max_upload // 1024 // 1024} MB.")
+
+        if headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await writer.drain()
+
+        return await reader.readexactly(length)
+
+    @staticmethod
+    def parse_upload(body: bytes, query: str, headers: dict) -> tuple:
+        """Return (report bytes, options, file name) from a raw or multipart upload."""
+        fields = dict(parse_qsl(query))
+        content_type = headers.get("content-type", "")
+        data = body
+
+        if content_type.startswith("multipart/form-data"):
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+            )
+            data = None
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                if part.get_filename() and data is None:
+                    data = part.get_payload(decode=True)
+                    fields.setdefault("name", part.get_filename())
+                elif name:
+                    fields[name] = part.get_content().strip()
+            if data is None:
+                raise HTTPError(400, "No file in the multipart upload.")
+
+        if not data:
+            raise HTTPError(400, "Empty upload.")
+
+        engine = fields.get("engine", "auto")
+        if engine not in ("auto",) + READER_ENGINES:
+            raise HTTPError(400, f"Unknown engine '{engine}'.")
+
+        backend = fields.get("backend", "pandas")
+        if backend not in BACKENDS:
+            raise HTTPError(400, f"Unknown backend '{backend}'.")
+
+        date_from, date_to = fields.get("from") or None, fields.get("to") or None
+        try:
+            date_bounds(date_from, date_to)
+        except ValueError as e:
+            raise HTTPError(400, f"Invalid date range: {e}")
+
+        flags = {key: fields.get(key, "").lower() in TRUE_VALUES for key in ("open", "closed", "deposit")}
+        options = {
+            "default": not any(flags.values()),
+            "open_positions": flags["open"],
+            "closed_positions": flags["closed"],
+            "simplified_deposit": flags["deposit"],
+            "engine": engine,
+            "backend": backend,
+            "date_from": date_from,
+            "date_to": date_to,
+        }
+        return data, options, fields.get("name", "report.xlsx")
+
+    async def convert(self, reader, writer, query, headers, received):
+        if self.pending >= self.max_pending:
+            raise HTTPError(503, "Too many conversions in progress, retry later.")
+
+        self.pending += 1
+        try:
+            body = await self.read_body(reader, writer, headers)
+            data, options, name = self.parse_upload(body, query, headers)
+            options["memory_budget_mb"] = self.memory_budget_mb
+            uploaded = time.perf_counter()
+
+            await self.slots.acquire()
+            started = time.perf_counter()
+            try:
+                pool, future = self.submit(data, options)
+            except BaseException:
+                self.slots.release()
+                raise
+            # A timed out conversion keeps running in its worker; the slot is free only when it ends.
+            future.add_done_callback(lambda _: self.slots.release())
+            try:
+                header, shared, rows, quarantined, convert_seconds = await asyncio.wait_for(
+                    asyncio.shield(future), self.timeout
+                )
+            except asyncio.TimeoutError:
+                future.add_done_callback(_discard_result)
+                raise HTTPError(504, f"Conversion took longer than {self.timeout:.0f} s.")
+            except BrokenProcessPool:
+                self.restart_pool(pool)
+                raise HTTPError(500, "The conversion worker stopped unexpectedly, retry the request.")
+            except Exception as e:
+                logger.exception(e)
+                raise HTTPError(422, f"Could not convert the report: {e}")
+            frame = receive_frame(shared)
+            finished = time.perf_counter()
+        finally:
+            self.pending -= 1
+
+        timing = ", ".join([
+            f"upload;dur={(uploaded - received) * 1000:.1f}",
+            f"queue;dur={(started - uploaded) * 1000:.1f}",
+            f"convert;dur={convert_seconds * 1000:.1f}",
+            f"worker;dur={(finished - started) * 1000:.1f}",
+            f"total;dur={(finished - received) * 1000:.1f}",
+        ])
+        currency = header.get("Currency") or ""
+
+        await self.send_stream(writer, frame, {
+            "Content-Type": "text/csv; charset=utf-8",
+            "Content-Disposition": f'attachment; filename="{export_file_name(name, currency)}"',
+            "Server-Timing": timing,
+            "X-Rows": str(rows),
+            "X-Quarantined-Rows": str(quarantined),
+            "X-Account": str(header.get("Account") or ""),
+            "X-Currency": str(currency),
+        })
+        logger.info(f"Converted {name}: {rows} rows, {timing}")
+
+    # ---------- RESPONSES ----------
+    @staticmethod
+    def _head(status: int, headers: dict) -> bytes:
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}", "Connection: close"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1", "replace")
+
+    async def send(self, writer, status: int, body: bytes, headers: dict):
+        writer.write(self._head(status, {**headers, "Content-Length": str(len(body))}) + body)
+        await writer.drain()
+
+    async def send_stream(self, writer, frame: pd.DataFrame, headers: dict):
+        """Send frame as CSV, rendering each chunk on a thread so the event loop keeps serving."""
+        writer.write(self._head(200, {**headers, "Transfer-Encoding": "chunked"}))
+        loop = asyncio.get_running_loop()
+        chunks = csv_chunks(frame)
+        while (chunk := await loop.run_in_executor(None, next, chunks, None)) is not None:
+            writer.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def serve(host: str, port: int, **kwargs):
+    service = ConversionServer(**kwargs)
+    server = await service.start(host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local XTB -> Portfolio Performance conversion service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--max-pending", type=int, default=32, help="Requests accepted at once before answering 503.")
+    parser.add_argument("--max-upload-mb", type=float, default=50)
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds a single conversion may take.")
+    parser.add_argument("--memory-budget-mb", type=float, default=None,
+                        help="Uploads estimated above this are converted in low-memory mode (default: XTB_MEMORY_BUDGET_MB or 1024).")
+    parser.add_argument("--transport", choices=TRANSPORTS, default=None,
+                        help="How workers send results back (default: arrow shared memory when pyarrow is installed).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, max_pending=args.max_pending,
+                          max_upload_mb=args.max_upload_mb, timeout=args.timeout,
+                          memory_budget_mb=args.memory_budget_mb, transport=args.transport))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Transactions already present in an existing Portfolio Performance file.
+
+Re-importing overlapping reports into Portfolio Performance duplicates every
+operation both reports share. ExistingTransactions reads the client file once
+with an iterative parser and keeps a hash index (Counter) of
+
+    (account name, currency, day, transaction type, amount in hundredths, security)
+
+for every account transaction, which is what a converted row becomes when it
+is imported. drop_existing() removes the rows of a converted report that are
+already in the file; a key present twice in the file drops at most two rows.
+
+A report is matched against the cash accounts it would be imported into: the
+ones whose name holds its XTB account number (write_portfolio_xml names them
+"<number> <currency>"), or else the one named after its currency alone, as the
+CSV import names it. Transactions of other accounts are never dropped.
+
+The index is cached on disk per file as JSON and rebuilt when the file's mtime
+or size changes, so large client files are parsed once, not on every conversion.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import zipfile
+from collections import Counter
+from xml.etree.ElementTree import iterparse
+
+import pandas as pd
+
+from portfolio_performance_xml import ACCOUNT_TRANSACTION_TYPES, AMOUNT_FACTOR
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+TRANSACTION_TAGS = {"account-transaction", "accountTransaction"}
+
+# XStream references a security by id ("12") or by XPath (".../securities/security[3]").
+_SECURITY_PATH = re.compile(r"securities/security(?:\[(\d+)\])?$")
+
+_index_cache = {}
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "xtb-to-pp")
+
+
+def security_key(ticker) -> str:
+    """MSFT.US, msft and MSFT are the same security."""
+    if ticker is None or pd.isna(ticker):
+        return ""
+    return str(ticker).split(".")[0].strip().upper()
+
+
+class ExistingTransactions:
+    def __init__(self, keys: Counter):
+        self.keys = keys
+        self.accounts = {key[0] for key in keys}
+
+    def __len__(self):
+        return sum(self.keys.values())
+
+    @classmethod
+    def load(cls, xml_path: str, cache_dir: str = None) -> "ExistingTransactions":
+        """Index of a Portfolio Performance file, from the in-memory or disk cache while the file is unchanged."""
+        path = os.path.abspath(xml_path)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        cached = _index_cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        cache_file = os.path.join(cache_dir or default_cache_dir(),
+                                  hashlib.sha1(path.encode("utf-8")).hexdigest() + ".json")
+        keys = _read_cache(cache_file, stamp)
+        if keys is None:
+            keys = parse_transaction_keys(path)
+            _write_cache(cache_file, stamp, keys)
+            logger.info(f"Indexed {sum(keys.values())} transactions of {xml_path}.")
+
+        index = cls(keys)
+        _index_cache[path] = (stamp, index)
+        return index
+
+    # ---------- MATCHING ----------
+    def accounts_for(self, currency, account=None) -> set:
+        """Names of the cash accounts of the file a report of this XTB account and currency is imported into."""
+        if account is not None and not pd.isna(account) and str(account).strip():
+            number = re.compile(rf"(?<!\d){re.escape(str(account).strip())}(?!\d)")
+            numbered = {name for name in self.accounts if number.search(name)}
+            if numbered:
+                return numbered
+        return {name for name in self.accounts if name.strip().upper() == str(currency).upper()}
+
+    @staticmethod
+    def row_key(currency, row):
+        """Key of a converted (Date, Type, Ticker Symbol, Value) row, None for rows that are not account transactions."""
+        date, kind, ticker, value = row
+        transaction_type = ACCOUNT_TRANSACTION_TYPES.get(str(kind).strip().lower())
+        value = pd.to_numeric(value, errors="coerce")
+        if transaction_type is None or pd.isna(value) or pd.isna(date):
+            return None
+        return (str(currency).upper(), str(date)[:10], transaction_type,
+                int(round(abs(value) * AMOUNT_FACTOR)), security_key(ticker))
+
+    def drop_existing(self, data: pd.DataFrame, currency, account=None) -> pd.DataFrame:
+        """data of an XTB account without the rows already in its Portfolio Performance account (see accounts_for)."""
+        if data is None or data.empty or not self.keys or not currency:
+            return data
+
+        accounts = self.accounts_for(currency, account)
+        existing = Counter()
+        for key, count in self.keys.items():
+            if key[0] in accounts:
+                existing[key[1:]] += count
+        if not existing:
+            return data
+
+        columns = data.reindex(columns=["Date", "Type", "Ticker Symbol", "Value"])
+        seen = Counter()
+        keep = []
+        for row in columns.itertuples(index=False, name=None):
+            key = self.row_key(currency, row)
+            if key is not None and seen[key] < existing.get(key, 0):
+                seen[key] += 1
+                keep.append(False)
+            else:
+                keep.append(True)
+
+        dropped = len(keep) - sum(keep)
+        if dropped:
+            logger.info(f"Skipped {dropped} operations already in the Portfolio Performance file.")
+        return data[keep]
+
+
+# ---------- PARSING ----------
+def _open_client_file(path: str):
+    """Plain XML, or the zipped .portfolio format with data.xml inside."""
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        return archive.open("data.xml")
+    return open(path, "rb")
+
+
+def parse_transaction_keys(xml_path: str) -> Counter:
+    """
+    Stream the client file and count the key of every account transaction.
+    Elements are cleared as soon as they are read, so memory stays flat.
+
+    A transaction belongs to the account it is nested in, or to the account a
+    buy/sell cross entry around it names (transactions of a portfolio are
+    serialised inside the first account that refers to it).
+    """
+    securities = {}   # id or position ("#3") -> security key
+    accounts = {}     # account id -> name
+    position = 0
+    keys = Counter()
+    stack = []        # [tag, account name in effect, id] of the open elements
+
+    with _open_client_file(xml_path) as stream:
+        for event, elem in iterparse(stream, events=("start", "end")):
+            if event == "start":
+                stack.append([elem.tag, stack[-1][1] if stack else "", elem.get("id")])
+                continue
+
+            _, account, _ = stack.pop()
+            parent = stack[-1][0] if stack else None
+
+            if elem.tag == "name" and parent == "account":
+                # The name comes before the transactions, so they all see it.
+                stack[-1][1] = elem.text or ""
+                if stack[-1][2] is not None:
+                    accounts[stack[-1][2]] = stack[-1][1]
+
+            elif elem.tag == "account" and parent == "crossEntry":
+                # The account of a buy/sell; its accountTransaction follows.
+                reference = elem.get("reference")
+                stack[-1][1] = accounts.get(reference, stack[-1][1]) if reference is not None else account
+
+            if elem.tag == "security" and parent == "securities" and len(stack) == 2:
+                position += 1
+                key = security_key(elem.findtext("tickerSymbol") or elem.findtext("name"))
+                securities[f"#{position}"] = key
+                if elem.get("id") is not None:
+                    securities[elem.get("id")] = key
+                elem.clear()
+
+            elif elem.tag in TRANSACTION_TAGS and elem.get("reference") is None:
+                key = _transaction_key(elem, securities)
+                if key is not None:
+                    keys[(account, *key)] += 1
+                elem.clear()
+
+            elif elem.tag == "prices" or len(stack) == 1:
+                elem.clear()  # Price history, and finished top-level sections.
+
+    return keys
+
+
+def _transaction_key(elem, securities: dict):
+    transaction_type = elem.findtext("type")
+    date = elem.findtext("date")
+    amount = elem.findtext("amount")
+    if not (transaction_type and date and amount):
+        return None
+
+    security = ""
+    reference = elem.find("security")
+    if reference is not None:
+        target = reference.get("reference")
+        if target is None:
+            security = security_key(reference.findtext("tickerSymbol") or reference.findtext("name"))
+        elif target.isdigit():
+            security = securities.get(target, "")
+        else:
+            match = _SECURITY_PATH.search(target)
+            if match:
+                security = securities.get(f"#{match.group(1) or 1}", "")
+
+    return ((elem.findtext("currencyCode") or "").upper(), date[:10], transaction_type, int(amount), security)
+
+
+# ---------- DISK CACHE ----------
+# {"version", "stamp": [mtime_ns, size], "keys": [[*key, count], ...]}
+def _read_cache(cache_file: str, stamp: tuple):
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("version") != INDEX_VERSION or cached.get("stamp") != list(stamp):
+            return None
+        return Counter({tuple(entry[:-1]): entry[-1] for entry in cached["keys"]})
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _write_cache(cache_file: str, stamp: tuple, keys: Counter):
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        partial = cache_file + ".part"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "stamp": list(stamp),
+                       "keys": [[*key, count] for key, count in keys.items()]}, f)
+        os.replace(partial, cache_file)
+    except OSError as e:
+        logger.warning(f"Could not cache the transaction index: {e}")
@@ -0,0 +1,120 @@
+"""
+Exchange rates from a local CSV, joined to converted operations by date.
+
+The rates file has one row per pair and day:
+
+    Date,From,To,Rate
+    2024-01-02,EUR,PLN,4.3480
+    2024-01-02,USD,PLN,3.9432
+
+Rate is the price of one unit of From in To. Missing directions are derived
+(1 / rate), and pairs without a direct quote are crossed through a currency
+both sides are quoted in (EUR -> PLN -> USD above). Every operation gets the
+last rate published at or before its Date.
+"""
+import logging
+import os
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RATE_COLUMNS = ["Date", "From", "To", "Rate"]
+
+_rates_cache = {}
+
+
+class FXRates:
+    def __init__(self, rates: pd.DataFrame):
+        missing = [c for c in RATE_COLUMNS if c not in rates.columns]
+        if missing:
+            raise ValueError(f"FX rates table is missing columns: {', '.join(missing)}.")
+
+        rates = rates[RATE_COLUMNS].dropna()
+        rates = rates.assign(
+            Date=pd.to_datetime(rates["Date"]),
+            From=rates["From"].astype(str).str.strip().str.upper(),
+            To=rates["To"].astype(str).str.strip().str.upper(),
+            Rate=pd.to_numeric(rates["Rate"], errors="coerce"),
+        )
+        rates = rates[rates["Rate"] > 0]
+
+        inverse = rates.rename(columns={"From": "To", "To": "From"}).assign(Rate=1 / rates["Rate"])
+
+        # One date-sorted series per pair, built once and reused for every lookup.
+        self.pairs = {}
+        for (src, dst), group in pd.concat([rates, inverse], ignore_index=True).groupby(["From", "To"]):
+            series = group.drop_duplicates("Date", keep="first").set_index("Date")["Rate"].sort_index()
+            self.pairs.setdefault((src, dst), series)
+
+        logger.debug(f"Loaded {len(rates)} FX rates for {len(self.pairs) // 2} currency pairs.")
+
+    @classmethod
+    def load(cls, csv_path: str) -> "FXRates":
+        """Read a rates CSV, reusing the parsed table while the file is unchanged."""
+        stat = os.stat(csv_path)
+        key = (os.path.abspath(csv_path), stat.st_mtime_ns, stat.st_size)
+
+        if key not in _rates_cache:
+            _rates_cache.clear()
+            _rates_cache[key] = cls(pd.read_csv(csv_path))
+        return _rates_cache[key]
+
+    # ---------- LOOKUP ----------
+    def rates_at(self, dates: pd.Series, source: str, target: str) -> pd.Series:
+        """As-of rate source -> target for every date (NaN before the first quote)."""
+        source, target = str(source).upper(), str(target).upper()
+
+        if source == target:
+            return pd.Series(1.0, index=dates.index)
+
+        if (source, target) in self.pairs:
+            return self._asof(dates, self.pairs[(source, target)])
+
+        # Cross through a currency quoted against both sides.
+        for (src, pivot) in self.pairs:
+            if src == source and (pivot, target) in self.pairs:
+                return self._asof(dates, self.pairs[(source, pivot)]) * self._asof(dates, self.pairs[(pivot, target)])
+
+        raise ValueError(f"No FX rate for {source} -> {target} in the rates table.")
+
+    @staticmethod
+    def _asof(dates: pd.Series, series: pd.Series) -> pd.Series:
+        left = pd.DataFrame({"Date": dates.astype("datetime64[ns]"), "_pos": range(len(dates))}).dropna(subset=["Date"])
+        right = series.rename("Rate").reset_index()
+        right["Date"] = right["Date"].astype("datetime64[ns]")
+
+        joined = pd.merge_asof(
+            left.sort_values("Date"),
+            right,
+            on="Date",
+            direction="backward",
+        )
+
+        rates = pd.Series(float("nan"), index=range(len(dates)))
+        rates.iloc[joined["_pos"].to_numpy()] = joined["Rate"].to_numpy()
+        return pd.Series(rates.to_numpy(), index=dates.index)
+
+    # ---------- JOIN ----------
+    def attach(self, operations: pd.DataFrame, source: str, target: str) -> pd.DataFrame:
+        """
+        Add "Exchange Rate", "Converted Value" and "Converted Currency" to the
+        operations of one account in `source` currency.
+        """
+        if operations.empty or "Date" not in operations.columns:
+            return operations
+
+        dates = pd.to_datetime(operations["Date"], errors="coerce")
+        rate = self.rates_at(dates, source, target)
+
+        missing = int(rate.isna().sum())
+        if missing:
+            logger.warning(f"No {source} -> {target} rate on or before the date of {missing} operations.")
+
+        value = pd.to_numeric(operations["Value"], errors="coerce")
+
+        return operations.assign(**{
+            "Exchange Rate": rate,
+            "Converted Value": (value * rate).round(4),
+            "Converted Currency": str(target).upper(),
+        })
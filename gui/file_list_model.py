@@ -0,0 +1,121 @@
+import os
+from pathlib import Path
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+from XTB_converter import split_archive_path
+
+
+def report_label(file_path) -> str:
+    """Name shown in the list; reports from an archive also show the archive name."""
+    archive, member = split_archive_path(file_path)
+    if member is not None:
+        return f"{Path(archive).name} › {member}"
+    return Path(file_path).name
+
+
+class ReportListModel(QAbstractListModel):
+    """
+    List model of the reports to convert, indexed by path.
+    Adding, finding and updating a report is O(1); added paths are inserted in one
+    batch per call and removed rows in one batch per contiguous block, so the view
+    never handles items one at a time. Paths are told apart by their full path,
+    not by file name.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._paths = []    # paths in list order
+        self._rows = {}     # path key -> row
+        self._labels = []   # display text of each row
+        self._details = {}  # path key -> "account · currency · rows" or error, shown after the name
+
+    @staticmethod
+    def _key(file_path) -> str:
+        return os.path.normcase(os.path.abspath(os.fspath(file_path)))
+
+    # ---------- QT MODEL ----------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        path = self._paths[index.row()]
+        if role == Qt.DisplayRole:
+            details = self._details.get(self._key(path))
+            return f"{self._labels[index.row()]} — {details}" if details else self._labels[index.row()]
+        if role == Qt.UserRole:
+            return path
+        if role == Qt.ToolTipRole:
+            return os.fspath(path)
+        return None
+
+    # ---------- PATHS ----------
+    def __contains__(self, file_path):
+        return self._key(file_path) in self._rows
+
+    def __len__(self):
+        return len(self._paths)
+
+    def paths(self) -> list:
+        return list(self._paths)
+
+    def add_paths(self, paths) -> list:
+        """Append the paths not in the list yet, in one insert. Returns the added paths."""
+        added = []
+        seen = set()
+        for path in paths:
+            key = self._key(path)
+            if key not in self._rows and key not in seen:
+                seen.add(key)
+                added.append(path)
+
+        if added:
+            first = len(self._paths)
+            self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+            for row, path in enumerate(added, first):
+                self._rows[self._key(path)] = row
+            self._paths.extend(added)
+            self._labels.extend(report_label(path) for path in added)
+            self.endInsertRows()
+
+        return added
+
+    def remove_rows(self, rows) -> list:
+        """Remove the given rows, one contiguous block at a time from the bottom. Returns the removed paths."""
+        rows = sorted(set(rows))
+        removed = [self._paths[row] for row in rows]
+
+        blocks = []
+        for row in rows:
+            if blocks and blocks[-1][1] == row - 1:
+                blocks[-1][1] = row
+            else:
+                blocks.append([row, row])
+
+        for first, last in reversed(blocks):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._paths[first:last + 1]
+            del self._labels[first:last + 1]
+            self.endRemoveRows()
+
+        for path in removed:
+            self._details.pop(self._key(path), None)
+        self._rows = {self._key(path): row for row, path in enumerate(self._paths)}
+        return removed
+
+    def clear(self):
+        self.beginResetModel()
+        self._paths, self._rows, self._labels, self._details = [], {}, [], {}
+        self.endResetModel()
+
+    def set_details(self, file_path, details: str):
+        """Show details after the report's name (ignored for paths no longer listed)."""
+        row = self._rows.get(self._key(file_path))
+        if row is None:
+            return
+        self._details[self._key(file_path)] = details
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
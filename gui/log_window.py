@@ -42,6 +42,7 @@ class LogWindow(QMainWindow):
         self.auto_scroll = True
         self.show_timestamps = True
         self.current_filter_level = "DEBUG"
+        self.profiling_enabled = False
         
         # Kolory dla różnych poziomów logowania
         self.level_colors = {
@@ -109,6 +110,14 @@ class LogWindow(QMainWindow):
         self.level_filter.currentTextChanged.connect(self.change_filter_level)
         layout.addWidget(self.level_filter)
         
+        # Checkbox - profilowanie konwersji
+        self.profiling_cb = QCheckBox("Profilowanie")
+        self.profiling_cb.setChecked(self.profiling_enabled)
+        self.profiling_cb.setToolTip("Konwersje są profilowane (cProfile + tracemalloc), "
+                                     "statystyki i podsumowanie zapisywane obok pliku CSV.")
+        self.profiling_cb.toggled.connect(self.toggle_profiling)
+        layout.addWidget(self.profiling_cb)
+        
         layout.addStretch()
         
         # Przyciski
@@ -237,6 +246,11 @@ class LogWindow(QMainWindow):
         """Przełącza wyświetlanie znaczników czasu."""
         self.show_timestamps = checked
     
+    def toggle_profiling(self, checked):
+        """Włącza lub wyłącza profilowanie konwersji."""
+        self.profiling_enabled = checked
+        self.status_label.setText("Profilowanie włączone" if checked else "Profilowanie wyłączone")
+    
     def change_filter_level(self, level):
         """Zmienia poziom filtrowania logów."""
         self.current_filter_level = level
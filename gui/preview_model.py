@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+PREVIEW_COLUMNS = ["Ticker Symbol", "Type", "Shares", "Date", "Value", "Note"]
+
+
+class DataFrameTableModel(QAbstractTableModel):
+    """
+    Read-only model over a DataFrame for QTableView.
+    Rows are handed to the view in batches (canFetchMore/fetchMore), and sorting
+    and filtering work on row positions, so no per-cell items are ever created.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, columns=None, parent=None):
+        super().__init__(parent)
+        self.columns = list(columns or PREVIEW_COLUMNS)
+
+        self._frame = pd.DataFrame(columns=self.columns)
+        self._values = []                               # one object array per column
+        self._haystack = None                           # lowercased row text, built on first filter
+        self._order = np.arange(0)                      # row positions in sort order
+        self._mask = None                               # filter mask over row positions
+        self._rows = np.arange(0)                       # visible row positions
+        self._loaded = 0                                # rows already handed to the view
+        self._filter_text = ""
+
+    # ---------- DATA ----------
+    def set_frame(self, df: pd.DataFrame):
+        """Replace the previewed data. Missing preview columns are shown empty."""
+        self.beginResetModel()
+
+        df = df.reindex(columns=self.columns).reset_index(drop=True)
+        self._values = [df[c].to_numpy(dtype=object) for c in self.columns]
+        self._frame = df
+        self._haystack = None
+        self._order = np.arange(len(df))
+        self._mask = None
+        self._filter_text = ""
+        self._apply()
+
+        self.endResetModel()
+
+    def clear(self):
+        self.set_frame(pd.DataFrame(columns=self.columns))
+
+    def total_rows(self) -> int:
+        return len(self._order)
+
+    def visible_rows(self) -> int:
+        return len(self._rows)
+
+    # ---------- FILTER ----------
+    def set_filter(self, text: str):
+        """Keep rows where any column contains the text (case-insensitive)."""
+        text = text.strip().lower()
+        if text == self._filter_text:
+            return
+
+        self.beginResetModel()
+
+        self._filter_text = text
+        if not text:
+            self._mask = None
+        else:
+            if self._haystack is None:
+                self._haystack = self._build_haystack()
+            self._mask = self._haystack.str.contains(text, regex=False).to_numpy()
+        self._apply()
+
+        self.endResetModel()
+
+    def _build_haystack(self) -> pd.Series:
+        haystack = None
+        for c in self.columns:
+            text = self._frame[c].astype(str).where(self._frame[c].notna(), "")
+            haystack = text if haystack is None else haystack + "\x1f" + text
+        if haystack is None:
+            return pd.Series([], dtype=object)
+        return haystack.str.lower()
+
+    # ---------- SORT ----------
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        if not 0 <= column < len(self.columns):
+            return
+
+        self.beginResetModel()
+
+        series = self._frame[self.columns[column]]
+        numeric = pd.to_numeric(series, errors="coerce")
+        if numeric.notna().sum() == (series.notna() & (series != "")).sum():
+            keys = numeric.to_numpy(dtype=float)
+        else:
+            keys = series.astype(str).where(series.notna(), "").to_numpy()
+
+        self._order = np.argsort(keys, kind="stable")
+        if order == Qt.DescendingOrder:
+            self._order = self._order[::-1]
+        self._apply()
+
+        self.endResetModel()
+
+    def _apply(self):
+        self._rows = self._order if self._mask is None else self._order[self._mask[self._order]]
+        self._loaded = min(self.BATCH_SIZE, len(self._rows))
+
+    # ---------- QAbstractTableModel ----------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+
+        value = self._values[index.column()][self._rows[index.row()]]
+        if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+            return ""
+        return str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section]
+        return str(section + 1)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._rows)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+
+        count = min(self.BATCH_SIZE, len(self._rows) - self._loaded)
+        if count <= 0:
+            return
+
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
@@ -0,0 +1,33 @@
+import logging
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from XTB_converter import parse_report, read_report_header
+
+
+class ReportLoaderSignals(QObject):
+    """Sygnały wątku wczytującego raport."""
+    header = Signal(str, object)  # file path, read_report_header() result
+    loaded = Signal(str, object)  # file path, parse_report() result
+    failed = Signal(str, str)     # file path, error message
+
+
+class ReportLoader(QRunnable):
+    """Wczytuje raport XTB w tle (parse_report), zanim użytkownik kliknie Export."""
+
+    def __init__(self, file_path: str, engine: str = None):
+        super().__init__()
+        self.file_path = file_path
+        self.engine = engine
+        self.signals = ReportLoaderSignals()
+
+    def run(self):
+        try:
+            # Sam nagłówek jest gotowy po kilkudziesięciu wierszach, zanim wczyta się cały arkusz.
+            self.signals.header.emit(self.file_path, read_report_header(self.file_path))
+            parsed = parse_report(self.file_path, self.engine)
+        except Exception as e:
+            logging.exception(e)
+            self.signals.failed.emit(self.file_path, str(e))
+            return
+
+        self.signals.loaded.emit(self.file_path, parsed)
@@ -0,0 +1,66 @@
+import logging
+import os
+import zipfile
+
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from XTB_converter import archive_reports, is_archive
+
+SCAN_BATCH = 500  # Raporty przekazywane do listy naraz.
+
+
+class ReportScannerSignals(QObject):
+    """Sygnały wątku wyszukującego raporty."""
+    found = Signal(list)    # paczka ścieżek raportów
+    finished = Signal(int)  # liczba znalezionych raportów
+
+
+class ReportScanner(QRunnable):
+    """
+    Wyszukuje w tle raporty .xlsx w upuszczonych plikach i folderach (rekurencyjnie),
+    także wewnątrz archiwów .zip, i przekazuje je paczkami po SCAN_BATCH.
+    """
+
+    def __init__(self, paths: list):
+        super().__init__()
+        self.paths = list(paths)
+        self.signals = ReportScannerSignals()
+
+    def run(self):
+        batch = []
+        total = 0
+        for report_path in self._reports():
+            batch.append(report_path)
+            if len(batch) >= SCAN_BATCH:
+                self.signals.found.emit(batch)
+                total += len(batch)
+                batch = []
+
+        if batch:
+            self.signals.found.emit(batch)
+            total += len(batch)
+        self.signals.finished.emit(total)
+
+    def _reports(self):
+        for path in self.paths:
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                    for name in sorted(files):
+                        yield from self._expand(os.path.join(root, name))
+            else:
+                yield from self._expand(path)
+
+    @staticmethod
+    def _expand(path):
+        name = os.path.basename(path).lower()
+        if name.startswith(("~$", ".")):
+            return  # Pliki blokady Excela i ukryte.
+
+        if is_archive(path):
+            try:
+                yield from archive_reports(path)
+            except (OSError, zipfile.BadZipFile) as e:
+                logging.warning(f"Skipping archive {path}: {e}")
+        elif name.endswith(".xlsx"):
+            yield path
@@ -0,0 +1,265 @@
+"""
+Local SQLite ledger of converted cash operations.
+
+    python ledger.py ingest reports/*.xlsx --db ledger.sqlite
+    python ledger.py query --ticker AAPL --type Dividend --from 2024-01-01 --to 2024-12-31
+    python ledger.py export 12345678 operations.csv
+
+Every report is converted once and its operations are upserted keyed by
+(account, XTB operation ID), so overlapping reports of the same account never
+duplicate rows and newer reports overwrite older values. Reports whose file
+did not change since they were ingested are skipped. Queries and exports run
+against indexed columns (account, date, ticker, type) instead of re-parsing
+workbooks.
+
+Only the cash operation history is stored: it is the one sheet whose rows
+carry a stable operation ID. Malformed rows (see XTB_converter.validate_rows)
+are left out; each source records how many.
+"""
+import argparse
+import datetime
+import logging
+import os
+import sqlite3
+
+import pandas as pd
+
+from XTB_converter import (
+    EXPORT_COLUMNS, READER_ENGINES, BACKENDS, convert_sheet, date_bounds, expand_archives, file_stamp, parse_report,
+    quarantine_frame
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    account            TEXT NOT NULL,
+    operation_id       TEXT NOT NULL,
+    date               TEXT,
+    type               TEXT,
+    ticker             TEXT,
+    shares             TEXT,
+    value              REAL,
+    securities_account TEXT,
+    note               TEXT,
+    currency           TEXT,
+    source             TEXT,
+    PRIMARY KEY (account, operation_id)
+);
+CREATE INDEX IF NOT EXISTS operations_account ON operations (account);
+CREATE INDEX IF NOT EXISTS operations_date ON operations (date);
+CREATE INDEX IF NOT EXISTS operations_ticker ON operations (ticker);
+CREATE INDEX IF NOT EXISTS operations_type ON operations (type);
+
+CREATE TABLE IF NOT EXISTS sources (
+    path        TEXT PRIMARY KEY,
+    mtime_ns    INTEGER,
+    size        INTEGER,
+    account     TEXT,
+    operations  INTEGER,
+    ingested_at TEXT,
+    quarantined INTEGER DEFAULT 0
+);
+"""
+DATE_FORMAT = "%Y-%m-%dT%H:%M"  # How dates are stored, as in the export.
+
+# Ledger column -> export column.
+COLUMNS = {
+    "ticker": "Ticker Symbol",
+    "type": "Type",
+    "shares": "Shares",
+    "date": "Date",
+    "value": "Value",
+    "securities_account": "Securities Account",
+    "note": "Note",
+}
+
+UPSERT = """
+INSERT INTO operations (account, operation_id, date, type, ticker, shares, value, securities_account, note, currency, source)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (account, operation_id) DO UPDATE SET
+    date = excluded.date, type = excluded.type, ticker = excluded.ticker, shares = excluded.shares,
+    value = excluded.value, securities_account = excluded.securities_account, note = excluded.note,
+    currency = excluded.currency, source = excluded.source
+"""
+
+
+class OperationsLedger:
+    def __init__(self, db_path: str = "ledger.sqlite"):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Add the columns ledgers created by older versions lack."""
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(sources)")}
+        if "quarantined" not in columns:
+            with self.connection:
+                self.connection.execute("ALTER TABLE sources ADD COLUMN quarantined INTEGER DEFAULT 0")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- INGEST ----------
+    def ingest(self, xlsx_path: str, engine: str = None, backend: str = None, force: bool = False) -> int:
+        """
+        Convert the cash operations of a report and upsert them. Returns the rows written (0 if skipped).
+        Malformed rows are not written; their number is kept in sources.quarantined.
+        """
+        path = os.path.abspath(xlsx_path)
+        stamp = file_stamp(path)
+
+        if not force and self.connection.execute(
+            "SELECT 1 FROM sources WHERE path = ? AND mtime_ns = ? AND size = ?", (path, *stamp)
+        ).fetchone():
+            logger.info(f"{xlsx_path} is already in the ledger, skipping.")
+            return 0
+
+        parsed = parse_report(path, engine, kinds=["cash"])
+        table = parsed["tables"]["cash"]
+        if table is None or "ID" not in table.columns:
+            raise ValueError(f"No cash operations with IDs found in {xlsx_path}.")
+
+        quarantine = []
+        header, data = convert_sheet(path, "default", parsed["layout"]["cash"], df=parsed["heads"]["cash"],
+                                     table=table, total=parsed["total"], engine=engine, backend=backend,
+                                     quarantine=quarantine)
+        quarantined = quarantine_frame(quarantine) if quarantine else pd.DataFrame(columns=["Reason"])
+        if data.empty:
+            raise ValueError(f"No operations could be converted from {xlsx_path} ({len(quarantined)} malformed rows).")
+        if len(quarantined):
+            logger.warning(f"Ledger: {len(quarantined)} malformed rows of {xlsx_path} not stored.")
+
+        account = str(header.get("Account"))
+        currency = header.get("Currency")
+
+        # Converted rows keep the index of the table row they came from.
+        ids = table.loc[data.index, "ID"]
+        rows = [
+            (account, _operation_id(op_id), date, kind, ticker, shares, None if pd.isna(value) else float(value),
+             securities, note, currency, path)
+            for op_id, (ticker, kind, shares, date, value, securities, note)
+            in zip(ids, data[EXPORT_COLUMNS].itertuples(index=False, name=None))
+        ]
+
+        with self.connection:
+            self.connection.executemany(UPSERT, rows)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sources (path, mtime_ns, size, account, operations, ingested_at, quarantined) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, *stamp, account, len(rows), datetime.datetime.now().isoformat(timespec="seconds"),
+                 len(quarantined)),
+            )
+
+        logger.info(f"Ledger: {len(rows)} operations of account {account} from {xlsx_path}.")
+        return len(rows)
+
+    # ---------- QUERY ----------
+    def query(self, account=None, ticker: str = None, kind: str = None, date_from: str = None,
+              date_to: str = None) -> pd.DataFrame:
+        """
+        Operations matching every given filter, as export columns plus "Account"
+        and "Operation ID", in date order. Dates are inclusive ISO dates.
+        """
+        conditions, params = [], []
+        if account is not None:
+            conditions.append("account = ?")
+            params.append(str(account))
+        if ticker:
+            conditions.append("ticker = ?")
+            params.append(ticker)
+        if kind:
+            conditions.append("type = ?")
+            params.append(kind)
+        start, end = date_bounds(date_from, date_to)
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(start.strftime(DATE_FORMAT))
+        if end is not None:
+            conditions.append("date < ?")  # The first minute after the last day.
+            params.append(end.strftime(DATE_FORMAT))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        columns = ", ".join(f'{column} AS "{name}"' for column, name in COLUMNS.items())
+        return self.sql(
+            f'SELECT {columns}, account AS "Account", operation_id AS "Operation ID" FROM operations {where} '
+            f"ORDER BY account, date, CAST(operation_id AS INTEGER), operation_id",
+            params,
+        )
+
+    def sql(self, query: str, params=()) -> pd.DataFrame:
+        """Ad-hoc read-only SQL against the ledger."""
+        return pd.read_sql_query(query, self.connection, params=list(params))
+
+    def export(self, account, csv_path: str) -> int:
+        """Write all operations of an account as a Portfolio Performance CSV."""
+        data = self.query(account=account)[EXPORT_COLUMNS]
+        data.to_csv(csv_path, index=False)
+        return len(data)
+
+    def accounts(self) -> pd.DataFrame:
+        return self.sql(
+            'SELECT account AS "Account", currency AS "Currency", COUNT(*) AS "Operations", '
+            'MIN(date) AS "First", MAX(date) AS "Last" FROM operations GROUP BY account, currency ORDER BY account'
+        )
+
+
+def _operation_id(value) -> str:
+    """XTB IDs come back as int or float from Excel; store 123 rather than 123.0."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SQLite ledger of XTB cash operations.")
+    parser.add_argument("--db", default="ledger.sqlite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Convert reports and upsert their operations.")
+    ingest.add_argument("paths", nargs="+", help="XTB .xlsx reports or zip archives of them.")
+    ingest.add_argument("--engine", choices=("auto",) + READER_ENGINES, default="auto")
+    ingest.add_argument("--backend", choices=BACKENDS, default="pandas")
+    ingest.add_argument("--force", action="store_true", help="Re-ingest reports that did not change.")
+
+    query = commands.add_parser("query", help="Print matching operations.")
+    query.add_argument("--account")
+    query.add_argument("--ticker")
+    query.add_argument("--type", dest="kind")
+    query.add_argument("--from", dest="date_from", help="YYYY-MM-DD, inclusive.")
+    query.add_argument("--to", dest="date_to", help="YYYY-MM-DD, inclusive.")
+
+    export = commands.add_parser("export", help="Write an account's operations as CSV.")
+    export.add_argument("account")
+    export.add_argument("csv_path")
+
+    commands.add_parser("accounts", help="List accounts in the ledger.")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    with OperationsLedger(args.db) as ledger:
+        if args.command == "ingest":
+            for path in expand_archives(args.paths):
+                try:
+                    ledger.ingest(path, args.engine, args.backend, args.force)
+                except Exception as e:
+                    logger.error(f"{path}: {e}")
+        elif args.command == "query":
+            print(ledger.query(args.account, args.ticker, args.kind, args.date_from, args.date_to).to_string(index=False))
+        elif args.command == "export":
+            print(f"{ledger.export(args.account, args.csv_path)} operations written to {args.csv_path}")
+        else:
+            print(ledger.accounts().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
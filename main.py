@@ -1,10 +1,11 @@
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QFileDialog, QTableWidget, QTableWidgetItem,
     QSpacerItem, QSizePolicy, QMenu, QSplitter, QStatusBar, QWidget,
-    QPushButton, QGridLayout, QFrame, QVBoxLayout, QHBoxLayout, QLabel, QMessageBox, QListWidget, QCheckBox, QLineEdit
+    QPushButton, QGridLayout, QFrame, QVBoxLayout, QHBoxLayout, QLabel, QMessageBox, QListView, QCheckBox, QLineEdit,
+    QTableView, QHeaderView, QAbstractItemView, QComboBox
 )
 from PySide6.QtGui import QFont, QColor, QIcon, QCursor, QKeySequence, QShortcut
-from PySide6.QtCore import Signal, QSettings, Qt, QTimer, Slot
+from PySide6.QtCore import Signal, QSettings, Qt, QTimer, Slot, QThreadPool
 from PySide6 import QtCore, QtWidgets, QtGui
 
 from pathlib import Path
@@ -15,7 +16,18 @@ import sys
 import os
 
 from gui.log_window import LogWindow
-from XTB_converter import CashOperationXLSXReader
+from XTB_converter import (
+    CashOperationXLSXReader, convert_report, available_engines, available_backends, date_bounds,
+    archive_reports, is_archive, numbered_export_path, quarantine_frame, ParsedReportCache
+)
+from gui.preview_model import DataFrameTableModel
+from gui.report_loader import ReportLoader
+from gui.report_scanner import ReportScanner
+from gui.file_list_model import ReportListModel
+from fx_rates import FXRates
+from portfolio_performance_xml import write_portfolio_xml
+from existing_portfolio import ExistingTransactions
+from profiling import profile_conversion
 from gui.update_checker import UpdateChecker
 
 logging.basicConfig(level=logging.NOTSET, filename="log.log", filemode="w", format="%(asctime)s - %(lineno)d - %(levelname)s - %(message)s")
@@ -30,7 +42,10 @@ class MyMainWindow(QMainWindow):
         super().__init__()
         self.base_path = self._get_base_path()
 
-        self.file_paths = []
+        self.file_list_model = ReportListModel(self)
+        self.parsed_reports = ParsedReportCache()  # file path -> parse_report() result, filled in the background
+
+        self.thread_pool = QThreadPool(self)
 
         self.settings = settings
         self.dark_mode_enabled = self.settings.value("DarkMode", False, type=bool)
@@ -87,7 +102,9 @@ class MyMainWindow(QMainWindow):
         main_layout.setSpacing(5)
 
         # ===== MAIN CONTENT (LEFT / RIGHT) =====
-        content_layout = QHBoxLayout()
+        content_widget = QWidget()
+        content_layout = QHBoxLayout(content_widget)
+        content_layout.setContentsMargins(0, 0, 0, 0)
         content_layout.setSpacing(5)
 
         # ==========================================================
@@ -96,7 +113,7 @@ class MyMainWindow(QMainWindow):
         left_panel_layout = QVBoxLayout()
 
         self.drop_info_label = QLabel(
-            'Drag & drop the .xlsx file exported from XTB\n'
+            'Drag & drop the .xlsx files (or a .zip or folder of them) exported from XTB\n'
             '(Report: "Cash Operations")'
         )
         self.drop_info_label.setAlignment(Qt.AlignCenter)
@@ -105,10 +122,13 @@ class MyMainWindow(QMainWindow):
             "border: 2px dashed #cccccc; padding: 20px;"
         )
 
-        self.file_list_widget = QListWidget()
+        self.file_list_view = QListView()
+        self.file_list_view.setModel(self.file_list_model)
+        self.file_list_view.setUniformItemSizes(True)
+        self.file_list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
 
         left_panel_layout.addWidget(self.drop_info_label)
-        left_panel_layout.addWidget(self.file_list_widget)
+        left_panel_layout.addWidget(self.file_list_view)
 
         content_layout.addLayout(left_panel_layout, 1)
 
@@ -155,6 +175,25 @@ class MyMainWindow(QMainWindow):
 
         settings_layout.addWidget(self.default_export_checkbox, 3, 0, 1, 3)
 
+        # ===== DATE RANGE =====
+        date_range_label = QLabel("Dates:")
+
+        self.date_from_input = QLineEdit()
+        self.date_from_input.setPlaceholderText("from YYYY-MM-DD")
+        self.date_from_input.setText(self.settings.value("DateFrom", "", type=str))
+        self.date_from_input.textChanged.connect(lambda text: self.settings.setValue("DateFrom", text))
+
+        self.date_to_input = QLineEdit()
+        self.date_to_input.setPlaceholderText("to YYYY-MM-DD")
+        self.date_to_input.setText(self.settings.value("DateTo", "", type=str))
+        self.date_to_input.textChanged.connect(lambda text: self.settings.setValue("DateTo", text))
+
+        date_range_label.setToolTip("Only export operations within these days (both inclusive). Leave empty for the whole history.")
+
+        settings_layout.addWidget(date_range_label, 3, 3, 1, 1)
+        settings_layout.addWidget(self.date_from_input, 3, 4, 1, 1)
+        settings_layout.addWidget(self.date_to_input, 3, 5, 1, 1)
+
         # ===== ADVANCED OPTIONS =====
         advanced_section_label = QLabel("Alternative Advanced Processing Options")
         advanced_section_label.setStyleSheet(
@@ -170,19 +209,159 @@ class MyMainWindow(QMainWindow):
         settings_layout.addWidget(self.include_closed_positions_checkbox, 6, 0, 1, 3)
         settings_layout.addWidget(self.simplified_deposit_checkbox, 7, 0, 1, 3)
 
-        settings_layout.setRowStretch(8, 1)
+        # ===== READER ENGINE =====
+        engine_label = QLabel("Reader engine:")
+
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItems(["auto"] + available_engines())
+        self.engine_combo.setToolTip("Engine used to read .xlsx files. \"auto\" picks the fastest installed one.")
+
+        saved_engine = self.settings.value("ReaderEngine", "auto", type=str)
+        if self.engine_combo.findText(saved_engine) >= 0:
+            self.engine_combo.setCurrentText(saved_engine)
+        self.engine_combo.currentTextChanged.connect(
+            lambda engine: self.settings.setValue("ReaderEngine", engine)
+        )
+
+        settings_layout.addWidget(engine_label, 8, 0, 1, 1)
+        settings_layout.addWidget(self.engine_combo, 8, 1, 1, 2)
+
+        # ===== NORMALISATION BACKEND =====
+        backend_label = QLabel("Backend:")
+
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItems(available_backends())
+        self.backend_combo.setToolTip("Library used to normalise operations. \"polars\" uses all cores, the CSV is the same.")
+
+        saved_backend = self.settings.value("Backend", "pandas", type=str)
+        if self.backend_combo.findText(saved_backend) >= 0:
+            self.backend_combo.setCurrentText(saved_backend)
+        self.backend_combo.currentTextChanged.connect(
+            lambda backend: self.settings.setValue("Backend", backend)
+        )
+
+        settings_layout.addWidget(backend_label, 8, 3, 1, 1)
+        settings_layout.addWidget(self.backend_combo, 8, 4, 1, 2)
+
+        # ===== CURRENCY CONVERSION =====
+        fx_section_label = QLabel("Currency conversion (optional)")
+        fx_section_label.setStyleSheet(
+            "font-weight: bold; font-size: 14px; margin-top: 10px;"
+        )
+        settings_layout.addWidget(fx_section_label, 9, 0, 1, 3)
+
+        self.fx_rates_input = QLineEdit()
+        self.fx_rates_input.setPlaceholderText("FX rates CSV (Date, From, To, Rate)...")
+        self.fx_rates_input.setText(self.settings.value("FXRatesPath", "", type=str))
+        self.fx_rates_input.textChanged.connect(lambda path: self.settings.setValue("FXRatesPath", path))
+
+        self.browse_fx_rates_button = QPushButton("Browse")
+        self.browse_fx_rates_button.setFixedWidth(100)
+        self.browse_fx_rates_button.clicked.connect(self._browse_fx_rates)
+
+        settings_layout.addWidget(self.fx_rates_input, 10, 0, 1, 4)
+        settings_layout.addWidget(self.browse_fx_rates_button, 10, 5)
+
+        target_currency_label = QLabel("Target currency:")
+
+        self.target_currency_input = QLineEdit()
+        self.target_currency_input.setPlaceholderText("e.g. PLN")
+        self.target_currency_input.setMaxLength(3)
+        self.target_currency_input.setText(self.settings.value("TargetCurrency", "", type=str))
+        self.target_currency_input.textChanged.connect(lambda text: self.settings.setValue("TargetCurrency", text))
+
+        settings_layout.addWidget(target_currency_label, 11, 0, 1, 1)
+        settings_layout.addWidget(self.target_currency_input, 11, 1, 1, 1)
+
+        # ===== PORTFOLIO PERFORMANCE XML =====
+        self.write_pp_xml_checkbox = QCheckBox("Also write one Portfolio Performance XML file for all reports")
+        self.write_pp_xml_checkbox.setChecked(self.settings.value("WritePPXml", False, type=bool))
+        self.write_pp_xml_checkbox.toggled.connect(lambda checked: self.settings.setValue("WritePPXml", checked))
+
+        settings_layout.addWidget(self.write_pp_xml_checkbox, 12, 0, 1, 4)
+
+        self.existing_pp_input = QLineEdit()
+        self.existing_pp_input.setPlaceholderText("Existing Portfolio Performance file (skip operations already in it)...")
+        self.existing_pp_input.setText(self.settings.value("ExistingPPPath", "", type=str))
+        self.existing_pp_input.textChanged.connect(lambda path: self.settings.setValue("ExistingPPPath", path))
+
+        self.browse_existing_pp_button = QPushButton("Browse")
+        self.browse_existing_pp_button.setFixedWidth(100)
+        self.browse_existing_pp_button.clicked.connect(self._browse_existing_pp)
+
+        settings_layout.addWidget(self.existing_pp_input, 13, 0, 1, 4)
+        settings_layout.addWidget(self.browse_existing_pp_button, 13, 5)
+
+        settings_layout.setRowStretch(14, 1)
 
         right_panel_layout.addWidget(settings_frame)
 
         self.export_button = QPushButton("Export to CSV")
         self.export_button.setFixedWidth(100)
-        self.export_button.clicked.connect(self.process_files)
+        self.export_button.clicked.connect(lambda: self.process_files())
         self.export_button.setStyleSheet("padding: 8px; font-weight: bold;")
 
-        settings_layout.addWidget(self.export_button, 9, 5, 1, 1)
+        settings_layout.addWidget(self.export_button, 15, 5, 1, 1)
+
+        self.preview_button = QPushButton("Preview")
+        self.preview_button.setFixedWidth(100)
+        self.preview_button.clicked.connect(self.preview_files)
+        self.preview_button.setStyleSheet("padding: 8px;")
+
+        settings_layout.addWidget(self.preview_button, 15, 4, 1, 1)
 
         content_layout.addLayout(right_panel_layout, 4)
-        main_layout.addLayout(content_layout)
+
+        # ==========================================================
+        # BOTTOM PANEL — RESULT PREVIEW
+        # ==========================================================
+        preview_widget = QWidget()
+        preview_layout = QVBoxLayout(preview_widget)
+        preview_layout.setContentsMargins(0, 0, 0, 0)
+
+        preview_bar_layout = QHBoxLayout()
+
+        preview_label = QLabel("Preview")
+        preview_label.setStyleSheet("font-weight: bold;")
+
+        self.preview_filter_input = QLineEdit()
+        self.preview_filter_input.setPlaceholderText("Filter rows...")
+        self.preview_filter_input.setClearButtonEnabled(True)
+
+        self.preview_count_label = QLabel()
+
+        preview_bar_layout.addWidget(preview_label)
+        preview_bar_layout.addWidget(self.preview_filter_input, 1)
+        preview_bar_layout.addWidget(self.preview_count_label)
+
+        self.preview_model = DataFrameTableModel(parent=self)
+
+        self.preview_table = QTableView()
+        self.preview_table.setModel(self.preview_model)
+        self.preview_table.setSortingEnabled(True)
+        self.preview_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.preview_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.preview_table.verticalHeader().setDefaultSectionSize(20)
+        self.preview_table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.preview_table.horizontalHeader().setStretchLastSection(True)
+
+        # Debounce typing so a large preview is filtered once per pause, not per key.
+        self.preview_filter_timer = QTimer(self)
+        self.preview_filter_timer.setSingleShot(True)
+        self.preview_filter_timer.setInterval(250)
+        self.preview_filter_timer.timeout.connect(self._apply_preview_filter)
+        self.preview_filter_input.textChanged.connect(self.preview_filter_timer.start)
+
+        preview_layout.addLayout(preview_bar_layout)
+        preview_layout.addWidget(self.preview_table)
+
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(content_widget)
+        splitter.addWidget(preview_widget)
+        splitter.setStretchFactor(0, 1)
+        splitter.setStretchFactor(1, 1)
+
+        main_layout.addWidget(splitter)
 
     def _connect_option_logic(self):
         """Connect export option logic."""
@@ -219,6 +398,28 @@ class MyMainWindow(QMainWindow):
             self.export_path_input.setText(folder)
             self.settings.setValue("ExportPath", folder)
 
+    def _browse_fx_rates(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Select FX Rates File",
+            "",
+            "CSV files (*.csv);;All files (*.*)"
+        )
+
+        if file_path:
+            self.fx_rates_input.setText(file_path)
+
+    def _browse_existing_pp(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Select Portfolio Performance File",
+            "",
+            "Portfolio Performance files (*.xml *.portfolio);;All files (*.*)"
+        )
+
+        if file_path:
+            self.existing_pp_input.setText(file_path)
+
     def _load_export_path(self):
         saved_path = self.settings.value("ExportPath", "", type=str)
 
@@ -229,17 +430,30 @@ class MyMainWindow(QMainWindow):
             self.export_path_input.clear()
 
     # Main functions
-    def process_files(self):
+    def _export_options(self) -> dict:
+        return {
+            "default": self.default_export_checkbox.isChecked(),
+            "open_positions": self.include_open_positions_checkbox.isChecked(),
+            "closed_positions": self.include_closed_positions_checkbox.isChecked(),
+            "simplified_deposit": self.simplified_deposit_checkbox.isChecked(),
+            "engine": self.engine_combo.currentText(),
+            "backend": self.backend_combo.currentText(),
+            "date_from": self.date_from_input.text().strip() or None,
+            "date_to": self.date_to_input.text().strip() or None,
+        }
+
+    def process_files(self, write: bool = True):
         account_currency = ""
         data = pd.DataFrame()
-        open_positions, closed_positions, simplified_deposit = pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        previews = []
+        reports = []
 
         if not self.file_paths:
             QMessageBox.warning(self, "No file", "Please add at least one .xlsx file to process.")
             return
 
         export_path = self.export_path_input.text().strip()
-        if not export_path:
+        if write and not export_path:
             QMessageBox.warning(self, "No export directory", "Please select an export directory.")
             return
         
@@ -247,27 +461,101 @@ class MyMainWindow(QMainWindow):
             QMessageBox.warning(self, "No export options", "Please select at least one export option.")
             return
 
+        options = self._export_options()
+
+        try:
+            date_bounds(options["date_from"], options["date_to"])
+        except ValueError as e:
+            QMessageBox.warning(self, "Date range", f"Invalid date range:\n{e}")
+            return
+
+        target_currency = self.target_currency_input.text().strip().upper()
+        fx_rates_path = self.fx_rates_input.text().strip()
+        if target_currency and fx_rates_path:
+            try:
+                options["fx_rates"] = FXRates.load(fx_rates_path)
+                options["target_currency"] = target_currency
+            except Exception as e:
+                logging.exception(e)
+                QMessageBox.warning(self, "FX rates", f"Could not load FX rates:\n{e}")
+                return
+
+        existing_pp_path = self.existing_pp_input.text().strip()
+        if existing_pp_path:
+            try:
+                options["existing_transactions"] = ExistingTransactions.load(existing_pp_path)
+            except Exception as e:
+                logging.exception(e)
+                QMessageBox.warning(self, "Portfolio Performance file", f"Could not read the existing Portfolio Performance file:\n{e}")
+                return
+
+        quarantined = 0
+        written = set()  # Raporty o tej samej nazwie (z różnych folderów lub archiwów) dostają numer.
+
         for file_path in self.file_paths:
-            ac = CashOperationXLSXReader(file_path, 3).read_header()
-            account_currency = ac.get("Currency", "")
-            
-            if self.default_export_checkbox.isChecked():
-                converter = CashOperationXLSXReader(file_path, 3)
-                data = converter.export_default_cash_operations()
+            quarantine = []
+            if self.log_window.profiling_enabled:
+                # Stats and hotspots go beside the CSVs, or beside the report for a preview.
+                ac, data, _ = profile_conversion(file_path, export_path or None, quarantine=quarantine, **options)
             else:
-                if self.include_open_positions_checkbox.isChecked():
-                    cash_open_operations = CashOperationXLSXReader(file_path, sheet_index=1)
-                    open_positions = cash_open_operations.export_open_operations()
-                if self.include_closed_positions_checkbox.isChecked():
-                    cash_closed_operations = CashOperationXLSXReader(file_path, sheet_index=0)
-                    closed_positions = cash_closed_operations.export_closed_operations()
-                if self.simplified_deposit_checkbox.isChecked():
-                    cash_deposit = CashOperationXLSXReader(file_path, sheet_index=3)
-                    simplified_deposit = cash_deposit.export_simplified_deposit_of_operation()
-                
-                data = pd.concat([open_positions, closed_positions, simplified_deposit], ignore_index=True)
-
-            data.to_csv(Path(export_path) / f"{Path(file_path).stem}_XTB_{account_currency}.csv", index=False)
+                ac, data = convert_report(file_path, parsed=self.parsed_reports.get(file_path), quarantine=quarantine, **options)
+            account_currency = ac.get("Currency", "")
+
+            if write:
+                target = numbered_export_path(export_path, file_path, account_currency, written)
+                written.add(target)
+                data.to_csv(target, index=False)
+
+            # Malformed rows are left out of the export; they go to a file of their own with the reason.
+            if quarantine:
+                quarantined += sum(len(rows) for rows in quarantine)
+                if write:
+                    quarantine_frame(quarantine).to_csv(target[:-len(".csv")] + "_quarantine.csv", index=False)
+
+            previews.append(data)
+            reports.append((ac, data))
+
+        consolidated = pd.concat(previews, ignore_index=True)
+
+        # All accounts in one file, comparable through the converted values.
+        if write and "fx_rates" in options:
+            consolidated.to_csv(Path(export_path) / f"XTB_consolidated_{target_currency}.csv", index=False)
+
+        # One import in Portfolio Performance instead of one CSV wizard run per file.
+        if write and self.write_pp_xml_checkbox.isChecked():
+            write_portfolio_xml(reports, Path(export_path) / "XTB_portfolio.xml", target_currency or None)
+
+        self.show_preview(consolidated)
+
+        if quarantined:
+            where = " (pliki *_quarantine.csv)" if write else ""
+            self.update_status_bar(f"⚠ Pominięto {quarantined} błędnych wierszy{where}.", 10000, "red")
+
+    def preview_files(self):
+        """Convert the listed files and show the result without writing CSVs."""
+        self.process_files(write=False)
+
+    # Preview
+    def show_preview(self, data: pd.DataFrame):
+        self.preview_filter_input.blockSignals(True)
+        self.preview_filter_input.clear()
+        self.preview_filter_input.blockSignals(False)
+
+        self.preview_model.set_frame(data)
+        self.preview_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self._update_preview_count()
+
+    def _apply_preview_filter(self):
+        self.preview_model.set_filter(self.preview_filter_input.text())
+        self._update_preview_count()
+
+    def _update_preview_count(self):
+        total = self.preview_model.total_rows()
+        visible = self.preview_model.visible_rows()
+        if visible == total:
+            self.preview_count_label.setText(f"{total} rows")
+        else:
+            self.preview_count_label.setText(f"{visible} / {total} rows")
 
     # Status bar.
     def _init_status_bar(self):
@@ -336,44 +624,102 @@ class MyMainWindow(QMainWindow):
     def open_github(self):
         self.open_url("https://github.com/RybarskiDominik/XTB-TO-PORTFOLIO-PERFORMANCE")
 
+    @property
+    def file_paths(self) -> list:
+        return self.file_list_model.paths()
+
     def store_file_(self, file_path):
-        """Dodaje plik do listy i wyświetla jego nazwę w QListWidget."""
-        if file_path not in self.file_paths:
-            self.file_paths.append(file_path)
-            file_name = file_path.split("/")[-1]  # tylko nazwa pliku
-            self.file_list_widget.addItem(file_name)
-            print(f"File stored: {file_path}")
-        else:
-            print(f"File already in list: {file_path}")
+        """Dodaje plik (lub raporty z archiwum .zip) do listy; foldery przeszukuje w tle."""
+        if os.path.isdir(file_path):
+            self.scan_for_reports([file_path])
+            return
+        # Archiwum zip: każdy raport ze środka osobno, czytany z pamięci bez rozpakowywania.
+        self.add_reports(archive_reports(file_path) if is_archive(file_path) else [file_path])
+
+    @Slot(list)
+    def add_reports(self, paths: list):
+        """Dodaje paczkę ścieżek jednym wstawieniem do modelu; pomija te, które już są na liście."""
+        added = self.file_list_model.add_paths(paths)
+        for file_path in added:
+            self.start_report_loader(file_path)
+        print(f"Files stored: {len(added)} ({len(paths) - len(added)} already in list)")
+
+    def scan_for_reports(self, paths: list):
+        """Przeszukuje pliki i foldery w tle (rekurencyjnie) i dodaje znalezione raporty paczkami."""
+        scanner = ReportScanner(paths)
+        scanner.signals.found.connect(self.add_reports)
+        scanner.signals.finished.connect(self._scan_finished)
+        self.thread_pool.start(scanner)
+
+    @Slot(int)
+    def _scan_finished(self, found):
+        self.update_status_bar(f"Znaleziono raportów: {found}.", 5000)
+
+    # Background parsing
+    def start_report_loader(self, file_path):
+        """Wczytuje plik w tle od razu po dodaniu, żeby Export tylko normalizował i zapisywał."""
+        loader = ReportLoader(file_path, self.engine_combo.currentText())
+        loader.signals.header.connect(self._report_header)
+        loader.signals.loaded.connect(self._report_loaded)
+        loader.signals.failed.connect(self._report_failed)
+        self.thread_pool.start(loader)
+
+    @Slot(str, object)
+    def _report_header(self, file_path, header):
+        if file_path not in self.file_list_model or file_path in self.parsed_reports:
+            return
+
+        details = f'{header.get("Account", "?")} · {header.get("Currency", "?")}'
+        self.file_list_model.set_details(file_path, details)
+
+    @Slot(str, object)
+    def _report_loaded(self, file_path, parsed):
+        if file_path not in self.file_list_model:
+            return  # Usunięty z listy w trakcie wczytywania.
+
+        self.parsed_reports.put(file_path, parsed)  # Za duże do pamięci: Export wczyta plik jeszcze raz.
+
+        header = parsed["header"]
+        details = f'{header.get("Account", "?")} · {header.get("Currency", "?")} · {parsed["rows"]["cash"]} rows'
+        self.file_list_model.set_details(file_path, details)
+        logging.info(f"Parsed {file_path}: {details}")
+
+    @Slot(str, str)
+    def _report_failed(self, file_path, message):
+        if file_path not in self.file_list_model:
+            return
+
+        self.file_list_model.set_details(file_path, f"error: {message}")
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
             for url in event.mimeData().urls():
-                if url.toLocalFile().endswith(".xlsx"):
+                file_path = url.toLocalFile()
+                if file_path.lower().endswith((".xlsx", ".zip")) or os.path.isdir(file_path):
                     event.acceptProposedAction()
                     return     
 
     def dropEvent(self, event):
-        for url in event.mimeData().urls():
-            file_path = url.toLocalFile()
-            print(f'Dropped GML file: {file_path}')
-            self.store_file_(file_path)
+        # Foldery i archiwa przeszukiwane w tle, raporty dodawane do listy paczkami.
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        print(f'Dropped {len(paths)} paths')
+        self.scan_for_reports(paths)
 
 
     def setup_file_list_actions(self):
-        """Dodaje menu kontekstowe i klawisz Delete do QListWidget."""
+        """Dodaje menu kontekstowe i klawisz Delete do listy plików."""
         
         # Menu kontekstowe
-        self.file_list_widget.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.file_list_widget.customContextMenuRequested.connect(self.show_file_context_menu)
+        self.file_list_view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.file_list_view.customContextMenuRequested.connect(self.show_file_context_menu)
         
         # Obsługa klawisza Delete
-        self.file_list_widget.keyPressEvent = self.file_list_key_press
+        self.file_list_view.keyPressEvent = self.file_list_key_press
 
     def show_file_context_menu(self, pos):
         menu = QMenu()
         remove_action = menu.addAction("Usuń")
-        action = menu.exec(self.file_list_widget.mapToGlobal(pos))
+        action = menu.exec(self.file_list_view.mapToGlobal(pos))
         
         if action == remove_action:
             self.remove_selected_files()
@@ -383,21 +729,14 @@ class MyMainWindow(QMainWindow):
             self.remove_selected_files()
         else:
             # domyślna obsługa innych klawiszy
-            QListWidget.keyPressEvent(self.file_list_widget, event)
+            QListView.keyPressEvent(self.file_list_view, event)
 
     def remove_selected_files(self):
-        """Usuwa zaznaczone pliki z QListWidget i z self.file_paths."""
-        selected_items = self.file_list_widget.selectedItems()
-        for item in selected_items:
-            row = self.file_list_widget.row(item)
-            self.file_list_widget.takeItem(row)
-            # Usuń pełną ścieżkę odpowiadającą nazwie pliku
-            # Szukamy w self.file_paths pliku z końcówką matching item.text()
-            for path in self.file_paths:
-                if path.endswith(item.text()):
-                    self.file_paths.remove(path)
-                    break
-        print(f"Remaining files: {self.file_paths}")
+        """Usuwa zaznaczone pliki z listy (po pełnej ścieżce) i ich wczytane dane."""
+        rows = [index.row() for index in self.file_list_view.selectionModel().selectedRows()]
+        for path in self.file_list_model.remove_rows(rows):
+            self.parsed_reports.pop(path)
+        print(f"Remaining files: {len(self.file_list_model)}")
 
 
 if __name__ == "__main__":
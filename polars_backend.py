@@ -0,0 +1,230 @@
+"""
+Polars implementation of the normalisation steps in CashOperationXLSXReader.
+
+Selected per run with backend="polars" (see XTB_converter.BACKENDS). The raw
+tables still come from read_table()/parse_report() as pandas frames; they are
+handed to Polars once (dates stored as text are parsed there), normalised with column expressions that Polars runs on
+all cores, and returned as pandas frames with the same rows, index, values
+and column order as the pandas methods, so the CSV is byte-for-byte the same.
+
+Every function mirrors one pandas method, including its corner cases: a trade
+comment without "@" fails the whole export, missing "Value" columns raise
+KeyError, and missing numbers count as a loss for CFD rows.
+"""
+import pandas as pd
+import polars as pl
+
+from XTB_converter import OPERATION_TYPES, EXPORT_COLUMNS
+
+ROW = "__row"          # original table index, kept for reconciliation
+CFD_TICKER = r"^[A-Z0-9]+$"
+DATE_FORMAT = "%Y-%m-%dT%H:%M"
+
+
+# ---------- CONVERSION ----------
+def _from_pandas(table: pd.DataFrame, dates: list = ()) -> pl.DataFrame:
+    columns = {ROW: pl.Series(ROW, table.index.to_numpy())}
+    for name in table.columns:
+        series = table[name]
+        try:
+            columns[name] = pl.from_pandas(series)
+        except (TypeError, ValueError, pl.exceptions.PolarsError):
+            # Mixed object column: keep the text of each value, like astype(str) would.
+            columns[name] = pl.Series(name, [None if pd.isna(v) else str(v) for v in series], dtype=pl.String)
+    frame = pl.DataFrame(columns)
+    text = [name for name in dates if name in frame.columns and not isinstance(frame.schema[name], pl.Datetime)]
+    return frame.with_columns(_parse_date(name) for name in text)
+
+
+def _to_pandas(frame: pl.DataFrame, columns: list) -> pd.DataFrame:
+    result = frame.select([ROW] + columns).to_pandas()
+    return result.set_index(ROW).rename_axis(None)
+
+
+# ---------- EXPRESSIONS ----------
+def _text(name: str) -> pl.Expr:
+    """str(value) as the pandas code sees it: missing values become "nan"."""
+    return pl.col(name).cast(pl.String).fill_null("nan")
+
+
+def _map_types() -> pl.Expr:
+    return pl.col("Type").cast(pl.String).replace(OPERATION_TYPES)
+
+
+def _is_cfd(name: str) -> pl.Expr:
+    return _text(name).str.strip_chars().str.contains(CFD_TICKER)
+
+
+def _strip_suffix() -> pl.Expr:
+    """strip_ticker_suffix() after fillna(""): MSFT.US -> MSFT."""
+    ticker = pl.col("Ticker Symbol").cast(pl.String).fill_null("")
+    return ticker.str.split(".").list.first().str.strip_chars().alias("Ticker Symbol")
+
+
+def _parse_date(name: str) -> pl.Expr:
+    """Dates the reader left as text (or mixed with datetimes, see _from_pandas) as datetimes."""
+    return pl.col(name).cast(pl.String).str.to_datetime(time_unit="us").alias(name)
+
+
+def _format_date() -> pl.Expr:
+    return pl.col("Date").dt.strftime(DATE_FORMAT).alias("Date")
+
+
+def _timestamp_text(name: str) -> pl.Expr:
+    """str(pd.Timestamp): seconds always, microseconds only when present, "NaT" when missing."""
+    column = pl.col(name)
+    if_fraction = column.dt.strftime("%Y-%m-%d %H:%M:%S%.6f")
+    whole = column.dt.strftime("%Y-%m-%d %H:%M:%S")
+    return pl.when(column.dt.microsecond() == 0).then(whole).otherwise(if_fraction).fill_null("NaT")
+
+
+def _position(note: pl.Expr, char: str) -> pl.Expr:
+    """Character index of the first `char` in note (str.index), null when absent."""
+    return note.str.extract(f"^([^{char}]*){char}", 1).str.len_chars().cast(pl.Int64)
+
+
+# ---------- CASH OPERATIONS ----------
+def normalize_operations_history(table: pd.DataFrame, currency) -> pd.DataFrame:
+    """
+    normalize_operations_history() + strip_ticker_suffix() of the cash sheet.
+    Returns EXPORT_COLUMNS and "Amount", indexed like table.
+    """
+    df = _from_pandas(table.rename(columns={"Time": "Date", "Comment": "Note", "Symbol": "Ticker Symbol"}), dates=["Date"])
+    if "Type" not in df.columns:
+        raise KeyError("Type")
+
+    amount = pl.col("Amount")
+    df = df.with_columns(_map_types().alias("Type"), pl.col("Note").cast(pl.String))
+
+    # --- TRANSFER: NEGATIVE -> WITHDRAWAL ---
+    transfer = pl.col("Type") == "transfer"
+    df = df.with_columns(
+        pl.when(transfer & (amount > 0)).then(pl.lit("Deposit"))
+        .when(transfer & (amount < 0)).then(pl.lit("Withdrawal"))
+        .otherwise(pl.col("Type")).alias("Type")
+    )
+
+    # --- HANDLE CFD CLOSE TRADE ---
+    cfd = (pl.col("Type") == "close trade").fill_null(False) & _is_cfd("Ticker Symbol")
+    profit = (amount >= 0).fill_null(False)
+    df = df.with_columns(
+        pl.when(cfd & profit).then(pl.lit("Profit CFD")).when(cfd).then(pl.lit("Loss CFD"))
+        .otherwise(pl.col("Note")).alias("Note"),
+        pl.when(cfd & profit).then(pl.lit("Deposit")).when(cfd).then(pl.lit("Withdrawal"))
+        .otherwise(pl.col("Type")).alias("Type"),
+    )
+
+    # --- SKIP CLOSE TRADE ---
+    df = df.filter(pl.col("Type").ne_missing("close trade"))
+
+    # --- SHARES + PRICE (add_quantity_and_price) ---
+    note = _text("Note")
+    trade = note.str.contains("OPEN BUY", literal=True) | note.str.contains("CLOSE BUY", literal=True)
+    at = _position(note, "@")
+    slash = _position(note, "/")
+    end = pl.coalesce(slash, at)
+
+    df = df.with_columns(
+        trade.alias("__trade"),
+        at.alias("__at"),
+        note.str.slice(9, (end - 9).clip(lower_bound=0)).str.strip_chars().alias("__shares"),
+        note.str.slice(at + 2).str.strip_chars().alias("__price"),
+    )
+
+    if df.select((pl.col("__trade") & pl.col("__at").is_null()).any()).item():
+        raise ValueError("substring not found")  # str.index("@") of a trade comment
+
+    value = pl.col("__shares").cast(pl.Float64, strict=False) * pl.col("__price").cast(pl.Float64, strict=False)
+    df = df.with_columns(
+        pl.when(pl.col("__trade")).then(pl.col("__shares")).otherwise(pl.lit("")).alias("Shares"),
+        pl.when(pl.col("__trade")).then(value).otherwise(None).alias("Value"),
+    )
+
+    if df.select(pl.col("Value").is_not_null().any()).item() is not True:
+        raise KeyError("Value")  # pandas only creates the column for a parsed trade
+
+    # --- Value <- Amount (only when Value is empty) ---
+    df = df.with_columns(
+        pl.coalesce(pl.col("Value"), amount.cast(pl.Float64)).alias("Value"),
+        pl.col("Note").cast(pl.String).fill_null(""),
+        pl.lit(f"XTB {currency}").alias("Securities Account"),
+        _strip_suffix(),
+        _format_date(),
+    )
+
+    return _to_pandas(df, EXPORT_COLUMNS + ["Amount"])
+
+
+# ---------- OPEN POSITIONS ----------
+def normalize_open_operations(table: pd.DataFrame, currency) -> pd.DataFrame:
+    """normalize_open_operations() + strip_ticker_suffix(), EXPORT_COLUMNS only."""
+    df = _from_pandas(table.rename(columns={
+        "Comment": "Note", "Symbol": "Ticker Symbol", "Volume": "Shares",
+        "Open time": "Date", "Open price": "Value", "Purchase value": "Gross Amount",
+    }), dates=["Date"])
+
+    df = df.with_columns(
+        _map_types().alias("Type"),
+        pl.col("Note").cast(pl.String).fill_null(""),
+        pl.lit(f"XTB {currency}").alias("Securities Account"),
+        (pl.col("Shares") * pl.col("Value")).alias("Value"),
+        _strip_suffix(),
+        _format_date(),
+    )
+
+    return _to_pandas(df, EXPORT_COLUMNS)
+
+
+# ---------- CLOSED POSITIONS ----------
+def normalize_closed_operations(table: pd.DataFrame, currency) -> pd.DataFrame:
+    """
+    normalize_closed_operations() + strip_ticker_suffix(), EXPORT_COLUMNS only:
+    the buy and the sell of every stock position, then the cash result of every CFD.
+    """
+    if table.empty:
+        raise ValueError("Operations dataframe is empty. Run normalize_closed_operations() first.")
+
+    df = _from_pandas(table.rename(columns={"Comment": "Note", "Symbol": "Ticker Symbol", "Volume": "Shares"}),
+                      dates=["Open time", "Close time"])
+    df = df.with_columns(_map_types().alias("Type"), _is_cfd("Ticker Symbol").alias("__cfd"))
+
+    stocks = df.filter(~pl.col("__cfd"))
+    cfds = df.filter(pl.col("__cfd"))
+
+    common = [ROW, "Ticker Symbol", "Type", "Shares", "Note"]
+    opened = stocks.select(common + [
+        pl.col("Open time").alias("Date"), pl.col("Open price").alias("Value"),
+    ])
+    closed = stocks.select(common + [
+        pl.col("Close time").alias("Date"), pl.col("Close price").alias("Value"),
+    ]).with_columns(pl.lit("Sell").alias("Type"))
+
+    trades = pl.concat([opened, closed], how="vertical_relaxed").with_columns(
+        (pl.col("Shares") * pl.col("Value")).alias("Value")
+    )
+
+    # --- HANDLE CFD CLOSE TRADE ---
+    ticker = _text("Ticker Symbol").str.strip_chars()
+    profit = (pl.col("Gross P/L") >= 0).fill_null(False)
+    close_time = _timestamp_text("Close time")
+    cash_flow = cfds.select(
+        pl.col(ROW),
+        pl.when(profit).then(pl.lit("Deposit")).otherwise(pl.lit("Withdrawal")).alias("Type"),
+        pl.col("Close time").alias("Date"),
+        pl.col("Gross P/L").alias("Value"),
+        pl.concat_str([
+            pl.when(profit).then(pl.lit("Profit CFD on: ")).otherwise(pl.lit("Loss CFD on: ")),
+            ticker, pl.lit(" on "), close_time,
+        ]).alias("Note"),
+    )
+
+    # Row numbers restart like pd.concat(ignore_index=True).
+    df = pl.concat([trades, cash_flow], how="diagonal_relaxed").with_columns(
+        pl.int_range(pl.len()).alias(ROW),
+        pl.col("Note").cast(pl.String).fill_null(""),
+        pl.lit(f"XTB {currency}").alias("Securities Account"),
+        _strip_suffix(),
+        _format_date(),
+    )
+
+    return _to_pandas(df, EXPORT_COLUMNS)
@@ -0,0 +1,341 @@
+"""
+Portfolio Performance XML export.
+
+Writes converted operations straight into a Portfolio Performance client file,
+so all accounts are imported at once instead of one CSV wizard run per file.
+
+The file follows the XStream layout Portfolio Performance saves with id
+references: securities first, then the cash accounts with their transactions.
+A buy or sell is a "buysell" cross entry between the cash account and the
+securities account (portfolio). The first trade of an account serialises its
+portfolio inline, including every portfolio transaction, and later
+occurrences are references, exactly as XStream writes them.
+
+Every XTB account gets its own cash account and portfolio, named after the
+account number, so two accounts in the same currency stay apart.
+
+The XML is written incrementally with XMLGenerator and ids are derived from
+the row position, so no XML tree or per-row id table is built. The converted
+frames themselves are held in memory: they are grouped per account and read
+twice (cash account transactions, then the portfolio).
+"""
+import datetime
+import logging
+import uuid
+from xml.sax.saxutils import XMLGenerator
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CLIENT_VERSION = 66  # Portfolio Performance file format version written.
+
+# Operation type (CSV "Type") -> account transaction type.
+ACCOUNT_TRANSACTION_TYPES = {
+    "deposit": "DEPOSIT",
+    "withdrawal": "REMOVAL",
+    "dividend": "DIVIDENDS",
+    "interest": "INTEREST",
+    "taxes": "TAXES",
+    "fees": "FEES",
+    "buy": "BUY",
+    "sell": "SELL",
+}
+TRADE_TYPES = {"BUY", "SELL"}
+
+AMOUNT_FACTOR = 100            # amounts are stored in hundredths
+SHARES_FACTOR = 100_000_000    # shares are stored with 8 decimals
+
+# Ids of the fixed objects; securities, accounts and portfolios follow, then the rows.
+CLIENT_ID = 1
+FIRST_SECURITY_ID = 10
+IDS_PER_ROW = 3                # account transaction, cross entry, portfolio transaction
+
+
+def _uuid(*parts) -> str:
+    """Stable uuid, so re-exporting the same operations gives the same file."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "xtb-to-pp/" + "/".join(str(p) for p in parts)))
+
+
+def account_label(header: dict, base_currency: str = None) -> tuple:
+    """(group key, cash account name) of a report: its account number and currency."""
+    currency = header.get("Currency") or base_currency
+    account = header.get("Account")
+    account = "" if account is None or pd.isna(account) else str(account).strip()
+    return (account, currency), f"{account} {currency}" if account else currency
+
+
+def _rows(frames):
+    """(Date, Type, Ticker, Shares, Value, Note) of every row, in file order."""
+    for frame in frames:
+        columns = frame.reindex(columns=["Date", "Type", "Ticker Symbol", "Shares", "Value", "Note"])
+        yield from columns.itertuples(index=False, name=None)
+
+
+class PortfolioXMLWriter:
+    def __init__(self, stream, base_currency: str):
+        self.xml = XMLGenerator(stream, encoding="utf-8", short_empty_elements=True)
+        self.base_currency = base_currency
+        self.updated_at = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+        self.securities = {}       # ticker -> (id, currency)
+        self.groups = []           # [((account, currency), [frames])], one cash account + portfolio each
+        self.names = {}            # group key -> cash account name
+        self.account_ids = {}
+        self.portfolio_ids = {}
+        self.portfolios_written = set()
+        self.row_base = 0
+        self.skipped = 0
+
+    # ---------- XML HELPERS ----------
+    def start(self, tag, **attrs):
+        self.xml.startElement(tag, {k.rstrip("_"): str(v) for k, v in attrs.items()})
+
+    def end(self, tag):
+        self.xml.endElement(tag)
+
+    def leaf(self, tag, text=None, **attrs):
+        self.start(tag, **attrs)
+        if text is not None:
+            self.xml.characters(str(text))
+        self.end(tag)
+
+    # ---------- PLAN ----------
+    def plan(self, reports):
+        """Group frames per account and assign ids to securities, accounts and portfolios."""
+        groups = {}
+        for header, data in reports:
+            if data is None or data.empty:
+                continue
+            key, name = account_label(header, self.base_currency)
+            self.names[key] = name
+            groups.setdefault(key, []).append(data)
+        self.groups = list(groups.items())
+
+        next_id = FIRST_SECURITY_ID
+        for (_, currency), frames in self.groups:
+            for frame in frames:
+                if "Ticker Symbol" not in frame.columns:
+                    continue
+                for ticker in frame["Ticker Symbol"].dropna().astype(str).str.strip().unique():
+                    if ticker and ticker not in self.securities:
+                        self.securities[ticker] = (next_id, currency)
+                        next_id += 1
+
+        for key, _ in self.groups:
+            self.account_ids[key] = next_id
+            self.portfolio_ids[key] = next_id + 1
+            next_id += 2
+
+        self.row_base = next_id
+
+    def row_ids(self, row: int) -> tuple:
+        base = self.row_base + row * IDS_PER_ROW
+        return base, base + 1, base + 2
+
+    # ---------- PARSE ROWS ----------
+    def transaction(self, row):
+        """Account transaction type, amount, shares and security id of a row, or None to skip it."""
+        date, kind, ticker, shares, value, note = row
+
+        transaction_type = ACCOUNT_TRANSACTION_TYPES.get(str(kind).strip().lower())
+        value = pd.to_numeric(value, errors="coerce")
+        if transaction_type is None or pd.isna(value) or pd.isna(date):
+            return None
+
+        shares = pd.to_numeric(shares, errors="coerce")
+        ticker = "" if pd.isna(ticker) else str(ticker).strip()
+        security = self.securities.get(ticker, (None,))[0]
+
+        if transaction_type in TRADE_TYPES and security is None:
+            return None
+
+        return {
+            "type": transaction_type,
+            "date": str(date),
+            "amount": int(round(abs(value) * AMOUNT_FACTOR)),
+            "shares": 0 if pd.isna(shares) else int(round(abs(shares) * SHARES_FACTOR)),
+            "security": security,
+            "note": "" if pd.isna(note) else str(note),
+        }
+
+    # ---------- WRITE ----------
+    def write(self, reports):
+        self.plan(reports)
+
+        self.xml.startDocument()
+        self.start("client", id=CLIENT_ID)
+        self.leaf("version", CLIENT_VERSION)
+        self.leaf("baseCurrency", self.base_currency)
+
+        self.start("securities")
+        for ticker, (security_id, currency) in self.securities.items():
+            self.write_security(ticker, security_id, currency)
+        self.end("securities")
+
+        self.leaf("watchlists")
+
+        self.start("accounts")
+        row = 0
+        for key, frames in self.groups:
+            row = self.write_account(key, frames, row)
+        self.end("accounts")
+
+        self.start("portfolios")
+        row = 0
+        for key, frames in self.groups:
+            if key in self.portfolios_written:
+                self.leaf("portfolio", reference=self.portfolio_ids[key])
+            else:
+                self.write_portfolio(key, frames, row, current=None)
+            row += sum(len(frame) for frame in frames)
+        self.end("portfolios")
+
+        for tag in ("plans", "taxonomies", "dashboards", "properties"):
+            self.leaf(tag)
+
+        self.end("client")
+        self.xml.endDocument()
+
+        if self.skipped:
+            logger.warning(f"{self.skipped} operations could not be written to the Portfolio Performance file.")
+
+    def write_security(self, ticker, security_id, currency):
+        self.start("security", id=security_id)
+        self.leaf("uuid", _uuid("security", ticker))
+        self.leaf("name", ticker)
+        self.leaf("currencyCode", currency)
+        self.leaf("tickerSymbol", ticker)
+        self.leaf("prices")
+        self.start("attributes")
+        self.leaf("map")
+        self.end("attributes")
+        self.leaf("events")
+        self.leaf("properties")
+        self.leaf("isRetired", "false")
+        self.leaf("updatedAt", self.updated_at)
+        self.end("security")
+
+    def write_account(self, key, frames, first_row) -> int:
+        account_id = self.account_ids[key]
+        portfolio_written = False
+
+        self.start("account", id=account_id)
+        self.leaf("uuid", _uuid("account", *key))
+        self.leaf("name", self.names[key])
+        self.leaf("currencyCode", key[1])
+        self.leaf("isRetired", "false")
+        self.start("transactions")
+
+        row = first_row
+        for values in _rows(frames):
+            transaction = self.transaction(values)
+            account_tx_id, _, _ = self.row_ids(row)
+
+            if transaction is None:
+                self.skipped += 1
+            elif transaction["type"] in TRADE_TYPES and portfolio_written:
+                self.leaf("account-transaction", reference=account_tx_id)
+            else:
+                self.write_account_transaction(key, row, transaction, inline_portfolio=not portfolio_written, frames=frames, first_row=first_row)
+                if transaction["type"] in TRADE_TYPES:
+                    portfolio_written = True
+                    self.portfolios_written.add(key)
+            row += 1
+
+        self.end("transactions")
+        self.leaf("updatedAt", self.updated_at)
+        self.end("account")
+        return row
+
+    def write_account_transaction(self, key, row, transaction, inline_portfolio=False, frames=None, first_row=0):
+        account_tx_id, cross_entry_id, portfolio_tx_id = self.row_ids(row)
+
+        self.start("account-transaction", id=account_tx_id)
+        self._transaction_fields(key, row, transaction, "account")
+
+        if transaction["type"] in TRADE_TYPES:
+            self.start("crossEntry", class_="buysell", id=cross_entry_id)
+            if inline_portfolio:
+                self.write_portfolio(key, frames, first_row, current=row)
+            else:
+                self.leaf("portfolio", reference=self.portfolio_ids[key])
+            self.leaf("portfolioTransaction", reference=portfolio_tx_id)
+            self.leaf("account", reference=self.account_ids[key])
+            self.leaf("accountTransaction", reference=account_tx_id)
+            self.end("crossEntry")
+
+        self.leaf("type", transaction["type"])
+        self.end("account-transaction")
+
+    def write_portfolio(self, key, frames, first_row, current):
+        """The portfolio with all its transactions; `current` is the trade row whose cross entry is open."""
+        portfolio_id = self.portfolio_ids[key]
+        self.start("portfolio", id=portfolio_id)
+        self.leaf("uuid", _uuid("portfolio", *key))
+        self.leaf("name", f"XTB {self.names[key]}")
+        self.leaf("isRetired", "false")
+        self.leaf("referenceAccount", reference=self.account_ids[key])
+        self.start("transactions")
+
+        row = first_row
+        for values in _rows(frames):
+            transaction = self.transaction(values)
+            if transaction is not None and transaction["type"] in TRADE_TYPES:
+                self.write_portfolio_transaction(key, row, transaction, current)
+            row += 1
+
+        self.end("transactions")
+        self.leaf("updatedAt", self.updated_at)
+        self.end("portfolio")
+
+    def write_portfolio_transaction(self, key, row, transaction, current):
+        account_tx_id, cross_entry_id, portfolio_tx_id = self.row_ids(row)
+
+        self.start("portfolio-transaction", id=portfolio_tx_id)
+        self._transaction_fields(key, row, transaction, "portfolio")
+
+        if row == current:
+            # The cross entry of this trade is being written around us.
+            self.leaf("crossEntry", class_="buysell", reference=cross_entry_id)
+        else:
+            self.start("crossEntry", class_="buysell", id=cross_entry_id)
+            self.leaf("portfolio", reference=self.portfolio_ids[key])
+            self.leaf("portfolioTransaction", reference=portfolio_tx_id)
+            self.leaf("account", reference=self.account_ids[key])
+            self.start("accountTransaction", id=account_tx_id)
+            self._transaction_fields(key, row, transaction, "account")
+            self.leaf("crossEntry", class_="buysell", reference=cross_entry_id)
+            self.leaf("type", transaction["type"])
+            self.end("accountTransaction")
+            self.end("crossEntry")
+
+        self.leaf("type", transaction["type"])
+        self.end("portfolio-transaction")
+
+    def _transaction_fields(self, key, row, transaction, side):
+        self.leaf("uuid", _uuid(side, *key, row, transaction["date"], transaction["amount"]))
+        self.leaf("date", transaction["date"])
+        self.leaf("currencyCode", key[1])
+        self.leaf("amount", transaction["amount"])
+        if transaction["security"] is not None:
+            self.leaf("security", reference=transaction["security"])
+        self.leaf("shares", transaction["shares"])
+        if transaction["note"]:
+            self.leaf("note", transaction["note"])
+        self.leaf("units")
+        self.leaf("updatedAt", self.updated_at)
+
+
+def write_portfolio_xml(reports, xml_path: str, base_currency: str = None):
+    """
+    Write (header, data) pairs from convert_report() as one Portfolio
+    Performance file. One cash account and one securities account are
+    created per XTB account (account number and currency), see account_label().
+    """
+    reports = list(reports)
+    if base_currency is None:
+        base_currency = next((h.get("Currency") for h, _ in reports if h.get("Currency")), "EUR")
+
+    with open(xml_path, "w", encoding="utf-8") as stream:
+        PortfolioXMLWriter(stream, base_currency).write(reports)
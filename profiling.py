@@ -0,0 +1,197 @@
+"""
+On-demand profiling of one conversion.
+
+    python profiling.py slow_report.xlsx --output-dir out/ --open --closed --top 40
+
+The conversion runs under cProfile (every function call) and tracemalloc
+(allocations by source line). Two files are written next to the CSV:
+
+    <report>_XTB_<currency>.prof          pstats dump, for pstats.Stats or snakeviz
+    <report>_XTB_<currency>_profile.txt   wall time, peak traced memory and the top-N
+                                          hotspots: converter functions, pandas
+                                          internals, all functions, allocating lines
+
+The GUI switches it on in the log window ("Profilowanie"), batch.py with --profile.
+Profiling slows a conversion down several times, so read the numbers relative to
+each other. Exports run on one thread while profiled: cProfile only sees the
+thread it was started on.
+"""
+import argparse
+import cProfile
+import datetime
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+
+from XTB_converter import (
+    BACKENDS, READER_ENGINES, convert_report, expand_archives, export_file_name, split_archive_path
+)
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOP = 25
+TRACE_FRAMES = 1
+
+CONVERTER_MODULES = ("XTB_converter.py", "polars_backend.py")
+PANDAS_DIR = f"{os.sep}pandas{os.sep}"
+PACKAGES_DIR = f"site-packages{os.sep}"
+
+
+# ---------- CAPTURE ----------
+class ConversionProfile:
+    """Profiles the code run inside `with`; save() writes the stats and the summary."""
+
+    def __init__(self, top: int = PROFILE_TOP):
+        self.top = top
+        self.profiler = cProfile.Profile()
+        self.snapshot = None
+        self.peak_bytes = 0
+        self.wall_s = 0.0
+        self._started = 0.0
+        self._own_trace = False
+
+    def __enter__(self):
+        self._own_trace = not tracemalloc.is_tracing()
+        if self._own_trace:
+            tracemalloc.start(TRACE_FRAMES)
+        tracemalloc.reset_peak()
+        self._started = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.disable()
+        self.wall_s = time.perf_counter() - self._started
+        self.peak_bytes = tracemalloc.get_traced_memory()[1]
+        self.snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        if self._own_trace:
+            tracemalloc.stop()
+        return False
+
+    def save(self, base_path: str, title: str = "") -> tuple:
+        """Write base_path.prof and base_path_profile.txt; returns both paths."""
+        stats_path = base_path + ".prof"
+        summary_path = base_path + "_profile.txt"
+        self.profiler.dump_stats(stats_path)
+        with open(summary_path, "w", encoding="utf-8") as f:
+            f.write(self.summary(title))
+        logger.info(f"Profile saved to {summary_path} ({self.wall_s:.2f} s, peak {self.peak_bytes / 2**20:.1f} MB).")
+        return stats_path, summary_path
+
+    # ---------- SUMMARY ----------
+    def summary(self, title: str = "") -> str:
+        stats = pstats.Stats(self.profiler).stats
+        functions = [(key, calls, own, cumulative) for key, (_, calls, own, cumulative, _) in stats.items()]
+
+        converter = [f for f in functions if os.path.basename(f[0][0]) in CONVERTER_MODULES]
+        pandas = [f for f in functions if PANDAS_DIR in f[0][0]]
+
+        lines = [
+            f"Profile of {title}" if title else "Conversion profile",
+            f"Captured {datetime.datetime.now().isoformat(timespec='seconds')}",
+            f"Wall time: {self.wall_s:.3f} s (profiled)",
+            f"Peak traced memory: {self.peak_bytes / 2**20:.1f} MB",
+            "",
+        ]
+        lines += _function_table("Converter functions, by cumulative time", converter, 3, self.top)
+        lines += _function_table("pandas internals, by own time", pandas, 2, self.top)
+        lines += _function_table("All functions, by own time", functions, 2, self.top)
+
+        lines.append(f"Top {self.top} allocating lines (still allocated at the end / peak traced memory above)")
+        lines.append(f"{'MB':>9} {'blocks':>9}  line")
+        for stat in self.snapshot.statistics("lineno")[:self.top]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size / 2**20:>9.2f} {stat.count:>9}  {_short_path(frame.filename)}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
+
+
+def _function_table(title: str, functions: list, sort_column: int, top: int) -> list:
+    lines = [title, f"{'cumul. s':>9} {'own s':>9} {'calls':>9}  function"]
+    for (filename, lineno, name), calls, own, cumulative in sorted(functions, key=lambda f: f[sort_column],
+                                                                     reverse=True)[:top]:
+        lines.append(f"{cumulative:>9.3f} {own:>9.3f} {calls:>9}  {_short_path(filename)}:{lineno}({name})")
+    return lines + [""]
+
+
+def _short_path(filename: str) -> str:
+    """.../site-packages/pandas/core/frame.py -> pandas/core/frame.py, .../XTB_converter.py -> XTB_converter.py"""
+    if PACKAGES_DIR in filename:
+        return filename.split(PACKAGES_DIR, 1)[1]
+    if os.path.basename(filename) in CONVERTER_MODULES:
+        return os.path.basename(filename)
+    return filename
+
+
+# ---------- PROFILE ONE CONVERSION ----------
+def profile_base_path(xlsx_path, output_dir: str, currency, number: int = 1) -> str:
+    """
+    Where the profile of a report goes: its CSV name without .csv, in output_dir or beside
+    the report. number > 1 tells apart reports of the same name converted together.
+    """
+    directory = output_dir or os.path.dirname(os.path.abspath(split_archive_path(xlsx_path)[0]))
+    base = os.path.splitext(export_file_name(xlsx_path, currency))[0]
+    return os.path.join(directory, base if number == 1 else f"{base}_{number}")
+
+
+def move_profile(paths: tuple, base_path: str) -> tuple:
+    """Rename the files ConversionProfile.save() wrote to base_path.prof and base_path_profile.txt."""
+    targets = (base_path + ".prof", base_path + "_profile.txt")
+    for source, target in zip(paths, targets):
+        os.replace(source, target)
+    return targets
+
+
+def profile_conversion(xlsx_path, output_dir: str = None, top: int = PROFILE_TOP, **options) -> tuple:
+    """
+    convert_report() under the profiler. options are its keyword arguments; a given
+    parsed result is ignored so that reading the workbook is profiled too.
+    The profile is saved also when the conversion fails.
+    Returns (header, data, (stats path, summary path)).
+    """
+    options = {**options, "parsed": None, "sheet_workers": 1}
+    header = {}
+    profile = ConversionProfile(top)
+    try:
+        with profile:
+            header, data = convert_report(xlsx_path, **options)
+    finally:
+        paths = profile.save(profile_base_path(xlsx_path, output_dir, header.get("Currency", "")), str(xlsx_path))
+    return header, data, paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the conversion of XTB reports.")
+    parser.add_argument("paths", nargs="+", help="XTB .xlsx reports or zip archives of them.")
+    parser.add_argument("--output-dir", help="Where to write the profiles (default: beside each report).")
+    parser.add_argument("--open", action="store_true", help="Export open positions (advanced mode).")
+    parser.add_argument("--closed", action="store_true", help="Export closed positions (advanced mode).")
+    parser.add_argument("--deposit", action="store_true", help="Export simplified deposit (advanced mode).")
+    parser.add_argument("--engine", choices=("auto",) + READER_ENGINES, default="auto")
+    parser.add_argument("--backend", choices=BACKENDS, default="pandas", help="Normalisation backend.")
+    parser.add_argument("--top", type=int, default=PROFILE_TOP, help="Hotspots listed per table.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    for path in expand_archives(args.paths):
+        try:
+            profile_conversion(
+                path, args.output_dir, args.top,
+                default=not (args.open or args.closed or args.deposit),
+                open_positions=args.open,
+                closed_positions=args.closed,
+                simplified_deposit=args.deposit,
+                engine=args.engine,
+                backend=args.backend,
+            )
+        except Exception as e:
+            logger.error(f"{path}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Shadow runs: convert a report with the reference code path and a candidate
+one, diff the results cell by cell and time both.
+
+    python shadow_run.py reports/*.xlsx --backend polars --engine calamine
+    python shadow_run.py report.xlsx --mode low-memory --open --closed --output shadow.json
+
+The reference is the conversion as it ran before the optimisations: one
+CashOperationXLSXReader per selected export, each loading its sheet with
+openpyxl and running its export_* method with pandas, one after another (see
+reference_convert). The candidate is convert_report() with whatever the
+options select. Numbers match within a tolerance, everything else must be
+equal; the row and column of every mismatch is reported, together with the
+time of each stage and the candidate's speedup:
+
+    read          loading the workbook (load_sheet; parse_report() without
+                  its read_table for the candidate)
+    read_table    finding the operations table and checking its rows
+    add_quantity_and_price, normalize_*
+                  the normalisation steps (the polars backend has no separate
+                  add_quantity_and_price)
+    total         the whole conversion
+"""
+import argparse
+import json
+import logging
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from XTB_converter import (
+    BACKENDS, FULL_MODE, LOW_MEMORY_MODE, READER_ENGINES, SHEET_EXPORTS, CashOperationXLSXReader, _attach_fx,
+    convert_report, date_bounds, discover_sheet_layout, open_report, parse_report
+)
+
+logger = logging.getLogger(__name__)
+
+# Export -> the CashOperationXLSXReader method the reference runs for it.
+REFERENCE_EXPORTS = {
+    "default": "export_default_cash_operations",
+    "open": "export_open_operations",
+    "closed": "export_closed_operations",
+    "deposit": "export_simplified_deposit_of_operation",
+}
+REFERENCE_ENGINE = "openpyxl"
+
+RTOL = 1e-9
+ATOL = 0.005  # Half a cent: values are written with two decimals at most.
+
+
+# ---------- COMPARE ----------
+def compare_frames(expected: pd.DataFrame, actual: pd.DataFrame, rtol: float = RTOL, atol: float = ATOL,
+                   limit: int = 50) -> dict:
+    """
+    Cell-by-cell diff of two exports. Returns {"equal", "shape", "columns", "mismatches", "count"}:
+    mismatches lists up to `limit` cells as {row, column, expected, actual}.
+    """
+    result = {"equal": True, "shape": None, "columns": None, "mismatches": [], "count": 0}
+
+    if list(expected.columns) != list(actual.columns):
+        result.update(equal=False, columns={"expected": list(expected.columns), "actual": list(actual.columns)})
+    if len(expected) != len(actual):
+        result.update(equal=False, shape={"expected": len(expected), "actual": len(actual)})
+
+    rows = min(len(expected), len(actual))
+    for column in [c for c in expected.columns if c in actual.columns]:
+        left = expected[column].iloc[:rows].reset_index(drop=True)
+        right = actual[column].iloc[:rows].reset_index(drop=True)
+        different = ~_same(left, right, rtol, atol)
+
+        for row in np.flatnonzero(different.to_numpy()):
+            result["count"] += 1
+            if len(result["mismatches"]) < limit:
+                result["mismatches"].append({"row": int(row), "column": column,
+                                             "expected": _plain(left[row]), "actual": _plain(right[row])})
+
+    if result["count"]:
+        result["equal"] = False
+    return result
+
+
+def _same(left: pd.Series, right: pd.Series, rtol: float, atol: float) -> pd.Series:
+    missing = left.isna() & right.isna()
+    left_num = pd.to_numeric(left, errors="coerce")
+    right_num = pd.to_numeric(right, errors="coerce")
+    numeric = left_num.notna() & right_num.notna()
+
+    close = pd.Series(np.isclose(left_num.fillna(0).astype(float), right_num.fillna(0).astype(float),
+                                 rtol=rtol, atol=atol), index=left.index)
+    text = left.astype(str) == right.astype(str)
+    return missing | (numeric & close) | (~numeric & text)
+
+
+def _plain(value):
+    """JSON-friendly cell value."""
+    if pd.isna(value):
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return value if isinstance(value, (int, float, str, bool)) else str(value)
+
+
+# ---------- SHADOW RUN ----------
+def _stage_times(timings: list, total: float) -> dict:
+    """Sum the stage timings of several readers; load_sheet is reported as read."""
+    stages = Counter()
+    for reader_timings in timings:
+        stages.update(reader_timings)
+    stages["read"] = stages.pop("load_sheet", 0.0)
+    return {**stages, "total": total}
+
+
+def _selected_exports(options: dict) -> list:
+    if options.get("default", True):
+        return ["default"]
+    selected = {"open": "open_positions", "closed": "closed_positions", "deposit": "simplified_deposit"}
+    return [export for export, option in selected.items() if options.get(option)]
+
+
+def reference_convert(xlsx_path, options: dict) -> tuple:
+    """
+    (header, data, stage seconds) of the conversion as it ran before the optimisations:
+    one reader per export, each loading its own sheet with openpyxl and normalising
+    with pandas, one export after the other. options are convert_report() options.
+    """
+    started = time.perf_counter()
+    xlsx_path = open_report(xlsx_path)
+    layout = discover_sheet_layout(xlsx_path)
+    bounds = date_bounds(options.get("date_from"), options.get("date_to"))
+    exports = _selected_exports(options)
+
+    header_reader = CashOperationXLSXReader(xlsx_path, layout["cash"], engine=REFERENCE_ENGINE)
+    header = header_reader.read_header()
+    timings, frames = [header_reader.timings], []
+    for export in exports:
+        reader = CashOperationXLSXReader(xlsx_path, layout[SHEET_EXPORTS[export]], engine=REFERENCE_ENGINE,
+                                         backend="pandas", date_bounds=bounds)
+        frames.append(getattr(reader, REFERENCE_EXPORTS[export])())
+        timings.append(reader.timings)
+
+    data = frames[0] if exports == ["default"] else pd.concat(frames, ignore_index=True)
+    if options.get("existing_transactions") is not None:
+        data = options["existing_transactions"].drop_existing(data, header.get("Currency"), header.get("Account"))
+    data = _attach_fx(data, header, options.get("fx_rates"), options.get("target_currency"))
+    return header, data, _stage_times(timings, time.perf_counter() - started)
+
+
+def candidate_convert(xlsx_path, options: dict, config: dict, quarantine: list = None) -> tuple:
+    """(header, data, stage seconds) of convert_report() with the config (engine, backend, mode, sheet_workers)."""
+    default = options.get("default", True)
+    kinds = ["cash"] + [kind for kind, option in (("open", "open_positions"), ("closed", "closed_positions"))
+                        if not default and options.get(option)]
+
+    started = time.perf_counter()
+    parse_timings = []
+    parsed = parse_report(xlsx_path, config.get("engine"), kinds=kinds, mode=config.get("mode"),
+                          memory_budget_mb=options.get("memory_budget_mb"),
+                          date_from=options.get("date_from"), date_to=options.get("date_to"),
+                          timings=parse_timings)
+    read = time.perf_counter() - started
+
+    timings = []
+    conversion = {**options, **{k: v for k, v in config.items() if k != "mode"}}
+    header, data = convert_report(xlsx_path, parsed=parsed, quarantine=quarantine, timings=timings, **conversion)
+
+    stages = _stage_times(parse_timings + timings, time.perf_counter() - started)
+    stages["read"] = read - sum(reader.get("read_table", 0.0) for reader in parse_timings)
+    return header, data, stages
+
+
+def shadow_convert(xlsx_path, options: dict = None, candidate: dict = None, reference: dict = None,
+                   rtol: float = RTOL, atol: float = ATOL, quarantine: list = None) -> dict:
+    """
+    Convert a report with the reference path (reference_convert) and the candidate
+    configuration (candidate_convert) and compare.
+
+    options are convert_report() export options shared by both runs; candidate
+    overrides engine, backend, mode and sheet_workers (default: the options themselves).
+    Returns {"path", "header", "data" (candidate output), "diff" (compare_frames),
+    "stages" {stage: reference_s, candidate_s, speedup}}; a stage only one run has
+    gets None for the other.
+    Rows the candidate run quarantined (see validate_rows) are appended to quarantine, when given.
+    """
+    options = dict(options or {})
+    shared = {k: options.pop(k) for k in ("engine", "backend", "sheet_workers") if k in options}
+    candidate = {**shared, **(candidate or {})}
+
+    _, expected, reference_times = reference_convert(xlsx_path, options)
+    header, actual, candidate_times = candidate_convert(xlsx_path, options, candidate, quarantine)
+
+    normalise = sorted((set(reference_times) | set(candidate_times)) - {"read", "read_table", "total"})
+    stages = {}
+    for stage in ["read", "read_table", *normalise, "total"]:
+        before, after = reference_times.get(stage), candidate_times.get(stage)
+        stages[stage] = {
+            "reference_s": None if before is None else round(before, 4),
+            "candidate_s": None if after is None else round(after, 4),
+            "speedup": round(before / after, 2) if before and after else None,
+        }
+    diff = compare_frames(expected, actual, rtol, atol)
+
+    if diff["equal"]:
+        logger.info(f"Shadow run {xlsx_path}: identical, {stages['total']['speedup']}x faster.")
+    else:
+        logger.warning(f"Shadow run {xlsx_path}: {diff['count']} mismatching cells, rows {diff['shape']}, "
+                       f"columns {diff['columns']}. First: {diff['mismatches'][:5]}")
+
+    return {"path": str(xlsx_path), "header": header, "data": actual, "diff": diff, "stages": stages}
+
+
+def print_result(result: dict):
+    diff = result["diff"]
+    status = "identical" if diff["equal"] else f"{diff['count']} mismatching cells"
+    print(f"\n{result['path']}: {status}")
+    if diff["shape"]:
+        print(f"  rows: expected {diff['shape']['expected']}, got {diff['shape']['actual']}")
+    if diff["columns"]:
+        print(f"  columns: expected {diff['columns']['expected']}, got {diff['columns']['actual']}")
+    for mismatch in diff["mismatches"][:10]:
+        print(f"  row {mismatch['row']} {mismatch['column']}: expected {mismatch['expected']!r}, got {mismatch['actual']!r}")
+
+    print(f"  {'stage':<28} {'reference [s]':>14} {'candidate [s]':>14} {'speedup':>8}")
+    for stage, times in result["stages"].items():
+        reference, candidate = (f"{times[key]:.3f}" if times[key] is not None else "-"
+                                for key in ("reference_s", "candidate_s"))
+        speedup = f"{times['speedup']:.2f}x" if times["speedup"] else "-"
+        print(f"  {stage:<28} {reference:>14} {candidate:>14} {speedup:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the optimised conversion with the reference path.")
+    parser.add_argument("paths", nargs="+", help="XTB .xlsx reports")
+    parser.add_argument("--open", action="store_true", help="Export open positions (advanced mode).")
+    parser.add_argument("--closed", action="store_true", help="Export closed positions (advanced mode).")
+    parser.add_argument("--deposit", action="store_true", help="Export simplified deposit (advanced mode).")
+    parser.add_argument("--engine", choices=("auto",) + READER_ENGINES, default="auto", help="Candidate reader engine.")
+    parser.add_argument("--backend", choices=BACKENDS, default="polars", help="Candidate backend.")
+    parser.add_argument("--mode", choices=(FULL_MODE, LOW_MEMORY_MODE), default=None,
+                        help="Candidate processing mode (default: chosen from the memory budget).")
+    parser.add_argument("--sheet-workers", type=int, default=None, help="Candidate sheet workers.")
+    parser.add_argument("--atol", type=float, default=ATOL, help="Absolute tolerance for numbers.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    options = {
+        "default": not (args.open or args.closed or args.deposit),
+        "open_positions": args.open,
+        "closed_positions": args.closed,
+        "simplified_deposit": args.deposit,
+    }
+    candidate = {"engine": args.engine, "backend": args.backend, "mode": args.mode, "sheet_workers": args.sheet_workers}
+
+    results, failed = [], 0
+    for path in args.paths:
+        result = shadow_convert(path, options, candidate, atol=args.atol)
+        print_result(result)
+        failed += not result["diff"]["equal"]
+        results.append({key: result[key] for key in ("path", "diff", "stages")})
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"candidate": candidate, "reference": {"engine": REFERENCE_ENGINE, "backend": "pandas"},
+                       "results": results}, f, indent=2)
+
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
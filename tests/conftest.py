@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import generate_report  # noqa: E402
+
+
+def rename_column(xlsx_path, sheet: str, column: str, new_name: str):
+    """Rename a column header of a report in place, as a changed XTB export would."""
+    wb = load_workbook(xlsx_path)
+    for row in wb[sheet].iter_rows():
+        for cell in row:
+            if cell.value == column:
+                cell.value = new_name
+    wb.save(xlsx_path)
+
+
+def set_cells(xlsx_path, sheet: str, column: str, values: dict):
+    """Overwrite cells of a column of a report in place; values maps data row number (0 = first) to value."""
+    wb = load_workbook(xlsx_path)
+    ws = wb[sheet]
+    for row in ws.iter_rows():
+        names = [cell.value for cell in row]
+        if column in names:
+            for number, value in values.items():
+                ws.cell(row[0].row + 1 + number, names.index(column) + 1).value = value
+            break
+    wb.save(xlsx_path)
+
+
+def delete_rows(xlsx_path, sheet: str, first_column: str, numbers: list):
+    """Delete data rows (0 = first row under the header holding first_column) of a report in place."""
+    wb = load_workbook(xlsx_path)
+    ws = wb[sheet]
+    header = next(row[0].row for row in ws.iter_rows() if first_column in [cell.value for cell in row])
+    for number in sorted(numbers, reverse=True):
+        ws.delete_rows(header + 1 + number)
+    wb.save(xlsx_path)
+
+
+@pytest.fixture(scope="session")
+def report(tmp_path_factory):
+    """A generated report with cash operations, open and closed positions."""
+    path = tmp_path_factory.mktemp("reports") / "report.xlsx"
+    generate_report(str(path), 200, 0.2)
+    return str(path)
+
+
+@pytest.fixture
+def broken_report(tmp_path):
+    """A report whose closed positions sheet lacks the "Close price" column."""
+    path = tmp_path / "broken.xlsx"
+    generate_report(str(path), 200, 0.2)
+    rename_column(path, "CLOSED POSITION HISTORY", "Close price", "Close rate")
+    return str(path)
+
+
+# Malformed cells of bad_report: (sheet, column) -> {data row number: value}.
+BAD_CELLS = {
+    ("CASH OPERATION HISTORY", "Time"): {3: "not a date", 40: "31.02.2021 25:00"},
+    ("CASH OPERATION HISTORY", "Amount"): {7: "12,5 PLN", 40: "twelve"},
+    ("OPEN POSITION", "Open price"): {2: "?"},
+    ("CLOSED POSITION HISTORY", "Close time"): {5: "yesterday"},
+}
+
+
+@pytest.fixture(scope="session")
+def bad_report(tmp_path_factory):
+    """The report of the `report` fixture, with the malformed cells of BAD_CELLS."""
+    path = tmp_path_factory.mktemp("reports") / "bad.xlsx"
+    generate_report(str(path), 200, 0.2)
+    for (sheet, column), values in BAD_CELLS.items():
+        set_cells(path, sheet, column, values)
+    return str(path)
@@ -0,0 +1,57 @@
+import os
+import zipfile
+
+import pytest
+
+from XTB_converter import (
+    ARCHIVE_SEPARATOR, convert_report, expand_archives, numbered_export_path, open_report, report_name
+)
+
+
+@pytest.fixture
+def archive(report, tmp_path):
+    """Two same-named reports in different folders of one zip, next to files that are not reports."""
+    path = str(tmp_path / "reports.zip")
+    with zipfile.ZipFile(path, "w") as bundle:
+        bundle.write(report, "2023/report.xlsx")
+        bundle.write(report, "2024/report.xlsx")
+        bundle.write(report, "__MACOSX/2024/report.xlsx")
+        bundle.writestr("2024/~$report.xlsx", b"lock file")
+        bundle.writestr("notes.txt", b"")
+    return path
+
+
+def test_expand_archives_lists_the_reports_inside(archive, report):
+    assert expand_archives([report, archive]) == [
+        report,
+        f"{archive}{ARCHIVE_SEPARATOR}2023/report.xlsx",
+        f"{archive}{ARCHIVE_SEPARATOR}2024/report.xlsx",
+    ]
+
+
+def test_open_report_reads_members_into_memory(archive, report):
+    member = f"{archive}{ARCHIVE_SEPARATOR}2024/report.xlsx"
+
+    with open(report, "rb") as f:
+        assert open_report(member).read() == f.read()
+    assert open_report(report) == report
+    assert report_name(member) == "report.xlsx"
+
+
+def test_zipped_report_converts_like_the_unzipped_one(archive, report):
+    member = f"{archive}{ARCHIVE_SEPARATOR}2023/report.xlsx"
+    options = {"default": False, "open_positions": True, "closed_positions": True, "simplified_deposit": True}
+
+    zipped_header, zipped = convert_report(member, **options)
+    header, data = convert_report(report, **options)
+
+    assert zipped_header == header
+    assert zipped.to_csv(index=False) == data.to_csv(index=False)
+
+
+def test_same_named_members_get_numbered_outputs(archive, tmp_path):
+    taken = set()
+    for member in expand_archives([archive]):
+        taken.add(numbered_export_path(str(tmp_path), member, "PLN", taken))
+
+    assert sorted(os.path.basename(path) for path in taken) == ["report_XTB_PLN.csv", "report_XTB_PLN_2.csv"]
@@ -0,0 +1,46 @@
+import datetime
+import shutil
+
+import pytest
+from openpyxl import load_workbook
+
+from XTB_converter import LOW_MEMORY_MODE, convert_report, parse_report
+
+pytest.importorskip("polars")
+
+EXPORTS = {
+    "cash": {"default": True},
+    "open": {"default": False, "open_positions": True},
+    "closed": {"default": False, "closed_positions": True},
+    "advanced": {"default": False, "open_positions": True, "closed_positions": True},
+}
+
+
+@pytest.fixture(scope="module")
+def text_dates_report(report, tmp_path_factory):
+    """The report of the `report` fixture with every date stored as text, as some exports have them."""
+    path = shutil.copy(report, tmp_path_factory.mktemp("reports") / "text_dates.xlsx")
+    wb = load_workbook(path)
+    for ws in wb.worksheets:
+        for row in ws.iter_rows():
+            for cell in row:
+                if isinstance(cell.value, datetime.datetime):
+                    cell.value = cell.value.strftime("%Y-%m-%d %H:%M:%S")
+    wb.save(path)
+    return str(path)
+
+
+@pytest.mark.parametrize("mode", [None, LOW_MEMORY_MODE])
+@pytest.mark.parametrize("export", EXPORTS)
+@pytest.mark.parametrize("fixture", ["report", "bad_report", "text_dates_report"])
+def test_backends_give_the_same_csv(request, fixture, export, mode):
+    path = request.getfixturevalue(fixture)
+    parsed = parse_report(path, kinds=["cash", "open", "closed"], mode=mode)
+
+    csv = {}
+    for backend in ("pandas", "polars"):
+        _, data = convert_report(path, parsed=parsed, backend=backend, **EXPORTS[export])
+        csv[backend] = data.to_csv(index=False)
+
+    assert csv["pandas"].count("\n") > 1
+    assert csv["polars"] == csv["pandas"]
@@ -0,0 +1,64 @@
+import json
+import os
+import shutil
+
+from batch import DONE, FAILED, run_batch
+
+ADVANCED = {"default": False, "open_positions": True, "closed_positions": True}
+
+
+def manifest_entry(export_dir, path):
+    with open(os.path.join(export_dir, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)["files"][path]
+
+
+def test_failed_export_fails_the_report(broken_report, tmp_path):
+    export_dir = str(tmp_path / "out")
+
+    summary = run_batch([broken_report], export_dir, workers=1, executor="thread", **ADVANCED)
+
+    assert summary["failed"] == 1 and summary["done"] == 0
+    entry = manifest_entry(export_dir, broken_report)
+    assert entry["state"] == FAILED and "Close price" in entry["error"]
+    assert not [name for name in os.listdir(export_dir) if name.endswith(".csv")]
+
+    # Not done, so a resumed run converts it again.
+    summary = run_batch([broken_report], export_dir, workers=1, executor="thread", **ADVANCED)
+    assert summary["failed"] == 1 and summary["skipped"] == 0
+    assert manifest_entry(export_dir, broken_report)["attempts"] == 2
+
+
+def test_converted_report_is_done(report, tmp_path):
+    export_dir = str(tmp_path / "out")
+
+    summary = run_batch([report], export_dir, workers=1, executor="thread", **ADVANCED)
+
+    assert summary["done"] == 1
+    entry = manifest_entry(export_dir, report)
+    assert entry["state"] == DONE and os.path.exists(entry["output"])
+    assert run_batch([report], export_dir, workers=1, executor="thread", **ADVANCED)["skipped"] == 1
+
+
+def test_profiles_are_named_like_their_csv(report, tmp_path):
+    # Two reports of the same name: their CSVs get numbered, the profiles must follow.
+    paths = []
+    for folder in ("a", "b"):
+        (tmp_path / folder).mkdir()
+        paths.append(shutil.copy(report, tmp_path / folder / "report.xlsx"))
+    export_dir = str(tmp_path / "out")
+
+    summary = run_batch([str(path) for path in paths], export_dir, workers=2, profile=True)
+
+    assert summary["done"] == 2
+    outputs = set()
+    for path in paths:
+        entry = manifest_entry(export_dir, str(path))
+        stem = entry["output"][:-len(".csv")]
+        assert entry["profile"] == stem + "_profile.txt"
+        assert os.path.exists(stem + ".prof")
+        with open(entry["profile"], encoding="utf-8") as f:
+            assert f.readline() == f"Profile of {path}\n"
+        outputs.add(os.path.basename(entry["output"]))
+    assert outputs == {"report_XTB_PLN.csv", "report_XTB_PLN_2.csv"}
+    assert sorted(os.listdir(export_dir)) == sorted(
+        ["manifest.json"] + [name[:-len(".csv")] + suffix for name in outputs for suffix in (".csv", ".prof", "_profile.txt")])
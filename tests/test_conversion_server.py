@@ -0,0 +1,116 @@
+import asyncio
+import io
+import os
+import signal
+
+import pandas as pd
+import pytest
+
+from conversion_server import ConversionServer, _ping, convert_upload, csv_chunks
+from XTB_converter import EXPORT_COLUMNS, receive_frame
+
+OPTIONS = {"default": True, "date_from": None, "date_to": None}
+
+
+def read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_date_range_without_operations_gives_header_only(report):
+    _, frame, rows, quarantined, _ = convert_upload(read(report), {**OPTIONS, "date_from": "2030-01-01"})
+
+    assert rows == 0 and quarantined == 0
+    assert b"".join(csv_chunks(frame)).decode("utf-8") == ",".join(EXPORT_COLUMNS) + "\n"
+
+
+def test_failed_export_is_an_error(broken_report):
+    with pytest.raises(ValueError, match="closed export failed"):
+        convert_upload(read(broken_report), {"default": False, "open_positions": True, "closed_positions": True})
+
+
+def test_csv_chunks_match_the_whole_csv(report):
+    _, shared, rows, _, _ = convert_upload(read(report), OPTIONS, transport="arrow")
+    frame = receive_frame(shared)
+
+    chunks = list(csv_chunks(frame, rows=30))
+
+    assert len(chunks) == -(-rows // 30)
+    assert b"".join(chunks) == frame.to_csv(index=False).encode("utf-8")
+    assert pd.read_csv(io.BytesIO(b"".join(chunks))).shape == (rows, len(EXPORT_COLUMNS))
+
+
+async def post(port: int, body: bytes) -> tuple:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"POST /convert HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), payload
+
+
+def test_timed_out_conversion_keeps_its_slot(report):
+    async def scenario():
+        service = ConversionServer(workers=1, timeout=0.001)
+        server = await service.start("127.0.0.1", 0)
+        try:
+            port = server.sockets[0].getsockname()[1]
+            status, _ = await post(port, read(report))
+            assert status == 504
+            assert service.slots.locked()  # The worker is still converting.
+
+            for _ in range(200):
+                if not service.slots.locked():
+                    break
+                await asyncio.sleep(0.05)
+            assert not service.slots.locked()
+
+            service.timeout = 60
+            status, payload = await post(port, read(report))
+            assert status == 200 and b"0\r\n\r\n" in payload
+        finally:
+            server.close()
+            service.close()
+
+    asyncio.run(scenario())
+
+
+def test_killed_worker_is_replaced(report):
+    async def worker_pid(service):
+        return await asyncio.get_running_loop().run_in_executor(service.pool, _ping)
+
+    async def scenario():
+        service = ConversionServer(workers=1)
+        server = await service.start("127.0.0.1", 0)
+        try:
+            port = server.sockets[0].getsockname()[1]
+
+            # Killed while idle: the next request finds the pool broken and starts a new one.
+            pool = service.pool
+            os.kill(await worker_pid(service), signal.SIGKILL)
+            for _ in range(100):
+                if pool._broken:
+                    break
+                await asyncio.sleep(0.05)
+            status, _ = await post(port, read(report))
+            assert status == 200
+            assert service.pool is not pool
+
+            # Killed while converting: that request fails, the next one converts on a new pool.
+            pid = await worker_pid(service)
+            request = asyncio.create_task(post(port, read(report)))
+            while not service.slots.locked():
+                await asyncio.sleep(0.001)
+            os.kill(pid, signal.SIGKILL)
+            status, _ = await request
+            assert status in (200, 500)  # 200 when the conversion was done before the kill.
+            assert not service.slots.locked()
+
+            status, payload = await post(port, read(report))
+            assert status == 200 and b"0\r\n\r\n" in payload
+        finally:
+            server.close()
+            service.close()
+
+    asyncio.run(scenario())
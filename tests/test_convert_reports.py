@@ -0,0 +1,60 @@
+import pytest
+
+import XTB_converter
+from XTB_converter import (
+    ParsedReportCache, choose_sheet_executor, convert_report, convert_reports, parse_report, parsed_size
+)
+
+ADVANCED = {"default": False, "open_positions": True, "closed_positions": True}
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_failed_sheet_export_is_reported(broken_report, executor):
+    # Two exports run on sheet worker threads of their own, not on the thread of the conversion.
+    result, = convert_reports([broken_report], workers=1, executor=executor, **ADVANCED)
+
+    assert not result["ok"]
+    assert result["failed"] == ["closed"]
+    assert any("Close price" in error for error in result["errors"])
+
+
+@pytest.mark.parametrize("sheet_executor", ["thread", "process"])
+def test_convert_report_returns_failed_exports(broken_report, sheet_executor):
+    failed = []
+    _, data = convert_report(broken_report, sheet_executor=sheet_executor, failed=failed, **ADVANCED)
+
+    assert [export for export, _ in failed] == ["closed"]
+    assert len(data)  # The open positions are still converted.
+
+
+def test_successful_report_has_no_failed_exports(report):
+    result, = convert_reports([report], workers=1, executor="thread", simplified_deposit=True, **ADVANCED)
+
+    assert result["ok"]
+    assert result["failed"] == [] and result["errors"] == []
+
+
+def test_parsed_cache_evicts_least_recently_used(report):
+    parsed = parse_report(report)
+    cache = ParsedReportCache(budget_mb=2.5 * parsed_size(parsed) / 1024 ** 2)
+
+    for path in ("a", "b"):
+        assert cache.put(path, parsed)
+    cache.get("a")
+    cache.put("c", parsed)
+
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.get("b") is None
+    assert not ParsedReportCache(budget_mb=0).put("a", parsed)
+
+
+def test_sheet_executor_follows_report_size(report, monkeypatch):
+    monkeypatch.setattr(XTB_converter.os, "cpu_count", lambda: 4)
+    assert choose_sheet_executor(report) == "thread"
+    assert choose_sheet_executor(report, parse_report(report)) == "thread"
+
+    monkeypatch.setattr(XTB_converter, "SHEET_PROCESS_MIN_MB", 0)
+    assert choose_sheet_executor(report) == "process"
+
+    monkeypatch.setattr(XTB_converter.os, "cpu_count", lambda: 1)
+    assert choose_sheet_executor(report) == "thread"
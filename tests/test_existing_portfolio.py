@@ -0,0 +1,45 @@
+import existing_portfolio
+from existing_portfolio import ExistingTransactions
+from portfolio_performance_xml import write_portfolio_xml
+from XTB_converter import convert_report
+
+
+def load(xml_path, cache_dir):
+    existing_portfolio._index_cache.clear()
+    return ExistingTransactions.load(str(xml_path), cache_dir=str(cache_dir))
+
+
+def test_transactions_are_matched_per_account(report, tmp_path):
+    header, data = convert_report(report)
+    currency = header["Currency"]
+    xml_path = tmp_path / "portfolio.xml"
+    write_portfolio_xml([({**header, "Account": "111"}, data), ({**header, "Account": "222"}, data.iloc[:0])],
+                        str(xml_path))
+    existing = load(xml_path, tmp_path / "cache")
+
+    assert existing.accounts == {f"111 {currency}"}
+    assert existing.drop_existing(data, currency, "111").empty
+    assert existing.drop_existing(data, currency, "333").equals(data)  # Same currency, another account.
+
+
+def test_accounts_named_after_the_currency_match_any_account(report, tmp_path):
+    # As the CSV import names them: the cash account is the currency.
+    header, data = convert_report(report)
+    xml_path = tmp_path / "portfolio.xml"
+    write_portfolio_xml([({**header, "Account": None}, data)], str(xml_path))
+
+    assert load(xml_path, tmp_path / "cache").drop_existing(data, header["Currency"], "111").empty
+
+
+def test_index_is_cached_as_json(report, tmp_path, monkeypatch):
+    header, data = convert_report(report)
+    xml_path = tmp_path / "portfolio.xml"
+    write_portfolio_xml([({**header, "Account": "111"}, data)], str(xml_path))
+
+    parsed = load(xml_path, tmp_path / "cache")
+    cache_file, = (tmp_path / "cache").iterdir()
+    monkeypatch.setattr(existing_portfolio, "parse_transaction_keys", None)  # Not parsed again.
+    cached = load(xml_path, tmp_path / "cache")
+
+    assert cache_file.suffix == ".json"
+    assert cached.keys == parsed.keys
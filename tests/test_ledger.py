@@ -0,0 +1,35 @@
+import sqlite3
+
+from ledger import OperationsLedger
+
+
+def test_date_to_includes_the_whole_last_day(report, tmp_path):
+    with OperationsLedger(str(tmp_path / "ledger.sqlite")) as ledger:
+        ledger.ingest(report)
+        last = ledger.query()["Date"].max()
+        day = last[:10]
+
+        assert last in set(ledger.query(date_to=day)["Date"])
+        assert set(ledger.query(date_from=day, date_to=day)["Date"].str[:10]) == {day}
+
+
+def test_quarantined_rows_are_counted(bad_report, tmp_path):
+    with OperationsLedger(str(tmp_path / "ledger.sqlite")) as ledger:
+        written = ledger.ingest(bad_report)
+        quarantined = ledger.sql("SELECT quarantined FROM sources")["quarantined"].tolist()
+
+    assert written
+    assert quarantined == [3]  # Row 40 has two bad cells.
+
+
+def test_old_ledger_is_migrated(tmp_path):
+    db_path = str(tmp_path / "ledger.sqlite")
+    connection = sqlite3.connect(db_path)
+    connection.execute("CREATE TABLE sources (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, "
+                       "account TEXT, operations INTEGER, ingested_at TEXT)")
+    connection.close()
+
+    with OperationsLedger(db_path) as ledger:
+        columns = set(ledger.sql("PRAGMA table_info(sources)")["name"])
+
+    assert "quarantined" in columns
@@ -0,0 +1,24 @@
+import xml.etree.ElementTree as ET
+
+from XTB_converter import convert_report
+from portfolio_performance_xml import write_portfolio_xml
+
+
+def test_same_currency_accounts_stay_apart(report, tmp_path):
+    header, data = convert_report(report)
+    reports = [({**header, "Account": "111"}, data), ({**header, "Account": "222"}, data)]
+    xml_path = tmp_path / "portfolio.xml"
+
+    write_portfolio_xml(reports, str(xml_path))
+
+    root = ET.parse(xml_path).getroot()
+    accounts = root.findall("./accounts/account")
+    portfolios = [p for p in root.iter("portfolio") if p.get("id")]
+    assert [a.findtext("name") for a in accounts] == [f"111 {header['Currency']}", f"222 {header['Currency']}"]
+    assert len(portfolios) == 2
+    assert len({p.findtext("uuid") for p in portfolios}) == 2
+
+    ids = {e.get("id") for e in root.iter() if e.get("id")}
+    references = [e.get("reference") for e in root.iter() if e.get("reference")]
+    assert references
+    assert set(references) <= ids
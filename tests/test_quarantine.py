@@ -0,0 +1,52 @@
+import shutil
+
+import pytest
+
+from conftest import BAD_CELLS, delete_rows
+from XTB_converter import LOW_MEMORY_MODE, available_backends, available_engines, convert_report, parse_report
+
+ADVANCED = {"default": False, "open_positions": True, "closed_positions": True}
+
+
+def convert(path, backend, engine, mode, quarantine=None, **options):
+    parsed = parse_report(path, engine, kinds=["cash", "open", "closed"], mode=mode)
+    return convert_report(path, parsed=parsed, backend=backend, engine=engine, quarantine=quarantine, **options)[1]
+
+
+@pytest.mark.parametrize("mode", [None, LOW_MEMORY_MODE])
+@pytest.mark.parametrize("engine", available_engines())
+@pytest.mark.parametrize("backend", available_backends())
+def test_malformed_cash_rows_are_quarantined(report, bad_report, backend, engine, mode):
+    expected = convert(report, backend, engine, mode)
+    quarantine = []
+
+    data = convert(bad_report, backend, engine, mode, quarantine)
+
+    rows, = quarantine
+    assert rows["Sheet"].tolist() == ["cash"] * 3
+    assert dict(zip(rows["Row"], rows["Reason"])) == {
+        3: "Time is not a date",
+        7: "Amount is not a number",
+        40: "Time is not a date; Amount is not a number",
+    }
+    # Every other row converts as if the bad ones were never there.
+    assert data.to_csv() == expected.drop(index=[3, 7, 40], errors="ignore").to_csv()
+
+
+@pytest.mark.parametrize("mode", [None, LOW_MEMORY_MODE])
+@pytest.mark.parametrize("backend", available_backends())
+def test_malformed_position_rows_are_quarantined(report, bad_report, backend, mode, tmp_path):
+    # The report without the malformed positions.
+    clean = shutil.copy(report, tmp_path / "clean.xlsx")
+    for (sheet, column), values in BAD_CELLS.items():
+        if sheet != "CASH OPERATION HISTORY":
+            delete_rows(clean, sheet, "Position", list(values))
+    expected = convert(clean, backend, None, mode, **ADVANCED)
+    quarantine = []
+
+    data = convert(bad_report, backend, None, mode, quarantine, **ADVANCED)
+
+    reasons = {(rows["Sheet"].iloc[0], row): reason
+               for rows in quarantine for row, reason in zip(rows["Row"], rows["Reason"])}
+    assert reasons == {("open", 2): "Open price is not a number", ("closed", 5): "Close time is not a date"}
+    assert data.to_csv(index=False) == expected.to_csv(index=False)
@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import delete_rows, set_cells
+from benchmark import generate_report
+from XTB_converter import CashOperationXLSXReader, discover_sheet_layout
+
+
+def reconcile(xlsx_path) -> dict:
+    reader = CashOperationXLSXReader(xlsx_path, sheet_index=discover_sheet_layout(xlsx_path)["cash"])
+    reader.export_default_cash_operations()
+    return reader.reconciliation
+
+
+@pytest.fixture
+def fresh_report(tmp_path):
+    path = str(tmp_path / "report.xlsx")
+    generate_report(path, 200, 0.2)
+    return path
+
+
+def test_report_is_balanced(report):
+    reconciliation = reconcile(report)
+
+    assert reconciliation["Balanced"]
+    assert reconciliation["Balance Difference"] == pytest.approx(0, abs=0.01)
+
+
+def test_header_balance_mismatch_is_not_balanced(fresh_report):
+    balance = reconcile(fresh_report)["Header Balance"]
+    set_cells(fresh_report, "CASH OPERATION HISTORY", "Balance", {0: balance + 100})
+
+    reconciliation = reconcile(fresh_report)
+
+    assert not reconciliation["Balanced"]
+    assert reconciliation["Balance Difference"] == pytest.approx(100, abs=0.01)
+    assert reconciliation["Total Difference"] == pytest.approx(0, abs=0.01)
+
+
+def test_partial_history_ignores_header_balance(fresh_report):
+    # An export of a later period: the first operations (and the opening deposit) are not in it,
+    # its Total covers the rows shown and the header still has the current balance.
+    delete_rows(fresh_report, "CASH OPERATION HISTORY", "ID", range(8))
+    before = reconcile(fresh_report)
+    set_cells(fresh_report, "CASH OPERATION HISTORY", "Amount", {before["Operations"]: before["Raw Sum"]})
+
+    reconciliation = reconcile(fresh_report)
+
+    assert not reconciliation["From Inception"]
+    assert reconciliation["Balanced"]
+    assert reconciliation["Total Difference"] == pytest.approx(0, abs=0.01)
+    assert reconciliation["Balance Difference"] != pytest.approx(0, abs=0.01)
+
+
+def test_quarantined_rows_do_not_unbalance(bad_report):
+    reader = CashOperationXLSXReader(bad_report, sheet_index=discover_sheet_layout(bad_report)["cash"])
+    reader.export_default_cash_operations()
+
+    assert reader.reconciliation["Quarantined Operations"] == 3
+    assert reader.reconciliation["Balanced"]
@@ -0,0 +1,57 @@
+import os
+import shutil
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from watch_folder import ReportFolderHandler
+from XTB_converter import file_stamp
+
+
+@pytest.mark.parametrize("shadow", [False, True])
+def test_quarantine_is_written(bad_report, tmp_path, shadow):
+    handler = ReportFolderHandler(str(tmp_path), {"default": True}, shadow=shadow)
+    try:
+        handler._convert(bad_report, file_stamp(bad_report), 0.0)
+    finally:
+        handler.stop()
+
+    assert os.path.exists(tmp_path / "bad_XTB_PLN.csv")
+    quarantine = pd.read_csv(tmp_path / "bad_XTB_PLN_quarantine.csv")
+    assert sorted(quarantine["Row"]) == [3, 7, 40]
+
+
+def test_events_are_debounced(report, tmp_path):
+    path = str(shutil.copy(report, tmp_path / "report.xlsx"))
+    handler = ReportFolderHandler(str(tmp_path / "export"), {"default": True}, debounce=0.2)
+    converted = []
+    handler._convert = lambda *args: converted.append(args[:2])
+    try:
+        # A burst of events while the file is written: one conversion, once it settled.
+        for _ in range(5):
+            handler._schedule(path)
+            time.sleep(0.05)
+        assert not converted
+        wait_for(lambda: converted)
+        assert converted == [(path, file_stamp(path))]
+        handler._converted[path] = file_stamp(path)  # As the real _convert records it.
+
+        # Touched but not changed: nothing to convert.
+        handler._schedule(path)
+        time.sleep(0.6)
+        assert len(converted) == 1
+
+        # Removed: nothing is kept about it.
+        os.remove(path)
+        handler.on_deleted(SimpleNamespace(src_path=path, is_directory=False))
+        assert path not in handler._converted and path not in handler._timers and path not in handler._seen
+    finally:
+        handler.stop()
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
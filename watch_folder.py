@@ -0,0 +1,251 @@
+"""
+Watch a folder and convert XTB reports as soon as they land in it.
+
+    python watch_folder.py <watch dir> <export dir> [--open --closed --deposit] [--engine calamine]
+
+Uses filesystem notifications from the watchdog package (inotify on Linux,
+FSEvents on macOS, ReadDirectoryChangesW on Windows); the folder is never polled
+or re-scanned. Every event restarts a short debounce timer for that file, and a
+file is converted only once its size and mtime stopped changing and it is a
+complete xlsx (zip) archive. The lock only guards the bookkeeping; stat calls,
+zip checks and conversions run outside it.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from XTB_converter import (
+    convert_report, export_file_name, file_stamp, quarantine_file_name, quarantine_frame, READER_ENGINES, BACKENDS
+)
+from existing_portfolio import ExistingTransactions
+from shadow_run import shadow_convert
+
+logger = logging.getLogger(__name__)
+
+CONVERTED_MEMORY = 1024  # Conversions remembered to skip files touched but not changed.
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Optional dependency, only needed for watch mode.
+    FileSystemEventHandler = object
+    Observer = None
+
+
+class ReportFolderHandler(FileSystemEventHandler):
+    """Debounces filesystem events per file and converts settled reports."""
+
+    def __init__(self, export_dir: str, options: dict, debounce: float = 2.0, shadow: bool = False):
+        super().__init__()
+        self.export_dir = export_dir
+        self.options = options
+        self.debounce = debounce
+        self.shadow = shadow   # also convert with the reference path and log differences
+
+        self._lock = threading.Lock()
+        self._timers = {}      # path -> pending debounce timer
+        self._seen = {}        # path -> (file stamp, first event time) of the pending change
+        self._converted = OrderedDict()  # path -> file stamp of the last conversion, oldest first
+
+        # One conversion at a time; events keep being debounced meanwhile.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="xtb-convert")
+
+    # ---------- EVENTS ----------
+    def on_created(self, event):
+        self._schedule(event.src_path, event.is_directory)
+
+    def on_modified(self, event):
+        self._schedule(event.src_path, event.is_directory)
+
+    def on_closed(self, event):
+        self._schedule(event.src_path, event.is_directory)
+
+    def on_moved(self, event):
+        self._forget(event.src_path)
+        self._schedule(event.dest_path, event.is_directory)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self._forget(event.src_path)
+
+    @staticmethod
+    def is_report(path: str) -> bool:
+        name = os.path.basename(path)
+        # Skip Office lock files (~$name.xlsx) and hidden temporary files.
+        return name.lower().endswith(".xlsx") and not name.startswith(("~$", "."))
+
+    def _schedule(self, path, is_directory=False):
+        if is_directory or not self.is_report(path):
+            return
+
+        try:
+            stamp = file_stamp(path)
+        except FileNotFoundError:
+            stamp = None
+
+        with self._lock:
+            timer = self._timers.pop(path, None)
+            if timer is not None:
+                timer.cancel()
+
+            first_event = self._seen.get(path, (None, time.monotonic()))[1]
+            self._seen[path] = (stamp, first_event)
+
+            timer = threading.Timer(self.debounce, self._settle, args=(path,))
+            timer.daemon = True
+            self._timers[path] = timer
+            timer.start()
+
+    # ---------- DEBOUNCE ----------
+    def _settle(self, path):
+        """Called (on the timer's thread) when no event arrived for `debounce` seconds."""
+        try:
+            stamp = file_stamp(path)
+            complete = zipfile.is_zipfile(path)
+        except FileNotFoundError:
+            self._forget(path)
+            return
+
+        with self._lock:
+            if self._timers.get(path) is not threading.current_thread():
+                return  # An event after the stat above restarted the debounce.
+            last_stamp, first_event = self._seen.get(path, (None, time.monotonic()))
+
+            # Still growing, or not a complete zip yet: wait another round.
+            if stamp != last_stamp or not complete:
+                self._seen[path] = (stamp, first_event)
+                timer = threading.Timer(self.debounce, self._settle, args=(path,))
+                timer.daemon = True
+                self._timers[path] = timer
+                timer.start()
+                return
+
+            self._timers.pop(path, None)
+            self._seen.pop(path, None)
+
+            if self._converted.get(path) == stamp:
+                return  # Touched but not changed since the last conversion.
+
+        self._executor.submit(self._convert, path, stamp, first_event)
+
+    def _forget(self, path):
+        """Drop everything kept about a file that was removed or moved away."""
+        with self._lock:
+            timer = self._timers.pop(path, None)
+            if timer is not None:
+                timer.cancel()
+            self._seen.pop(path, None)
+            self._converted.pop(path, None)
+
+    # ---------- CONVERSION ----------
+    def _convert(self, path, stamp, first_event):
+        quarantine = []
+        try:
+            if self.shadow:
+                result = shadow_convert(path, self.options, quarantine=quarantine)
+                header, data = result["header"], result["data"]
+            else:
+                header, data = convert_report(path, quarantine=quarantine, **self.options)
+            target = os.path.join(self.export_dir, export_file_name(path, header.get("Currency", "")))
+
+            # Write next to the target and rename, so readers never see a half-written CSV.
+            partial = target + ".part"
+            data.to_csv(partial, index=False)
+            os.replace(partial, target)
+
+            if quarantine:
+                quarantine_path = os.path.join(self.export_dir, quarantine_file_name(path, header.get("Currency", "")))
+                quarantine_frame(quarantine).to_csv(quarantine_path, index=False)
+                logger.warning(f"{sum(len(rows) for rows in quarantine)} rows of {path} quarantined to {quarantine_path}")
+        except Exception as e:
+            logger.exception(e)
+            return
+
+        with self._lock:
+            self._converted.pop(path, None)
+            self._converted[path] = stamp
+            while len(self._converted) > CONVERTED_MEMORY:
+                self._converted.popitem(last=False)
+
+        logger.info(f"Converted {path} -> {target} ({len(data)} rows, {time.monotonic() - first_event:.1f} s after first event)")
+
+    def stop(self):
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+        self._executor.shutdown(wait=True)
+
+
+def watch(watch_dir: str, export_dir: str, options: dict, debounce: float = 2.0, recursive: bool = False,
+          shadow: bool = False):
+    """Block and convert reports arriving in watch_dir until interrupted."""
+    if Observer is None:
+        raise RuntimeError("Watch mode needs the 'watchdog' package: pip install watchdog")
+
+    os.makedirs(export_dir, exist_ok=True)
+
+    handler = ReportFolderHandler(export_dir, options, debounce, shadow)
+    observer = Observer()
+    observer.schedule(handler, watch_dir, recursive=recursive)
+    observer.start()
+
+    logger.info(f"Watching {watch_dir} ({type(observer).__name__}), exporting to {export_dir}")
+
+    try:
+        while observer.is_alive():
+            observer.join(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
+        handler.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert XTB reports dropped into a folder.")
+    parser.add_argument("watch_dir")
+    parser.add_argument("export_dir")
+    parser.add_argument("--open", action="store_true", help="Export open positions (advanced mode).")
+    parser.add_argument("--closed", action="store_true", help="Export closed positions (advanced mode).")
+    parser.add_argument("--deposit", action="store_true", help="Export simplified deposit (advanced mode).")
+    parser.add_argument("--engine", choices=("auto",) + READER_ENGINES, default="auto")
+    parser.add_argument("--backend", choices=BACKENDS, default="pandas", help="Normalisation backend.")
+    parser.add_argument("--debounce", type=float, default=2.0, help="Seconds without changes before a file is converted.")
+    parser.add_argument("--recursive", action="store_true")
+    parser.add_argument("--memory-budget-mb", type=float, default=None,
+                        help="Reports estimated above this are converted in low-memory mode (default: XTB_MEMORY_BUDGET_MB or 1024).")
+    parser.add_argument("--from", dest="date_from", help="Only export operations from this day (YYYY-MM-DD).")
+    parser.add_argument("--to", dest="date_to", help="Only export operations up to this day (YYYY-MM-DD).")
+    parser.add_argument("--shadow", action="store_true",
+                        help="Also convert every report with the reference path and log mismatches and speedup.")
+    parser.add_argument("--existing-pp", help="Portfolio Performance file; operations already in it are skipped.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    options = {
+        "default": not (args.open or args.closed or args.deposit),
+        "open_positions": args.open,
+        "closed_positions": args.closed,
+        "simplified_deposit": args.deposit,
+        "engine": args.engine,
+        "backend": args.backend,
+        "memory_budget_mb": args.memory_budget_mb,
+        "date_from": args.date_from,
+        "date_to": args.date_to,
+    }
+    if args.existing_pp:
+        options["existing_transactions"] = ExistingTransactions.load(args.existing_pp)
+
+    watch(args.watch_dir, args.export_dir, options, args.debounce, args.recursive, args.shadow)
+
+
+if __name__ == "__main__":
+    main()